@@ -128,6 +128,8 @@ sys.path.append(COMMON_ROOT / 'lib')
 # For geolocation ip database
 GEOIP_PATH = REPO_ROOT / "common/static/data/geoip/GeoIP.dat"
 GEOIPV6_PATH = REPO_ROOT / "common/static/data/geoip/GeoIPv6.dat"
+# The number of IP address to country code lookups each process remembers
+GEOIP_COUNTRY_CACHE_SIZE = 10000
 
 ############################# WEB CONFIGURATION #############################
 # This is where we stick our compiled template files.
@@ -290,6 +292,16 @@ SERVER_EMAIL = 'devops@example.com'
 ADMINS = ()
 MANAGERS = ADMINS
 
+# Course assets too large for memcached are copied to, and served from, a
+# size-capped directory on local disk (see contentserver.disk_cache), e.g.
+# {'DIRECTORY': '/var/tmp/edx-static-content', 'MAX_SIZE': 10 * 1024 ** 3}
+STATIC_CONTENT_DISK_CACHE = None
+
+# How many seconds browsers and CDNs may keep unlocked course assets without
+# revalidating them. Asset URLs don't change when an asset is replaced, so
+# this bounds how long the old version can be served.
+STATIC_CONTENT_MAX_AGE = 60 * 60
+
 # Static content
 STATIC_URL = '/static/' + git.revision + "/"
 ADMIN_MEDIA_PREFIX = '/static/admin/'
@@ -572,6 +584,9 @@ INSTALLED_APPS = (
     # Course action state
     'course_action_state',
 
+    # Course summaries, kept up to date when courses are published
+    'course_overviews',
+
     # Additional problem types
     'edx_jsme',    # Molecular Structure
 )
@@ -0,0 +1,224 @@
+"""
+A size-capped cache of course assets on local disk, in front of the contentstore.
+
+Assets too large for memcached (see contentserver.middleware) were read from
+GridFS on every request. With STATIC_CONTENT_DISK_CACHE set, e.g.::
+
+  STATIC_CONTENT_DISK_CACHE = {
+      'DIRECTORY': '/var/tmp/edx-static-content',
+      'MAX_SIZE': 10 * 1024 ** 3,
+  }
+
+they are copied to DIRECTORY the first time they are served, and served from
+there, including byte ranges, until they are evicted. Files are named by the
+asset's location and last modified time, so a new version of an asset gets a
+new file, and the old one ages out. Every process on the machine shares the
+directory: the least recently served files are deleted once the directory
+grows beyond MAX_SIZE bytes.
+
+Assets are copied in a background thread, while the request that missed is
+served from GridFS, so that it doesn't wait for the whole asset to be copied.
+Only one process copies each asset: it creates the asset's temporary file
+exclusively, and other processes serve the asset from GridFS until the copy
+is done.
+"""
+import errno
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from xmodule.contentstore.content import StaticContentStream
+from xmodule.contentstore.django import contentstore
+
+log = logging.getLogger(__name__)
+
+# Partially written files
+TEMP_FILE_SUFFIX = '.tmp'
+
+# Partially written files older than this many seconds were abandoned by a
+# process that died, and are deleted
+ABANDONED_TEMP_FILE_AGE = 60 * 60
+
+
+class AssetDiskCache(object):
+    """
+    A least recently used cache of assets in a directory, holding at most
+    `max_size` bytes.
+    """
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+
+        try:
+            os.makedirs(directory)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                raise
+
+    def _path(self, content):
+        """
+        Returns the path of the file holding the current version of `content`.
+        """
+        key = u'{}@{}'.format(content.location, content.last_modified_at.isoformat())
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, content):
+        """
+        Returns a StaticContentStream of the local copy of `content`, or None
+        if there isn't one (or `content` can't be cached), in which case
+        `content` should be served as it is.
+
+        If there is no local copy, one is made in the background.
+        """
+        if content.length is None or content.last_modified_at is None or content.length > self.max_size:
+            return None
+
+        path = self._path(content)
+        local_file = self._open(path)
+        if local_file is None:
+            self._start_store(content, path)
+            return None
+
+        return StaticContentStream(
+            content.location, content.name, content.content_type, local_file,
+            last_modified_at=content.last_modified_at, thumbnail_location=content.thumbnail_location,
+            import_path=content.import_path, length=content.length, locked=content.locked,
+            content_digest=content.content_digest
+        )
+
+    @staticmethod
+    def _open(path):
+        """
+        Returns the file at `path` opened for reading, marking it as recently
+        used, or None if there is no such file.
+        """
+        try:
+            local_file = open(path, 'rb')
+        except IOError:
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            # Evicted by another process since it was opened, which it can
+            # still be read after
+            pass
+        return local_file
+
+    def _start_store(self, content, path):
+        """
+        Starts copying `content` to `path` in a background thread, unless
+        another thread or process is copying it already.
+        """
+        temp_path = path + TEMP_FILE_SUFFIX
+        try:
+            handle = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0644)
+        except OSError as exception:
+            if exception.errno == errno.EEXIST:
+                self._delete_if_abandoned(temp_path)
+            else:
+                log.exception(u"Couldn't store %s in the static content disk cache", content.location)
+            return
+
+        thread = threading.Thread(
+            target=self._store,
+            args=(content.location, content.length, content.last_modified_at, handle, temp_path, path)
+        )
+        thread.daemon = True
+        thread.start()
+
+    def _store(self, location, length, last_modified_at, handle, temp_path, path):
+        """
+        Copies the version last modified at `last_modified_at` of the asset at
+        `location` to `path`, through the file `handle` open on `temp_path`,
+        evicting files to make room for it.
+        """
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                self._evict(length)
+                # The stream of the content being served is read by the response
+                content = contentstore().find(location, as_stream=True)
+                if content.last_modified_at != last_modified_at:
+                    # Changed since; the new version is copied when it is served
+                    self._delete(temp_path)
+                    return
+                for chunk in content.stream_data():
+                    temp_file.write(chunk)
+            # Renaming is atomic, so other processes never open a partial file
+            os.rename(temp_path, path)
+        except Exception:  # pylint: disable=broad-except
+            log.exception(u"Couldn't store %s in the static content disk cache", location)
+            self._delete(temp_path)
+
+    def _evict(self, needed):
+        """
+        Deletes the least recently used files until there is room for
+        `needed` more bytes.
+        """
+        now = time.time()
+        files = []
+        total_size = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            if name.endswith(TEMP_FILE_SUFFIX):
+                if now - stat.st_mtime > ABANDONED_TEMP_FILE_AGE:
+                    self._delete(path)
+                continue
+
+            files.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total_size + needed <= self.max_size:
+                break
+            self._delete(path)
+            total_size -= size
+
+    def _delete_if_abandoned(self, temp_path):
+        """
+        Deletes the partially written file at `temp_path` if the process
+        copying to it died, so that the asset is copied again.
+        """
+        try:
+            if time.time() - os.stat(temp_path).st_mtime > ABANDONED_TEMP_FILE_AGE:
+                self._delete(temp_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _delete(path):
+        """
+        Deletes the file at `path`, unless another process already has.
+        """
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_DISK_CACHE = {}
+
+
+def get_disk_cache():
+    """
+    Returns the AssetDiskCache configured by STATIC_CONTENT_DISK_CACHE, or None
+    if there isn't one.
+    """
+    config = getattr(settings, 'STATIC_CONTENT_DISK_CACHE', None)
+    if not config:
+        return None
+
+    key = (config['DIRECTORY'], config['MAX_SIZE'])
+    if key not in _DISK_CACHE:
+        _DISK_CACHE[key] = AssetDiskCache(config['DIRECTORY'], config['MAX_SIZE'])
+    return _DISK_CACHE[key]
@@ -2,19 +2,24 @@
 Middleware to serve assets.
 """
 
+import calendar
 import logging
+import StringIO
 
+from django.conf import settings
 from django.http import (
     HttpResponse, HttpResponseNotModified, HttpResponseForbidden
 )
+from django.utils.http import http_date, parse_http_date_safe
 from student.models import CourseEnrollment
 
 from xmodule.contentstore.django import contentstore
-from xmodule.contentstore.content import StaticContent, XASSET_LOCATION_TAG
+from xmodule.contentstore.content import StaticContent, StaticContentStream, XASSET_LOCATION_TAG
 from xmodule.modulestore import InvalidLocationError
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.locator import AssetLocator
 from cache_toolbox.core import get_cached_content, set_cached_content
+from contentserver.disk_cache import get_disk_cache
 from xmodule.exceptions import NotFoundError
 
 # TODO: Soon as we have a reasonable way to serialize/deserialize AssetKeys, we need
@@ -55,6 +60,9 @@ class StaticContentServer(object):
                         # since we've queried as a stream, let's read in the stream into memory to set in cache
                         content = content.copy_to_in_mem()
                         set_cached_content(content)
+                    elif get_disk_cache() is not None:
+                        # larger content is served from a copy on local disk, if there is one
+                        content = get_disk_cache().get(content) or content
             else:
                 # NOP here, but we may wish to add a "cache-hit" counter in the future
                 pass
@@ -73,16 +81,32 @@ class StaticContentServer(object):
                     ):
                         return HttpResponseForbidden('Unauthorized')
 
-            # convert over the DB persistent last modified timestamp to a HTTP compatible
-            # timestamp, so we can simply compare the strings
-            last_modified_at_str = content.last_modified_at.strftime("%a, %d-%b-%Y %H:%M:%S GMT")
+            # the DB persistent last modified timestamp is in UTC
+            last_modified_at = calendar.timegm(content.last_modified_at.utctimetuple())
 
-            # see if the client has cached this content, if so then compare the
-            # timestamps, if they are the same then just return a 304 (Not Modified)
-            if 'HTTP_IF_MODIFIED_SINCE' in request.META:
-                if_modified_since = request.META['HTTP_IF_MODIFIED_SINCE']
-                if if_modified_since == last_modified_at_str:
-                    return HttpResponseNotModified()
+            # the md5 that GridFS keeps of the content makes a strong validator
+            content_digest = getattr(content, 'content_digest', None)
+            etag = '"{}"'.format(content_digest) if content_digest else None
+
+            # Locked content mustn't be kept by shared caches (CDNs); other
+            # content may be, for STATIC_CONTENT_MAX_AGE seconds
+            if getattr(content, 'locked', False):
+                cache_control = 'private, no-cache'
+            else:
+                cache_control = 'public, max-age={}'.format(settings.STATIC_CONTENT_MAX_AGE)
+
+            # see if the client has cached this content, if so then just return
+            # a 304 (Not Modified). If-Modified-Since is ignored when there is
+            # an If-None-Match (http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.26)
+            if 'HTTP_IF_NONE_MATCH' in request.META:
+                not_modified = etag is not None and etag_matches(request.META['HTTP_IF_NONE_MATCH'], etag)
+            else:
+                if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+                not_modified = if_modified_since is not None and last_modified_at <= if_modified_since
+            if not_modified:
+                response = HttpResponseNotModified()
+                set_cache_headers(response, last_modified_at, etag, cache_control)
+                return response
 
             # *** File streaming within a byte range ***
             # If a Range is provided, parse Range attribute of the request
@@ -92,9 +116,13 @@ class StaticContentServer(object):
             # http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.35
             response = None
             if request.META.get('HTTP_RANGE'):
-                # Data from cache (StaticContent) has no easy byte management, so we use the DB instead (StaticContentStream)
+                # Data from cache (StaticContent) is already in memory, so stream the range from there
                 if type(content) == StaticContent:
-                    content = contentstore().find(loc, as_stream=True)
+                    content = StaticContentStream(
+                        content.location, content.name, content.content_type, StringIO.StringIO(content.data),
+                        last_modified_at=content.last_modified_at, thumbnail_location=content.thumbnail_location,
+                        import_path=content.import_path, length=content.length, locked=content.locked
+                    )
 
                 header_value = request.META['HTTP_RANGE']
                 try:
@@ -140,11 +168,41 @@ class StaticContentServer(object):
             # "Accept-Ranges: bytes" tells the user that only "bytes" ranges are allowed
             response['Accept-Ranges'] = 'bytes'
             response['Content-Type'] = content.content_type
-            response['Last-Modified'] = last_modified_at_str
+            set_cache_headers(response, last_modified_at, etag, cache_control)
 
             return response
 
 
+def set_cache_headers(response, last_modified_at, etag, cache_control):
+    """
+    Sets the headers that let clients and shared caches keep and revalidate content.
+    """
+    response['Last-Modified'] = http_date(last_modified_at)
+    if etag is not None:
+        response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+
+
+def etag_matches(header_value, etag):
+    """
+    Returns whether `etag` is one of the entity tags of an If-None-Match header.
+
+    If-None-Match uses the weak comparison function, so tags match even if
+    marked weak ("W/") by a cache that has modified the content's encoding.
+
+    See spec for details: http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.26
+    """
+    for entity_tag in header_value.split(','):
+        entity_tag = entity_tag.strip()
+        if entity_tag == '*':
+            return True
+        if entity_tag.startswith('W/'):
+            entity_tag = entity_tag[2:]
+        if entity_tag == etag:
+            return True
+    return False
+
+
 def parse_range_header(header_value, content_length):
     """
     Returns the unit and a list of (start, end) tuples of ranges.
@@ -4,12 +4,14 @@ Tests for StaticContentServer
 import copy
 import ddt
 import logging
+import time
 import unittest
 from uuid import uuid4
 
 from django.conf import settings
 from django.test.client import Client
 from django.test.utils import override_settings
+from django.utils.http import http_date, parse_http_date
 
 from xmodule.contentstore.django import contentstore
 from xmodule.modulestore.django import modulestore
@@ -189,6 +191,64 @@ class ContentStoreToyCourseTest(ModuleStoreTestCase):
         )
         self.assertEqual(resp.status_code, 416)
 
+    def test_cache_headers(self):
+        """
+        Test that unlocked assets can be kept by shared caches, and locked assets can't.
+        """
+        resp = self.client.get(self.url_unlocked)
+        self.assertEqual(resp['ETag'], '"{}"'.format(self.contentstore.get_attr(self.unlocked_asset, 'md5')))
+        self.assertEqual(resp['Cache-Control'], 'public, max-age={}'.format(settings.STATIC_CONTENT_MAX_AGE))
+
+        self.client.login(username=self.staff_usr, password=self.staff_pwd)
+        resp = self.client.get(self.url_locked)
+        self.assertEqual(resp['Cache-Control'], 'private, no-cache')
+
+    @ddt.data('{etag}', 'W/{etag}', '"other", {etag}', '*')
+    def test_if_none_match(self, header_value):
+        """
+        Test that an If-None-Match with the content's ETag gets a 304 Not Modified.
+        """
+        etag = self.client.get(self.url_unlocked)['ETag']
+
+        resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH=header_value.format(etag=etag))
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+
+    def test_if_none_match_other_etag(self):
+        """
+        Test that an If-None-Match with another ETag gets the content, even if
+        it hasn't been modified since If-Modified-Since.
+        """
+        last_modified = self.client.get(self.url_unlocked)['Last-Modified']
+
+        resp = self.client.get(
+            self.url_unlocked, HTTP_IF_NONE_MATCH='"other"', HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(resp.status_code, 200)
+
+    @ddt.data(0, 3600)
+    def test_if_modified_since(self, seconds_later):
+        """
+        Test that an If-Modified-Since at or after the Last-Modified gets a 304
+        Not Modified, whatever its date format.
+        """
+        last_modified = parse_http_date(self.client.get(self.url_unlocked)['Last-Modified'])
+
+        # in asctime format, one of those HTTP/1.1 allows
+        resp = self.client.get(
+            self.url_unlocked, HTTP_IF_MODIFIED_SINCE=time.asctime(time.gmtime(last_modified + seconds_later))
+        )
+        self.assertEqual(resp.status_code, 304)
+
+    def test_modified_since(self):
+        """
+        Test that an If-Modified-Since before the Last-Modified gets the content.
+        """
+        last_modified = parse_http_date(self.client.get(self.url_unlocked)['Last-Modified'])
+
+        resp = self.client.get(self.url_unlocked, HTTP_IF_MODIFIED_SINCE=http_date(last_modified - 1))
+        self.assertEqual(resp.status_code, 200)
+
 
 @ddt.ddt
 class ParseRangeHeaderTestCase(unittest.TestCase):
@@ -0,0 +1,140 @@
+"""
+Tests for contentserver.disk_cache
+"""
+from datetime import datetime
+import os
+import shutil
+import StringIO
+import tempfile
+import unittest
+
+from mock import patch
+from opaque_keys.edx.locations import SlashSeparatedCourseKey
+from xmodule.contentstore.content import StaticContentStream
+
+from contentserver.disk_cache import AssetDiskCache, TEMP_FILE_SUFFIX
+
+
+def make_content(name, data, last_modified_at=datetime(2014, 1, 1)):
+    """
+    Returns a StaticContentStream of `data`, as the contentstore does.
+    """
+    location = SlashSeparatedCourseKey('edX', 'toy', '2012_Fall').make_asset_key('asset', name)
+    return StaticContentStream(
+        location, name, 'video/mp4', StringIO.StringIO(data),
+        last_modified_at=last_modified_at, length=len(data)
+    )
+
+
+class SynchronousThread(object):
+    """
+    A thread that runs its target as soon as it is started.
+    """
+    def __init__(self, target, args=()):
+        self.target = target
+        self.args = args
+        self.daemon = False
+
+    def start(self):
+        """Runs the target."""
+        self.target(*self.args)
+
+
+class AssetDiskCacheTestCase(unittest.TestCase):
+    """
+    Tests of copying assets to, and serving them from, local disk.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.disk_cache = AssetDiskCache(self.directory, max_size=100)
+
+        # the contents of the contentstore, by name
+        self.assets = {}
+        patcher = patch('contentserver.disk_cache.contentstore')
+        self.contentstore = patcher.start()
+        self.contentstore().find.side_effect = lambda location, as_stream: make_content(*self.assets[location.name])
+        self.addCleanup(patcher.stop)
+
+        patcher = patch('contentserver.disk_cache.threading.Thread', SynchronousThread)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def serve(self, name, data, last_modified_at=datetime(2014, 1, 1)):
+        """
+        Returns what the disk cache serves for the asset `name`, after saving it to the contentstore.
+        """
+        self.assets[name] = (name, data, last_modified_at)
+        return self.disk_cache.get(make_content(name, data, last_modified_at))
+
+    def test_copied_in_background(self):
+        # served from the contentstore while it is copied
+        self.assertIsNone(self.serve('video.mp4', 'a' * 40))
+
+        # served from the local copy, even if the stream isn't read
+        local_content = self.disk_cache.get(make_content('video.mp4', ''))
+        self.assertEqual(''.join(local_content.stream_data()), 'a' * 40)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_range(self):
+        self.serve('video.mp4', '0123456789')
+
+        local_content = self.serve('video.mp4', '0123456789')
+        self.assertEqual(''.join(local_content.stream_data_in_range(2, 5)), '2345')
+
+    def test_new_version(self):
+        self.serve('video.mp4', 'old')
+
+        self.assertIsNone(self.serve('video.mp4', 'new', datetime(2014, 2, 1)))
+        local_content = self.serve('video.mp4', 'new', datetime(2014, 2, 1))
+        self.assertEqual(''.join(local_content.stream_data()), 'new')
+
+    def test_changed_while_copied(self):
+        content = make_content('video.mp4', 'old')
+        self.assets['video.mp4'] = ('video.mp4', 'new', datetime(2014, 2, 1))
+        self.disk_cache.get(content)
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_least_recently_used_evicted(self):
+        self.serve('first.mp4', 'a' * 40)
+        self.serve('second.mp4', 'b' * 40)
+        # mark second.mp4 as the least recently used
+        os.utime(self.disk_cache._path(make_content('second.mp4', '')), (0, 0))  # pylint: disable=protected-access
+
+        self.serve('third.mp4', 'c' * 40)
+
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        local_content = self.disk_cache.get(make_content('first.mp4', ''))
+        self.assertEqual(''.join(local_content.stream_data()), 'a' * 40)
+
+    def test_too_large(self):
+        self.assertIsNone(self.serve('video.mp4', 'a' * 101))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_copied_by_one_process(self):
+        content = make_content('video.mp4', 'a' * 40)
+        # another process is copying it
+        temp_path = self.disk_cache._path(content) + TEMP_FILE_SUFFIX  # pylint: disable=protected-access
+        open(temp_path, 'wb').close()
+
+        self.assertIsNone(self.serve('video.mp4', 'a' * 40))
+        self.assertFalse(self.contentstore().find.called)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(temp_path)])
+
+    def test_abandoned_copy(self):
+        content = make_content('video.mp4', 'a' * 40)
+        temp_path = self.disk_cache._path(content) + TEMP_FILE_SUFFIX  # pylint: disable=protected-access
+        open(temp_path, 'wb').close()
+        os.utime(temp_path, (0, 0))
+
+        self.assertIsNone(self.serve('video.mp4', 'a' * 40))
+        self.assertIsNone(self.serve('video.mp4', 'a' * 40))
+        local_content = self.serve('video.mp4', 'a' * 40)
+        self.assertEqual(''.join(local_content.stream_data()), 'a' * 40)
+
+    def test_store_failure(self):
+        with patch('contentserver.disk_cache.os.rename', side_effect=OSError):
+            self.assertIsNone(self.serve('video.mp4', 'a' * 40))
+
+        self.assertEqual(os.listdir(self.directory), [])
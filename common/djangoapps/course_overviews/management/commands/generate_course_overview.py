@@ -0,0 +1,51 @@
+"""
+A Django command that loads the overviews (course_overviews.models.CourseOverview)
+of courses from the modulestore and stores them.
+
+With no arguments, the overview of every course is generated. Courses
+published after course_overviews was deployed already have one, but courses
+that haven't been published since are only listed once this has been run.
+"""
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from course_overviews.models import CourseOverview
+from xmodule.modulestore.django import modulestore
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+from opaque_keys.edx.locations import SlashSeparatedCourseKey
+
+
+class Command(BaseCommand):
+    """
+    Generate the overviews of some or all courses.
+    """
+    args = "[<course_id> ...]"
+    help = dedent(__doc__).strip()
+
+    def handle(self, *args, **options):
+        if args:
+            course_keys = [self._parse_course_key(arg) for arg in args]
+        else:
+            course_keys = [course.id for course in modulestore().get_courses()]
+
+        # Stored overviews are loaded again too, so that this also repairs them
+        CourseOverview.objects.filter(id__in=course_keys).update(version=F('version') + 1)
+        overviews = CourseOverview.get_select_courses(course_keys)
+
+        self.stdout.write(u"Generated {} course overviews, {} courses not found\n".format(
+            len(overviews), len(course_keys) - len(overviews)
+        ))
+
+    @staticmethod
+    def _parse_course_key(course_id):
+        """Returns the CourseKey of the string `course_id`."""
+        try:
+            return CourseKey.from_string(course_id)
+        except InvalidKeyError:
+            try:
+                return SlashSeparatedCourseKey.from_deprecated_string(course_id)
+            except InvalidKeyError:
+                raise CommandError(u"Invalid course_id {}".format(course_id))
@@ -0,0 +1,331 @@
+"""
+Models for course overviews
+
+A CourseOverview is a summary of a course: the few fields that course
+listings (the course catalog and the mobile API) show about every course.
+Listings read them from one table, rather than loading every course from
+the modulestore.
+
+Overviews are kept up to date by the modulestore's course_published and
+course_deleted signals (see xmodule.modulestore.django.SignalHandler), and
+are loaded from the modulestore again the next time they are read after a
+course changes. Overviews of existing courses can be generated up front
+with the generate_course_overview management command.
+
+If you make changes to this model, be sure to create an appropriate migration
+file and check it in at the same time as your model changes. To do that,
+
+1. Go to the edx-platform dir
+2. ./manage.py lms schemamigration course_overviews --auto description_of_your_change
+3. It adds the migration file to edx-platform/common/djangoapps/course_overviews/migrations/
+
+"""
+from datetime import datetime
+import logging
+
+from django.db import models, IntegrityError
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils.timezone import UTC
+
+from xmodule_django.models import CourseKeyField
+from xmodule.course_module import (
+    CourseDescriptor, course_is_newish, course_sorting_score,
+    course_start_date_is_still_default, course_start_date_text,
+)
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.django import modulestore, ModuleI18nService, SignalHandler
+
+log = logging.getLogger(__name__)
+
+
+class CourseOverview(models.Model):
+    """
+    A summary of a course, which can be used in place of its CourseDescriptor
+    wherever only the fields below are needed.
+
+    `version` is incremented whenever the course changes, and `loaded_version`
+    is the version the other fields were loaded from the modulestore at; the
+    overview is out of date when they differ.
+    """
+
+    # Course identification
+    id = CourseKeyField(db_index=True, primary_key=True, max_length=255)  # pylint: disable=invalid-name
+    org = models.CharField(max_length=255, db_index=True)
+
+    version = models.IntegerField(default=0)
+    loaded_version = models.IntegerField(default=0)
+
+    # Display
+    display_name = models.TextField(null=True)
+    display_number_with_default = models.TextField(default='')
+    display_org_with_default = models.TextField(default='')
+    course_image_url = models.TextField(default='')
+    static_asset_path = models.TextField(default='')
+    is_new = models.NullBooleanField()
+
+    # Dates
+    start = models.DateTimeField(null=True)
+    end = models.DateTimeField(null=True)
+    advertised_start = models.TextField(null=True)
+    announcement = models.DateTimeField(null=True)
+    days_early_for_beta = models.FloatField(null=True)
+
+    # Enrollment and visibility
+    enrollment_start = models.DateTimeField(null=True)
+    enrollment_end = models.DateTimeField(null=True)
+    enrollment_domain = models.TextField(null=True)
+    invitation_only = models.BooleanField(default=False)
+    ispublic = models.NullBooleanField()
+    visible_to_staff_only = models.BooleanField(default=False)
+    mobile_available = models.BooleanField(default=False)
+
+    # The fields loaded from the modulestore
+    LOADED_FIELDS = (
+        'org', 'display_name', 'display_number_with_default', 'display_org_with_default',
+        'course_image_url', 'static_asset_path', 'is_new', 'start', 'end', 'advertised_start',
+        'announcement', 'days_early_for_beta', 'enrollment_start', 'enrollment_end',
+        'enrollment_domain', 'invitation_only', 'ispublic', 'visible_to_staff_only', 'mobile_available',
+    )
+
+    # Courses have no XBlock class tags (courseware.access checks them for 'detached')
+    _class_tags = frozenset()
+
+    @classmethod
+    def _create_from_course(cls, course):
+        """
+        Returns an unsaved CourseOverview of the CourseDescriptor `course`.
+        """
+        # Imported here, as courseware.courses imports this module
+        from courseware.courses import course_image_url
+
+        is_new = course.is_new
+        if isinstance(is_new, basestring):
+            is_new = is_new.lower() in ['true', 'yes', 'y']
+        elif is_new is not None:
+            is_new = bool(is_new)
+
+        return cls(
+            id=course.id,
+            org=course.location.org,
+            display_name=course.display_name,
+            display_number_with_default=course.display_number_with_default,
+            display_org_with_default=course.display_org_with_default,
+            course_image_url=course_image_url(course),
+            static_asset_path=course.static_asset_path,
+            is_new=is_new,
+            start=course.start,
+            end=course.end,
+            advertised_start=course.advertised_start,
+            announcement=course.announcement,
+            days_early_for_beta=course.days_early_for_beta,
+            enrollment_start=course.enrollment_start,
+            enrollment_end=course.enrollment_end,
+            enrollment_domain=course.enrollment_domain,
+            invitation_only=course.invitation_only,
+            ispublic=getattr(course, 'ispublic', None),
+            visible_to_staff_only=course.visible_to_staff_only,
+            mobile_available=course.mobile_available,
+        )
+
+    @classmethod
+    def _load_from_module_store(cls, course_key, version=None):
+        """
+        Loads the course from the modulestore, and returns its CourseOverview,
+        or None if there is no such course.
+
+        The overview is stored, unless the course is an XML course: those are
+        already in memory, and can change when the LMS restarts without
+        sending any signal. `version` is the version of the stored overview
+        that this one replaces, or None if there is no stored overview.
+        """
+        store = modulestore()
+        course = store.get_course(course_key)
+        if not isinstance(course, CourseDescriptor):
+            if version is not None:
+                cls.objects.filter(id=course_key, version=version).delete()
+            return None
+
+        overview = cls._create_from_course(course)
+        if store.get_modulestore_type(course_key) == ModuleStoreEnum.Type.xml:
+            return overview
+
+        overview.version = overview.loaded_version = version or 0
+        if version is None:
+            try:
+                overview.save(force_insert=True)
+            except IntegrityError:
+                # Another process stored it first
+                log.info(u"CourseOverview for %s was stored concurrently", course_key)
+        else:
+            # If the course changed again while it was being loaded, the
+            # version no longer matches, and the overview stays out of date
+            cls.objects.filter(id=course_key, version=version).update(
+                loaded_version=version,
+                **{name: getattr(overview, name) for name in cls.LOADED_FIELDS}
+            )
+        return overview
+
+    @classmethod
+    def get_version(cls, course_key):
+        """
+        Returns a number that changes whenever the published content of the
+        course changes, which data derived from the course can be cached by.
+        """
+        versions = cls.objects.filter(id=course_key).values_list('version', flat=True)
+        return versions[0] if versions else 0
+
+    def _is_out_of_date(self):
+        """
+        Returns whether the course has changed since this overview was loaded.
+        """
+        return self.loaded_version != self.version
+
+    @classmethod
+    def get_from_id(cls, course_key):
+        """
+        Returns the CourseOverview of the course `course_key`, loading it from
+        the modulestore if there isn't an up to date one, or None if there is
+        no such course.
+        """
+        try:
+            overview = cls.objects.get(id=course_key)
+        except cls.DoesNotExist:
+            return cls._load_from_module_store(course_key)
+
+        if overview._is_out_of_date():  # pylint: disable=protected-access
+            return cls._load_from_module_store(course_key, overview.version)
+        return overview
+
+    @classmethod
+    def get_select_courses(cls, course_keys):
+        """
+        Returns the CourseOverviews of the courses `course_keys`, in the same
+        order, skipping courses that don't exist.
+
+        Up to date overviews are read with a single query.
+        """
+        stored = {overview.id: overview for overview in cls.objects.filter(id__in=course_keys)}
+
+        overviews = []
+        for course_key in course_keys:
+            overview = stored.get(course_key)
+            if overview is None:
+                overview = cls._load_from_module_store(course_key)
+            elif overview._is_out_of_date():  # pylint: disable=protected-access
+                overview = cls._load_from_module_store(course_key, overview.version)
+
+            if overview is not None:
+                overviews.append(overview)
+        return overviews
+
+    @classmethod
+    def get_all_courses(cls):
+        """
+        Returns the CourseOverviews of all courses.
+
+        Courses in the modulestore that have never been published since
+        overviews were introduced are only included once
+        generate_course_overview has been run.
+        """
+        overviews = []
+        for overview in cls.objects.all():
+            if overview._is_out_of_date():  # pylint: disable=protected-access
+                overview = cls._load_from_module_store(overview.id, overview.version)
+            if overview is not None:
+                overviews.append(overview)
+
+        # XML courses aren't stored, see _load_from_module_store
+        for store in modulestore().modulestores:
+            if store.get_modulestore_type() == ModuleStoreEnum.Type.xml:
+                overviews.extend(
+                    cls._create_from_course(course)
+                    for course in store.get_courses()
+                    if isinstance(course, CourseDescriptor)
+                )
+        return overviews
+
+    @property
+    def location(self):
+        """
+        The location of the course's course block.
+        """
+        if self.id.deprecated:
+            return self.id.make_usage_key('course', self.id.run)
+        return self.id.make_usage_key('course', 'course')
+
+    @property
+    def number(self):
+        return self.id.course
+
+    @property
+    def url_name(self):
+        return self.location.name
+
+    @property
+    def display_name_with_default(self):
+        """
+        Return the display name of the course, or its url name when it has none.
+        """
+        name = self.display_name
+        if name is None:
+            name = self.url_name.replace('_', ' ')
+        return name.replace('<', '&lt;').replace('>', '&gt;')
+
+    def has_started(self):
+        return datetime.now(UTC()) > self.start
+
+    def has_ended(self):
+        """
+        Returns True if the current time is after the specified course end date.
+        Returns False if there is no end date specified.
+        """
+        if self.end is None:
+            return False
+
+        return datetime.now(UTC()) > self.end
+
+    @property
+    def is_newish(self):
+        return course_is_newish(self)
+
+    @property
+    def sorting_score(self):
+        return course_sorting_score(self)
+
+    @property
+    def start_date_is_still_default(self):
+        return course_start_date_is_still_default(self)
+
+    @property
+    def start_date_text(self):
+        return course_start_date_text(self, ModuleI18nService())
+
+    def __unicode__(self):
+        return unicode(self.id)
+
+
+@receiver(SignalHandler.course_published)
+def _listen_for_course_publish(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+    """
+    Marks the overview of a course that has been published as out of date.
+
+    Overviews aren't loaded here, as this runs while Studio writes to the
+    modulestore; they're loaded the next time they're read.
+    """
+    if CourseOverview.objects.filter(id=course_key).update(version=F('version') + 1):
+        return
+
+    # A new course, listed once it is loaded
+    try:
+        CourseOverview.objects.create(id=course_key, org=course_key.org, version=1)
+    except IntegrityError:
+        CourseOverview.objects.filter(id=course_key).update(version=F('version') + 1)
+
+
+@receiver(SignalHandler.course_deleted)
+def _listen_for_course_delete(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+    """
+    Deletes the overview of a course that has been deleted.
+    """
+    CourseOverview.objects.filter(id=course_key).delete()
@@ -0,0 +1,111 @@
+"""
+Tests for course_overviews.models.CourseOverview
+"""
+import unittest
+from datetime import datetime
+
+from django.conf import settings
+from django.test.utils import override_settings
+from django.utils.timezone import UTC
+
+from courseware.courses import course_image_url
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase, mixed_store_config
+from xmodule.modulestore.tests.factories import CourseFactory
+from opaque_keys.edx.locations import SlashSeparatedCourseKey
+
+from course_overviews.models import CourseOverview
+
+
+# Since we don't need any XML course fixtures, use a modulestore configuration
+# that disables the XML modulestore.
+MODULESTORE_CONFIG = mixed_store_config(settings.COMMON_TEST_DATA_ROOT, {}, include_xml=False)
+
+
+@override_settings(MODULESTORE=MODULESTORE_CONFIG)
+@unittest.skipUnless(settings.ROOT_URLCONF == 'lms.urls', 'Test only valid in lms')
+class CourseOverviewTest(ModuleStoreTestCase):
+    """
+    Tests of reading, storing and updating course overviews.
+    """
+    def setUp(self):
+        super(CourseOverviewTest, self).setUp()
+        self.course = CourseFactory.create(
+            org='overviewX',
+            display_name='Overview Course',
+            start=datetime(2014, 1, 1, tzinfo=UTC()),
+            end=datetime(2015, 1, 1, tzinfo=UTC()),
+            mobile_available=True,
+            invitation_only=True,
+        )
+
+    def test_fields(self):
+        overview = CourseOverview.get_from_id(self.course.id)
+
+        self.assertEqual(overview.id, self.course.id)
+        self.assertEqual(overview.location, self.course.location)
+        self.assertEqual(overview.org, self.course.location.org)
+        self.assertEqual(overview.number, self.course.number)
+        for name in (
+                'display_name', 'display_name_with_default', 'display_number_with_default',
+                'display_org_with_default', 'start', 'end', 'advertised_start', 'announcement',
+                'enrollment_start', 'enrollment_end', 'enrollment_domain', 'invitation_only',
+                'visible_to_staff_only', 'mobile_available', 'days_early_for_beta',
+                'is_newish', 'start_date_is_still_default', 'start_date_text',
+        ):
+            self.assertEqual(getattr(overview, name), getattr(self.course, name), name)
+        self.assertAlmostEqual(overview.sorting_score, self.course.sorting_score)
+        self.assertEqual(overview.has_started(), self.course.has_started())
+        self.assertEqual(overview.has_ended(), self.course.has_ended())
+        self.assertEqual(course_image_url(overview), course_image_url(self.course))
+
+    def test_stored(self):
+        CourseOverview.get_from_id(self.course.id)
+
+        # once stored, the overview is read without the modulestore
+        with self.assertNumQueries(1):
+            overview = CourseOverview.get_from_id(self.course.id)
+        self.assertEqual(overview.display_name, 'Overview Course')
+
+    def test_publish(self):
+        CourseOverview.get_from_id(self.course.id)
+
+        self.course.display_name = 'Renamed Course'
+        self.store.update_item(self.course, self.user.id)
+
+        self.assertEqual(CourseOverview.get_from_id(self.course.id).display_name, 'Renamed Course')
+        self.assertEqual(CourseOverview.objects.get(id=self.course.id).display_name, 'Renamed Course')
+
+    def test_publish_while_loading(self):
+        overview = CourseOverview.get_from_id(self.course.id)
+
+        # a publish between reading the version and storing the loaded
+        # fields leaves the overview out of date, to be loaded again
+        CourseOverview.objects.filter(id=self.course.id).update(version=overview.version + 2)
+        CourseOverview._load_from_module_store(self.course.id, overview.version + 1)  # pylint: disable=protected-access
+
+        self.assertTrue(CourseOverview.objects.get(id=self.course.id)._is_out_of_date())  # pylint: disable=protected-access
+
+    def test_delete(self):
+        CourseOverview.get_from_id(self.course.id)
+
+        self.store.delete_course(self.course.id, self.user.id)
+
+        self.assertFalse(CourseOverview.objects.filter(id=self.course.id).exists())
+        self.assertIsNone(CourseOverview.get_from_id(self.course.id))
+
+    def test_select_courses(self):
+        other_course = CourseFactory.create(org='overviewX', number='other')
+        missing_course_key = SlashSeparatedCourseKey('overviewX', 'missing', 'run')
+
+        overviews = CourseOverview.get_select_courses([other_course.id, missing_course_key, self.course.id])
+
+        self.assertEqual([overview.id for overview in overviews], [other_course.id, self.course.id])
+
+    def test_all_courses(self):
+        other_course = CourseFactory.create(org='overviewX', number='other')
+
+        # courses created since course_overviews was installed are listed
+        self.assertEqual(
+            set(overview.id for overview in CourseOverview.get_all_courses()),
+            set([self.course.id, other_course.id])
+        )
@@ -32,7 +32,6 @@ EMBARGO_SITE_REDIRECT_URL = 'https://www.edx.org/'
 """
 from functools import partial
 import logging
-import pygeoip
 from lazy import lazy
 
 from django.core.exceptions import MiddlewareNotUsed
@@ -41,6 +40,7 @@ from django.conf import settings
 from django.shortcuts import redirect
 from django.http import HttpResponseRedirect, HttpResponseForbidden
 from ipware.ip import get_ip
+from geoinfo.lookup import country_code_by_addr
 from util.request import course_id_from_url
 
 from student.models import unique_id_for_user
@@ -193,10 +193,7 @@ class EmbargoMiddleware(object):
             str: A 2-letter country code.
 
         """
-        if ip_addr.find(':') >= 0:
-            return pygeoip.GeoIP(settings.GEOIPV6_PATH).country_code_by_addr(ip_addr)
-        else:
-            return pygeoip.GeoIP(settings.GEOIP_PATH).country_code_by_addr(ip_addr)
+        return country_code_by_addr(ip_addr)
 
     @property
     def _embargo_redirect_response(self):
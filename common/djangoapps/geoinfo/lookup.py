@@ -0,0 +1,88 @@
+"""
+Country lookups by IP address, shared by the geoinfo and embargo middlewares.
+
+Each GeoIP database is opened once per process, memory mapped, and reused by
+every request. The most recently looked up addresses are also remembered, so
+that repeat visitors don't need a lookup at all.
+
+Usage:
+
+    from geoinfo.lookup import country_code_by_addr
+    country_code = country_code_by_addr(ip_address)
+
+"""
+from collections import OrderedDict
+import threading
+
+import pygeoip
+
+from django.conf import settings
+
+# The number of addresses to remember when GEOIP_COUNTRY_CACHE_SIZE isn't set
+DEFAULT_COUNTRY_CACHE_SIZE = 10000
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+_country_codes = OrderedDict()
+_country_codes_lock = threading.Lock()
+
+
+def _database_path(ip_addr):
+    """
+    Returns the path of the GeoIP database that covers `ip_addr`.
+    """
+    if ip_addr.find(':') >= 0:
+        return str(settings.GEOIPV6_PATH)
+    else:
+        return str(settings.GEOIP_PATH)
+
+
+def get_reader(path):
+    """
+    Returns the process-wide reader of the GeoIP database at `path`, opening it on first use.
+    """
+    reader = _readers.get(path)
+    if reader is None:
+        with _readers_lock:
+            reader = _readers.get(path)
+            if reader is None:
+                reader = _readers[path] = pygeoip.GeoIP(path, pygeoip.MMAP_CACHE)
+    return reader
+
+
+def country_code_by_addr(ip_addr):
+    """
+    Return the country code associated with an IP address.
+    Handles both IPv4 and IPv6 addresses.
+
+    Args:
+        ip_addr (str): The IP address to look up.
+
+    Returns:
+        str: A 2-letter country code, or an empty value if the address is unknown.
+
+    """
+    with _country_codes_lock:
+        if ip_addr in _country_codes:
+            country_code = _country_codes.pop(ip_addr)
+            _country_codes[ip_addr] = country_code
+            return country_code
+
+    country_code = get_reader(_database_path(ip_addr)).country_code_by_addr(ip_addr)
+
+    size = getattr(settings, 'GEOIP_COUNTRY_CACHE_SIZE', DEFAULT_COUNTRY_CACHE_SIZE)
+    if size > 0:
+        with _country_codes_lock:
+            _country_codes[ip_addr] = country_code
+            while len(_country_codes) > size:
+                _country_codes.popitem(last=False)
+    return country_code
+
+
+def clear_country_cache():
+    """
+    Forget all remembered country lookups, e.g. after the GeoIP databases have changed.
+    """
+    with _country_codes_lock:
+        _country_codes.clear()
@@ -0,0 +1,58 @@
+"""
+Tests for the shared country lookups.
+"""
+
+from mock import patch
+import pygeoip
+
+from django.conf import settings
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from geoinfo.lookup import clear_country_cache, country_code_by_addr, get_reader
+
+
+class CountryLookupTests(TestCase):
+    """
+    Tests of country_code_by_addr.
+    """
+    def setUp(self):
+        clear_country_cache()
+        self.patcher = patch.object(pygeoip.GeoIP, 'country_code_by_addr', return_value='CN')
+        self.mock_country_code_by_addr = self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        clear_country_cache()
+
+    def test_reader_is_shared(self):
+        path = str(settings.GEOIP_PATH)
+        self.assertIs(get_reader(path), get_reader(path))
+        self.assertIsNot(get_reader(path), get_reader(str(settings.GEOIPV6_PATH)))
+
+    def test_lookups_are_remembered(self):
+        self.assertEqual(country_code_by_addr('117.79.83.1'), 'CN')
+        self.assertEqual(country_code_by_addr('117.79.83.1'), 'CN')
+        self.assertEqual(self.mock_country_code_by_addr.call_count, 1)
+
+        clear_country_cache()
+        self.assertEqual(country_code_by_addr('117.79.83.1'), 'CN')
+        self.assertEqual(self.mock_country_code_by_addr.call_count, 2)
+
+    @override_settings(GEOIP_COUNTRY_CACHE_SIZE=2)
+    def test_least_recently_used_is_forgotten(self):
+        for ip_addr in ('1.0.0.0', '2.0.0.0', '1.0.0.0', '3.0.0.0'):
+            country_code_by_addr(ip_addr)
+        self.assertEqual(self.mock_country_code_by_addr.call_count, 3)
+
+        # 2.0.0.0 was the least recently used address when 3.0.0.0 was added
+        country_code_by_addr('1.0.0.0')
+        self.assertEqual(self.mock_country_code_by_addr.call_count, 3)
+        country_code_by_addr('2.0.0.0')
+        self.assertEqual(self.mock_country_code_by_addr.call_count, 4)
+
+    @override_settings(GEOIP_COUNTRY_CACHE_SIZE=0)
+    def test_cache_disabled(self):
+        country_code_by_addr('117.79.83.1')
+        country_code_by_addr('117.79.83.1')
+        self.assertEqual(self.mock_country_code_by_addr.call_count, 2)
@@ -13,6 +13,7 @@ from student.models import CourseEnrollment
 from student.tests.factories import UserFactory, AnonymousUserFactory
 
 from django.contrib.sessions.middleware import SessionMiddleware
+from geoinfo.lookup import clear_country_cache
 from geoinfo.middleware import CountryMiddleware
 
 
@@ -29,6 +30,8 @@ class CountryMiddlewareTests(TestCase):
         self.request_factory = RequestFactory()
         self.patcher = patch.object(pygeoip.GeoIP, 'country_code_by_addr', self.mock_country_code_by_addr)
         self.patcher.start()
+        # Lookups are remembered across requests, so forget those made with other fake IPs
+        clear_country_cache()
 
     def tearDown(self):
         self.patcher.stop()
@@ -51,6 +51,7 @@ from functools import total_ordering
 
 from certificates.models import GeneratedCertificate
 from course_modes.models import CourseMode
+from course_overviews.models import CourseOverview
 
 from ratelimitbackend import admin
 
@@ -1173,6 +1174,22 @@ class CourseEnrollment(models.Model):
     def course(self):
         return modulestore().get_course(self.course_id)
 
+    @property
+    def course_overview(self):
+        """
+        Returns the CourseOverview of the course, or None if the course doesn't exist.
+
+        Callers that have already read the overviews of many enrollments (see
+        CourseOverview.get_select_courses) can set it, to save a query each.
+        """
+        if not hasattr(self, '_course_overview'):
+            self._course_overview = CourseOverview.get_from_id(self.course_id)
+        return self._course_overview
+
+    @course_overview.setter
+    def course_overview(self, overview):
+        self._course_overview = overview  # pylint: disable=attribute-defined-outside-init
+
 
 class CourseEnrollmentAllowed(models.Model):
     """
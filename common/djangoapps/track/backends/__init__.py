@@ -26,3 +26,12 @@ class BaseBackend(object):
     def send(self, event):
         """Send event to tracker."""
         pass
+
+    def send_batch(self, events):
+        """Send a list of events to tracker, for backends that can do better than one at a time."""
+        for event in events:
+            self.send(event)
+
+    def close(self):
+        """Release any resources held by the backend, once it will no longer be sent events."""
+        pass
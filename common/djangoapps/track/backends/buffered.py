@@ -0,0 +1,178 @@
+"""
+Event tracker backend that sends events to another backend from a
+background thread, in batches.
+
+``track.tracker.send`` calls every backend on the request thread, so a
+slow backend slows down every request that emits an event. Wrapping it
+in a ``BufferedBackend`` only costs a queue insert per event::
+
+  TRACKING_BACKENDS = {
+      'mongo': {
+          'ENGINE': 'track.backends.buffered.BufferedBackend',
+          'OPTIONS': {
+              'backend': {
+                  'ENGINE': 'track.backends.mongodb.MongoBackend',
+                  'OPTIONS': {...}
+              },
+              'max_batch_size': 100,
+              'max_latency': 1.0,
+              'max_queue_size': 10000,
+              'overflow': 'drop',
+          }
+      }
+  }
+
+"""
+
+from __future__ import absolute_import
+
+import atexit
+import logging
+import os
+import Queue
+import threading
+import time
+
+from dogapi import dog_stats_api
+
+from track.backends import BaseBackend
+
+
+log = logging.getLogger(__name__)
+
+# What to do with an event when the queue is full
+OVERFLOW_DROP = 'drop'
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_SEND = 'send'
+OVERFLOW_POLICIES = (OVERFLOW_DROP, OVERFLOW_BLOCK, OVERFLOW_SEND)
+
+# Put in the queue to stop the background thread
+_STOP = object()
+
+
+class BufferedBackend(BaseBackend):
+    """
+    Event tracker backend that queues events, and sends them to another
+    backend in batches from a background thread.
+
+    Events that are still queued when the process exits are sent before
+    it does.
+
+    """
+
+    def __init__(self, backend, max_batch_size=100, max_latency=1.0, max_queue_size=10000,
+                 overflow=OVERFLOW_DROP, shutdown_timeout=5.0, **kwargs):
+        """
+        :Parameters:
+
+          - `backend`: the configuration of the backend to send events
+            to, with the same 'ENGINE' and 'OPTIONS' as in
+            TRACKING_BACKENDS
+          - `max_batch_size`: the most events sent to the backend at once
+          - `max_latency`: the most seconds an event waits in the queue
+            before being sent, unless the backend is falling behind
+          - `max_queue_size`: the most events waiting to be sent
+          - `overflow`: what to do with an event when the queue is
+            full: 'drop' it, 'block' until there is room for it, or
+            'send' it to the backend straight away
+          - `shutdown_timeout`: the most seconds to spend sending
+            queued events when the process exits
+
+        """
+        super(BufferedBackend, self).__init__(**kwargs)
+
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('Invalid overflow policy %s' % overflow)
+
+        # Imported here, as track.tracker instantiates backends when it is imported
+        from track.tracker import _instantiate_backend_from_name  # pylint: disable=protected-access
+        self.backend = _instantiate_backend_from_name(backend['ENGINE'], backend.get('OPTIONS', {}))
+
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.overflow = overflow
+        self.shutdown_timeout = shutdown_timeout
+
+        self.queue = Queue.Queue(max_queue_size)
+        self._thread = None
+        self._thread_pid = None
+        self._thread_lock = threading.Lock()
+
+        atexit.register(self.close)
+
+    def send(self, event):
+        """Queue the event, to be sent by the background thread."""
+        self._ensure_thread()
+
+        if self.overflow == OVERFLOW_BLOCK:
+            self.queue.put(event)
+            return
+
+        try:
+            self.queue.put_nowait(event)
+        except Queue.Full:
+            if self.overflow == OVERFLOW_SEND:
+                dog_stats_api.increment('track.buffered.overflow_sent')
+                self.backend.send(event)
+            else:
+                dog_stats_api.increment('track.buffered.overflow_dropped')
+
+    def close(self):
+        """Send any queued events, and stop the background thread."""
+        with self._thread_lock:
+            thread = self._thread if self._thread_pid == os.getpid() else None
+            self._thread = self._thread_pid = None
+
+        if thread is not None and thread.is_alive():
+            try:
+                self.queue.put(_STOP, timeout=self.shutdown_timeout)
+            except Queue.Full:
+                log.warning('Could not stop the tracking log thread, queued events will be lost')
+                return
+            thread.join(self.shutdown_timeout)
+
+        self.backend.close()
+
+    def _ensure_thread(self):
+        """Start the background thread, unless it is already running in this process."""
+        # Threads don't survive a fork, so each forked worker needs its own
+        if self._thread_pid == os.getpid():
+            return
+
+        with self._thread_lock:
+            if self._thread_pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, name='BufferedBackend')
+                self._thread.daemon = True
+                self._thread.start()
+                self._thread_pid = os.getpid()
+
+    def _run(self):
+        """Send batches of queued events until told to stop."""
+        stopping = False
+        while not stopping:
+            event = self.queue.get()
+            if event is _STOP:
+                break
+
+            batch = [event]
+            deadline = time.time() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.time()
+                try:
+                    event = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except Queue.Empty:
+                    break
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+
+            self._send_batch(batch)
+
+    def _send_batch(self, batch):
+        """Send a batch of events to the backend, logging rather than raising any error."""
+        try:
+            with dog_stats_api.timer('track.buffered.send_batch'):
+                self.backend.send_batch(batch)
+        except Exception:  # pylint: disable=broad-except
+            log.exception('Error sending %d events to the tracking backend', len(batch))
@@ -0,0 +1,99 @@
+from __future__ import absolute_import
+
+import threading
+
+from django.test import TestCase
+
+from track.backends import BaseBackend
+from track.backends.buffered import BufferedBackend
+
+
+def buffered_backend(**options):
+    """Returns a BufferedBackend that sends events to a RecordingBackend."""
+    backend = BufferedBackend(backend={'ENGINE': 'track.tests.test_tracker.DummyBackend'}, **options)
+    backend.backend = RecordingBackend()
+    return backend
+
+
+class TestBufferedBackend(TestCase):
+    def test_events_are_sent_in_batches(self):
+        backend = buffered_backend(max_batch_size=3, max_latency=10)
+        # Hold up the background thread until all the events are queued
+        backend.backend.ready.clear()
+
+        events = [{'test': i} for i in xrange(7)]
+        for event in events:
+            backend.send(event)
+        backend.backend.ready.set()
+        backend.close()
+
+        self.assertEqual(backend.backend.events, events)
+        self.assertTrue(all(len(batch) <= 3 for batch in backend.backend.batches))
+        self.assertGreater(len(backend.backend.batches[0]), 1)
+        self.assertTrue(backend.backend.closed)
+
+    def test_events_are_sent_after_max_latency(self):
+        backend = buffered_backend(max_batch_size=100, max_latency=0.01)
+
+        backend.send({'test': 1})
+        self.assertTrue(backend.backend.sent.wait(5))
+        self.assertEqual(backend.backend.events, [{'test': 1}])
+        backend.close()
+
+    def test_overflow_drop(self):
+        backend = buffered_backend(max_queue_size=1, max_latency=0.01, overflow='drop')
+        backend.backend.ready.clear()
+
+        # The first event is taken by the background thread, which then waits
+        backend.send({'test': 1})
+        self.assertTrue(backend.backend.waiting.wait(5))
+        backend.send({'test': 2})
+        backend.send({'test': 3})
+        backend.backend.ready.set()
+        backend.close()
+
+        self.assertEqual(backend.backend.events, [{'test': 1}, {'test': 2}])
+
+    def test_overflow_send(self):
+        backend = buffered_backend(max_queue_size=1, max_latency=0.01, overflow='send')
+        backend.backend.ready.clear()
+
+        backend.send({'test': 1})
+        self.assertTrue(backend.backend.waiting.wait(5))
+        backend.send({'test': 2})
+        backend.send({'test': 3})
+        self.assertEqual(backend.backend.events, [{'test': 3}])
+        backend.backend.ready.set()
+        backend.close()
+
+        self.assertEqual(backend.backend.events, [{'test': 3}, {'test': 1}, {'test': 2}])
+
+    def test_invalid_overflow(self):
+        with self.assertRaises(ValueError):
+            buffered_backend(overflow='explode')
+
+
+class RecordingBackend(BaseBackend):
+    """Records the batches of events it is sent, once `ready` is set."""
+    def __init__(self, **options):
+        super(RecordingBackend, self).__init__(**options)
+        self.events = []
+        self.batches = []
+        self.closed = False
+        self.ready = threading.Event()
+        self.ready.set()
+        self.waiting = threading.Event()
+        self.sent = threading.Event()
+
+    def send(self, event):
+        self.events.append(event)
+
+    def send_batch(self, events):
+        self.waiting.set()
+        self.ready.wait()
+        self.batches.append(events)
+        self.events.extend(events)
+        self.sent.set()
+
+    def close(self):
+        self.closed = True
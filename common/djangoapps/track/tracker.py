@@ -16,6 +16,9 @@ below::
       }
   }
 
+To send events from a background thread, in batches, wrap a backend
+in ``track.backends.buffered.BufferedBackend``.
+
 """
 
 import inspect
@@ -40,6 +43,8 @@ def _initialize_backends_from_django_settings():
     configuration in django settings
 
     """
+    for backend in backends.itervalues():
+        backend.close()
     backends.clear()
 
     config = getattr(settings, 'TRACKING_BACKENDS', {})
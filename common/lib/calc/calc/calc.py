@@ -2,11 +2,17 @@
 Parser and evaluator for FormulaResponse and NumericalResponse
 
 Uses pyparsing to parse. Main function as of now is evaluator().
+
+Parsed expressions are compiled and cached by compile_expression(), so that
+evaluating the same expression again, e.g. for each of a FormulaResponse's
+samples, doesn't parse it again.
 """
 
+from collections import OrderedDict
 import math
 import operator
 import numbers
+import threading
 import numpy
 import scipy.constants
 import functions
@@ -72,6 +78,9 @@ SUFFIXES = {
     'c': 1e-2, 'm': 1e-3, 'u': 1e-6, 'n': 1e-9, 'p': 1e-12
 }
 
+# The number of compiled expressions to keep, most recently used first
+COMPILED_EXPRESSION_CACHE_SIZE = 1000
+
 
 class UndefinedVariable(Exception):
     """
@@ -228,34 +237,246 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     if math_expr.strip() == "":
         return float('nan')
 
-    # Parse the tree.
-    math_interpreter = ParseAugmenter(math_expr, case_sensitive)
-    math_interpreter.parse_algebra()
+    return compile_expression(math_expr, case_sensitive).evaluate(variables, functions)
 
-    # Get our variables together.
-    all_variables, all_functions = add_defaults(variables, functions, case_sensitive)
 
-    # ...and check them
-    math_interpreter.check_variables(all_variables, all_functions)
+def evaluate_samples(variables_list, functions, math_expr, case_sensitive=False):
+    """
+    Evaluate an expression once for each dictionary of variables in
+    `variables_list`; return the list of results.
 
-    # Create a recursion to evaluate the tree.
-    if case_sensitive:
-        casify = lambda x: x
-    else:
-        casify = lambda x: x.lower()  # Lowercase for case insens.
-
-    evaluate_actions = {
-        'number': eval_number,
-        'variable': lambda x: all_variables[casify(x[0])],
-        'function': lambda x: all_functions[casify(x[0])](x[1]),
-        'atom': eval_atom,
-        'power': eval_power,
-        'parallel': eval_parallel,
-        'product': eval_product,
-        'sum': eval_sum
-    }
+    The results are those `evaluator` would give for each dictionary, but
+    the expression is only parsed once, and evaluated for all the samples
+    at once where possible.
+    """
+    if math_expr.strip() == "":
+        return [float('nan')] * len(variables_list)
+
+    return compile_expression(math_expr, case_sensitive).evaluate_samples(variables_list, functions)
+
+
+_compiled_expressions = OrderedDict()
+_compiled_expressions_lock = threading.Lock()
+
+
+def compile_expression(math_expr, case_sensitive=False):
+    """
+    Parse an expression into a CompiledExpression, which can be evaluated
+    over and over again with different variables.
+
+    The most recently compiled expressions are cached, so this only parses
+    `math_expr` the first time it is seen.
+    """
+    key = (math_expr, case_sensitive)
+    with _compiled_expressions_lock:
+        if key in _compiled_expressions:
+            compiled = _compiled_expressions.pop(key)
+            _compiled_expressions[key] = compiled
+            return compiled
+
+    compiled = CompiledExpression(math_expr, case_sensitive)
+
+    with _compiled_expressions_lock:
+        _compiled_expressions[key] = compiled
+        while len(_compiled_expressions) > COMPILED_EXPRESSION_CACHE_SIZE:
+            _compiled_expressions.popitem(last=False)
+    return compiled
+
+
+class CompiledExpression(object):
+    """
+    A parsed expression, compiled into nested functions of the variables
+    and functions it uses.
+
+    The compiled functions apply the same operations, in the same order,
+    as `evaluator`'s actions on the parse tree, so they give the same
+    results. They also work on numpy arrays, which lets `evaluate_samples`
+    evaluate many sets of variables at once.
+    """
+    def __init__(self, math_expr, case_sensitive=False):
+        """
+        Parse and compile `math_expr`.
+
+        Raise a `pyparsing.ParseException` if it isn't a valid expression.
+        """
+        self.math_expr = math_expr
+        self.case_sensitive = case_sensitive
+
+        self.parse = ParseAugmenter(math_expr, case_sensitive)
+        self.parse.parse_algebra()
+
+        if case_sensitive:
+            self.casify = lambda x: x
+        else:
+            self.casify = lambda x: x.lower()  # Lowercase for case insens.
+
+        self.root = self.compile_node(self.parse.tree)
+
+    def evaluate(self, variables, functions):
+        """
+        Evaluate the expression, as `evaluator` does.
+        """
+        # Get our variables together.
+        all_variables, all_functions = add_defaults(variables, functions, self.case_sensitive)
 
-    return math_interpreter.reduce_tree(evaluate_actions)
+        # ...and check them
+        self.parse.check_variables(all_variables, all_functions)
+
+        return self.root(all_variables, all_functions)
+
+    def evaluate_samples(self, variables_list, functions):
+        """
+        Evaluate the expression once for each dictionary of variables in
+        `variables_list`, and return the list of results.
+
+        All the samples are evaluated at once, with each variable as a numpy
+        array of its values. If that isn't possible, e.g. when a function
+        only accepts scalars, or any sample would have raised an error or
+        floating point warning, each sample is evaluated separately instead,
+        so that the results and errors are always those of `evaluate`.
+        """
+        if not variables_list:
+            return []
+
+        names = set(variables_list[0])
+        if len(variables_list) == 1 or any(set(variables) != names for variables in variables_list):
+            return [self.evaluate(variables, functions) for variables in variables_list]
+
+        variable_arrays = {
+            name: numpy.array([variables[name] for variables in variables_list])
+            for name in names
+        }
+        all_variables, all_functions = add_defaults(variable_arrays, functions, self.case_sensitive)
+        self.parse.check_variables(all_variables, all_functions)
+
+        try:
+            with numpy.errstate(divide='raise', over='raise', invalid='raise', under='ignore'):
+                results = self.root(all_variables, all_functions)
+        except Exception:  # pylint: disable=broad-except
+            results = None
+        else:
+            if numpy.ndim(results) == 0:
+                # Nothing in the expression varies between samples
+                return [results] * len(variables_list)
+            if numpy.shape(results) == (len(variables_list),):
+                return list(results)
+
+        return [self.evaluate(variables, functions) for variables in variables_list]
+
+    def compile_node(self, node):
+        """
+        Return a function of (variables, functions) that evaluates `node`.
+        """
+        node_name = node.getName()
+        if node_name not in self.compile_actions:  # pragma: no cover
+            raise Exception(u"Unknown branch name '{}'".format(node_name))
+        return self.compile_actions[node_name](self, node)
+
+    def compile_number(self, node):
+        """
+        Numbers are evaluated as they are compiled.
+        """
+        value = eval_number(node)
+        return lambda variables, functions: value
+
+    def compile_variable(self, node):
+        """
+        Look up the variable.
+        """
+        name = self.casify(node[0])
+        return lambda variables, functions: variables[name]
+
+    def compile_function(self, node):
+        """
+        Call the function with its evaluated argument.
+        """
+        name = self.casify(node[0])
+        argument = self.compile_node(node[1])
+        return lambda variables, functions: functions[name](argument(variables, functions))
+
+    def compile_atom(self, node):
+        """
+        An atom wraps a single node, ignoring any parenthesis around it.
+        """
+        return next(self.compile_node(k) for k in node if isinstance(k, ParseResults))
+
+    def compile_power(self, node):
+        """
+        Exponentiate right to left, like `eval_power`.
+        """
+        # Ignore the '^' marks.
+        operands = [self.compile_node(k) for k in node if isinstance(k, ParseResults)]
+        if len(operands) == 1:
+            return operands[0]
+        operands.reverse()
+
+        def evaluate_power(variables, functions):
+            """Having reversed the operands, raise `b` to the power of `a`."""
+            return reduce(lambda a, b: b ** a, [operand(variables, functions) for operand in operands])
+        return evaluate_power
+
+    def compile_parallel(self, node):
+        """
+        Combine with the parallel resistors operator, like `eval_parallel`.
+        """
+        operands = [self.compile_node(k) for k in node if isinstance(k, ParseResults)]
+        if len(operands) == 1:
+            return operands[0]
+
+        def evaluate_parallel(variables, functions):
+            """Return NaN wherever there is a zero among the inputs."""
+            values = [operand(variables, functions) for operand in operands]
+            if not any(isinstance(value, numpy.ndarray) for value in values):
+                return eval_parallel(values)
+            zeros = reduce(numpy.logical_or, [numpy.equal(value, 0) for value in values])
+            if not numpy.any(zeros):
+                return 1. / sum(1. / value for value in values)
+            values = [numpy.where(zeros, 1., value) for value in values]
+            return numpy.where(zeros, float('nan'), 1. / sum(1. / value for value in values))
+        return evaluate_parallel
+
+    def compile_product(self, node):
+        """
+        Multiply the operands, like `eval_product`.
+        """
+        return self._compile_operations(node, 1.0, operator.mul, {'*': operator.mul, '/': operator.truediv})
+
+    def compile_sum(self, node):
+        """
+        Add the operands, keeping in mind their sign, like `eval_sum`.
+        """
+        return self._compile_operations(node, 0.0, operator.add, {'+': operator.add, '-': operator.sub})
+
+    def _compile_operations(self, node, initial, current_op, operators):
+        """
+        Apply the operator preceding each operand to the total, starting from
+        `initial`. An operand without an operator before it uses `current_op`.
+        """
+        operations = []
+        for token in node:
+            if isinstance(token, ParseResults):
+                operations.append((current_op, self.compile_node(token)))
+            else:
+                current_op = operators[token]
+
+        def evaluate_operations(variables, functions):
+            """Fold the operands into the total."""
+            total = initial
+            for operation, operand in operations:
+                total = operation(total, operand(variables, functions))
+            return total
+        return evaluate_operations
+
+    compile_actions = {
+        'number': compile_number,
+        'variable': compile_variable,
+        'function': compile_function,
+        'atom': compile_atom,
+        'power': compile_power,
+        'parallel': compile_parallel,
+        'product': compile_product,
+        'sum': compile_sum,
+    }
 
 
 class ParseAugmenter(object):
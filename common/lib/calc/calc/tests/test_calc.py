@@ -558,3 +558,52 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({'r1': 5}, {}, "r1+r2")
         with self.assertRaisesRegexp(calc.UndefinedVariable, 'r1 r3'):
             calc.evaluator(variables, {}, "r1*r3", case_sensitive=True)
+
+
+class EvaluateSamplesTest(unittest.TestCase):
+    """
+    Run tests for calc.evaluate_samples and the compiled expressions behind it
+    """
+    samples = [{'x': 1.0, 'y': 2.0}, {'x': -3.5, 'y': 0.25}, {'x': 0.0, 'y': 7.0}]
+
+    def assert_same_as_evaluator(self, math_expr, samples=None, functions=None):
+        """
+        Check that evaluating each sample gives the same result as `evaluator`
+        """
+        samples = self.samples if samples is None else samples
+        functions = {} if functions is None else functions
+        results = calc.evaluate_samples(samples, functions, math_expr)
+        expected = [calc.evaluator(variables, functions, math_expr) for variables in samples]
+        self.assertEqual(len(results), len(expected))
+        for result, value in zip(results, expected):
+            if numpy.isnan(value):
+                self.assertTrue(numpy.isnan(result), msg=math_expr)
+            else:
+                self.assertAlmostEqual(result, value, delta=1e-9 * max(1, abs(value)), msg=math_expr)
+
+    def test_expressions(self):
+        for math_expr in ('x + y', '-x^2 - 3*y/4', '2^y^x', 'x||y', 'sin(x) * e^y', 'x*j + y', '5k * x', '7'):
+            self.assert_same_as_evaluator(math_expr)
+
+    def test_falls_back_to_scalars(self):
+        # 1/0 raises for one of the samples
+        with self.assertRaises(ZeroDivisionError):
+            calc.evaluate_samples(self.samples, {}, '1/x')
+        # factorial only accepts scalars
+        self.assert_same_as_evaluator('fact(y)', samples=[{'y': 3.0}, {'y': 4.0}])
+        # sqrt of a negative number is nan, rather than an error
+        self.assert_same_as_evaluator('sqrt(x)')
+        self.assert_same_as_evaluator('arccot(x)')
+        # a custom function which doesn't accept arrays
+        self.assert_same_as_evaluator('f(x)', functions={'f': lambda x: x if x > 0 else -x})
+
+    def test_empty_and_undefined(self):
+        self.assertTrue(all(numpy.isnan(result) for result in calc.evaluate_samples(self.samples, {}, ' ')))
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'z'):
+            calc.evaluate_samples(self.samples, {}, 'x + z')
+
+    def test_compiled_expressions_are_cached(self):
+        compiled = calc.compile_expression('x + y')
+        self.assertIs(calc.compile_expression('x + y'), compiled)
+        self.assertIsNot(calc.compile_expression('x + y', case_sensitive=True), compiled)
+        self.assertEqual(compiled.evaluate({'x': 1.0, 'y': 2.0}, {}), 3.0)
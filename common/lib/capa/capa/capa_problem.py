@@ -13,11 +13,14 @@ Main module which shows problems (of "capa" type).
 This is used by capa_module.
 """
 
+from collections import OrderedDict
 from copy import deepcopy
 from datetime import datetime
+import hashlib
 import logging
 import os.path
 import re
+import threading
 
 from lxml import etree
 from pytz import UTC
@@ -58,6 +61,52 @@ html_problem_semantics = [
 
 log = logging.getLogger(__name__)
 
+# The number of parsed problems to keep, most recently used first.
+# Parsing and assigning ids don't depend on the seed, so every student's copy
+# of a problem can start from a copy of the same parsed problem.
+PARSED_PROBLEM_CACHE_SIZE = 500
+
+_parsed_problems = OrderedDict()
+_parsed_problems_lock = threading.Lock()
+
+
+class ParsedProblem(object):
+    """
+    The seed-independent part of building a LoncapaProblem: its text parsed
+    into a tree, with includes processed and ids assigned, and the responses
+    found in the tree.
+
+    Attributes:
+        problem_text: the problem text, with <startouttext/> and <endouttext/> replaced.
+        tree: the tree, which is never changed, as every problem gets a copy().
+        responses: (position in tree.iter(), responsetype class, positions of input fields)
+            for each response.
+        includes: (filename, modification time) for each included file.
+    """
+    def __init__(self, problem_text, tree, responses, includes):
+        self.problem_text = problem_text
+        self.tree = tree
+        positions = dict((element, position) for position, element in enumerate(tree.iter()))
+        self.responses = [
+            (positions[response], responsetype_cls, [positions[inputfield] for inputfield in inputfields])
+            for response, responsetype_cls, inputfields in responses
+        ]
+        self.includes = includes
+
+    def copy(self):
+        """
+        Returns a copy of the tree, and the (response, responsetype class, input fields)
+        of each response in the copy.
+        """
+        tree = deepcopy(self.tree)
+        elements = list(tree.iter())
+        responses = [
+            (elements[response], responsetype_cls, [elements[inputfield] for inputfield in inputfields])
+            for response, responsetype_cls, inputfields in self.responses
+        ]
+        return tree, responses
+
+
 #-----------------------------------------------------------------------------
 # main class for this module
 
@@ -154,25 +203,18 @@ class LoncapaProblem(object):
         self.done = state.get('done', False)
         self.input_state = state.get('input_state', {})
 
-        # Convert startouttext and endouttext to proper <text></text>
-        problem_text = re.sub(r"startouttext\s*/", "text", problem_text)
-        problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
-        self.problem_text = problem_text
-
-        # parse problem XML file into an element tree
-        self.tree = etree.XML(problem_text)
-
-        # handle any <include file="foo"> tags
-        self._process_includes()
+        # parse problem XML file into an element tree, handling any <include file="foo"> tags,
+        # and adding ID's to it
+        parsed_problem = self._parse_problem_text(problem_text)
+        self.problem_text = parsed_problem.problem_text
+        self.tree, responses = parsed_problem.copy()
 
         # construct script processor context (eg for customresponse problems)
         self.context = self._extract_context(self.tree)
 
-        # Pre-parse the XML tree: modifies it to add ID's and perform some in-place
-        # transformations.  This also creates the dict (self.responders) of Response
-        # instances for each question in the problem. The dict has keys = xml subtree of
-        # Response, values = Response instance
-        self._preprocess_problem(self.tree)
+        # This creates the dict (self.responders) of Response instances for each question
+        # in the problem. The dict has keys = xml subtree of Response, values = Response instance
+        self._preprocess_problem(responses)
 
         if not self.student_answers:  # True when student_answers is an empty dict
             self.set_initial_display()
@@ -529,12 +571,73 @@ class LoncapaProblem(object):
 
     # ======= Private Methods Below ========
 
-    def _process_includes(self):
+    def _parse_problem_text(self, problem_text):
+        """
+        Return the ParsedProblem of `problem_text`, with includes processed and ID's assigned.
+
+        Parsed problems are cached by the hash of the problem text and the problem id (and
+        the filestore, when the problem includes files, whose modification times are checked
+        each time), so each call usually only has to copy the cached problem.
+        """
+        if isinstance(problem_text, unicode):
+            cache_key = hashlib.sha1(problem_text.encode('utf-8')).hexdigest()
+        else:
+            cache_key = hashlib.sha1(problem_text).hexdigest()
+        cache_key = (cache_key, self.problem_id)
+        if '<include' in problem_text:
+            cache_key += (getattr(self.capa_system.filestore, 'root_path', None),)
+
+        with _parsed_problems_lock:
+            parsed_problem = _parsed_problems.pop(cache_key, None)
+            if parsed_problem is not None:
+                _parsed_problems[cache_key] = parsed_problem
+
+        if parsed_problem is not None and all(
+                self._include_mtime(filename) == mtime for filename, mtime in parsed_problem.includes
+        ):
+            return parsed_problem
+
+        # Convert startouttext and endouttext to proper <text></text>
+        problem_text = re.sub(r"startouttext\s*/", "text", problem_text)
+        problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
+
+        tree = etree.XML(problem_text)
+
+        # Files are checked before they are read, so that a file changed in between is read again
+        includes = [
+            (inc.get('file'), self._include_mtime(inc.get('file')))
+            for inc in tree.findall('.//include') if inc.get('file') is not None
+        ]
+
+        # handle any <include file="foo"> tags
+        processed_all = self._process_includes(tree)
+
+        parsed_problem = ParsedProblem(problem_text, tree, self._assign_ids(tree), includes)
+        if processed_all and all(mtime is not None for __, mtime in includes):
+            with _parsed_problems_lock:
+                _parsed_problems[cache_key] = parsed_problem
+                while len(_parsed_problems) > PARSED_PROBLEM_CACHE_SIZE:
+                    _parsed_problems.popitem(last=False)
+        return parsed_problem
+
+    def _include_mtime(self, filename):
+        """
+        Returns the modification time of the included file `filename`, or None if it can't be found.
+        """
+        try:
+            return self.capa_system.filestore.getinfo(filename).get('modified_time')
+        except Exception:  # pylint: disable=broad-except
+            return None
+
+    def _process_includes(self, tree):
         """
         Handle any <include file="foo"> tags by reading in the specified file and inserting it
-        into our XML tree.  Fail gracefully if debugging.
+        into the XML tree.  Fail gracefully if debugging.
+
+        Returns whether every include was processed.
         """
-        includes = self.tree.findall('.//include')
+        processed_all = True
+        includes = tree.findall('.//include')
         for inc in includes:
             filename = inc.get('file')
             if filename is not None:
@@ -555,6 +658,7 @@ class LoncapaProblem(object):
                     if not self.capa_system.DEBUG:
                         raise
                     else:
+                        processed_all = False
                         continue
                 try:
                     # read in and convert to XML
@@ -571,6 +675,7 @@ class LoncapaProblem(object):
                     if not self.capa_system.DEBUG:
                         raise
                     else:
+                        processed_all = False
                         continue
 
                 # insert new XML into tree in place of include
@@ -578,6 +683,7 @@ class LoncapaProblem(object):
                 parent.insert(parent.index(inc), incxml)
                 parent.remove(inc)
                 log.debug('Included %s into %s' % (filename, self.problem_id))
+        return processed_all
 
     def _extract_system_path(self, script):
         """
@@ -620,10 +726,12 @@ class LoncapaProblem(object):
         variables for problem answer checking.
 
         Problem XML goes to Python execution context. Runs everything in script tags.
+
+        Scripts only see the student's anonymous id if they refer to it, so that
+        the results of the others are cached for everyone who has the same seed.
         """
         context = {}
         context['seed'] = self.seed
-        context['anonymous_student_id'] = self.capa_system.anonymous_student_id
         all_code = ''
 
         python_path = []
@@ -654,6 +762,9 @@ class LoncapaProblem(object):
                 extra_files.append(("python_lib.zip", zip_lib))
                 python_path.append("python_lib.zip")
 
+            if 'anonymous_student_id' in all_code:
+                context['anonymous_student_id'] = self.capa_system.anonymous_student_id
+
             try:
                 safe_exec(
                     all_code,
@@ -671,6 +782,7 @@ class LoncapaProblem(object):
                 raise responsetypes.LoncapaProblemError(msg)
 
         # Store code source in context, along with the Python path needed to run it correctly.
+        context['anonymous_student_id'] = self.capa_system.anonymous_student_id
         context['script_code'] = all_code
         context['python_path'] = python_path
         context['extra_files'] = extra_files or None
@@ -774,19 +886,16 @@ class LoncapaProblem(object):
 
         return tree
 
-    def _preprocess_problem(self, tree):  # private
+    def _assign_ids(self, tree):  # private
         """
         Assign IDs to all the responses
-        Assign sub-IDs to all entries (textline, schematic, etc.)
-        Annoted correctness and value
+        Assign sub-IDs to all entries (textline, schematic, etc.) and solutions
         In-place transformation
 
-        Also create capa Response instances for each responsetype and save as self.responders
-
-        Obtain all responder answers and save as self.responder_answers dict (key = response)
+        Returns (response, responsetype class, input fields) for each response.
         """
         response_id = 1
-        self.responders = {}
+        responses = []
         for response in tree.xpath('//' + "|//".join(responsetypes.registry.registered_tags())):
             response_id_str = self.problem_id + "_" + str(response_id)
             # create and save ID for this response
@@ -807,8 +916,28 @@ class LoncapaProblem(object):
                 entry.attrib['id'] = "%s_%i_%i" % (self.problem_id, response_id, answer_id)
                 answer_id = answer_id + 1
 
+            responses.append((response, responsetypes.registry.get_class_for_tag(response.tag), inputfields))
+
+        # <solution>...</solution> may not be associated with any specific response; give
+        # IDs for those separately
+        # TODO: We should make the namespaces consistent and unique (e.g. %s_problem_%i).
+        solution_id = 1
+        for solution in tree.findall('.//solution'):
+            solution.attrib['id'] = "%s_solution_%i" % (self.problem_id, solution_id)
+            solution_id += 1
+
+        return responses
+
+    def _preprocess_problem(self, responses):  # private
+        """
+        Create capa Response instances for each of `responses` (as returned by _assign_ids,
+        for self.tree) and save as self.responders
+
+        Obtain all responder answers and save as self.responder_answers dict (key = response)
+        """
+        self.responders = {}
+        for response, responsetype_cls, inputfields in responses:
             # instantiate capa Response
-            responsetype_cls = responsetypes.registry.get_class_for_tag(response.tag)
             responder = responsetype_cls(response, inputfields, self.context, self.capa_system)
             # save in list in self
             self.responders[response] = responder
@@ -823,11 +952,3 @@ class LoncapaProblem(object):
                 log.debug('responder %s failed to properly return get_answers()',
                           self.responders[response])  # FIXME
                 raise
-
-        # <solution>...</solution> may not be associated with any specific response; give
-        # IDs for those separately
-        # TODO: We should make the namespaces consistent and unique (e.g. %s_problem_%i).
-        solution_id = 1
-        for solution in tree.findall('.//solution'):
-            solution.attrib['id'] = "%s_solution_%i" % (self.problem_id, solution_id)
-            solution_id += 1
@@ -0,0 +1,395 @@
+"""
+A pool of sandboxed Python processes with capa's usual modules already imported.
+
+Each `codejail.safe_exec.safe_exec` call starts a new sandboxed Python
+process, and the modules that capa code uses most (numpy, scipy, calc and
+chem) are imported again by every execution that touches them. A pool worker
+is started once, in the same sandbox as codejail uses, and imports those
+modules up front. Each job is then run in a process forked from the worker,
+so jobs start warm, but can't see or change anything of each other's, and
+have their own resource limits. Workers are replaced after `max_jobs` jobs.
+
+Jobs and results are sent over the worker's stdin and stdout, one JSON
+document per line. Each job carries a random token that its result has to
+repeat, so that code writing to the worker's stdout can't pass off results
+for later jobs. Jobs can't start processes (RLIMIT_NPROC is 0), and the job's
+process group is killed once it is done. If any process of the sandbox user
+outlives a job anyway, it could read the worker's later jobs and write their
+results through /proc, so the worker is retired.
+
+The pool is configured with `configure`, in the LMS from CODE_JAIL['pool'].
+Code that needs files in the sandbox (`python_path` or `extra_files`) is run
+by codejail as before, as is all code if the pool isn't configured, or a
+worker fails.
+"""
+import inspect
+import json
+import logging
+import os
+import resource
+import select
+import subprocess
+import tempfile
+import threading
+import uuid
+
+from codejail import jail_code
+from codejail.safe_exec import safe_exec as codejail_safe_exec
+from codejail.safe_exec import json_safe, SafeExecException
+
+log = logging.getLogger(__name__)
+
+# The modules workers import before running any job
+PREWARMED_MODULES = [
+    "numpy", "math", "random", "scipy", "calc", "eia",
+    "chem.chemcalc", "chem.chemtools", "chem.miller", "verifiers.draganddrop",
+]
+
+# Seconds to wait for a worker beyond the job's own time limit
+WORKER_GRACE_TIME = 2
+
+# The program that pool workers run.  It reads jobs from stdin, runs each one
+# in a forked process with the job's resource limits, and writes the result
+# to stdout.
+WORKER_CODE = """\
+import json
+import os
+import resource
+import select
+import signal
+import sys
+import time
+import traceback
+
+# Later versions of codejail's json_safe use six
+try:
+    import six
+except ImportError:
+    pass
+
+for modname in %(prewarmed_modules)r:
+    try:
+        __import__(modname)
+    except Exception:
+        pass
+
+%(json_safe)s
+
+class DevNull(object):
+    def write(self, *args, **kwargs):
+        pass
+
+jobs = sys.stdin
+results = sys.stdout
+sys.stdout = DevNull()
+
+
+def run_job(job, write_fd):
+    # Keep the job from reading later jobs, or writing results of its own
+    os.close(0)
+    os.close(1)
+    os.setpgid(0, 0)
+    # nor starting processes that outlive it
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    for limit, value in job['rlimits']:
+        resource.setrlimit(limit, (value, value))
+    try:
+        g_dict = job['globals']
+        exec job['code'] in g_dict
+        result = {'globals': json_safe(g_dict)}
+    except BaseException:
+        result = {'error': traceback.format_exc()}
+    output = os.fdopen(write_fd, 'w')
+    json.dump(result, output)
+    output.close()
+
+
+def process_stat(pid):
+    # The ppid, process group, session and start time of process pid
+    with open('/proc/%%d/stat' %% pid) as stat_file:
+        fields = stat_file.read().rsplit(')', 1)[1].split()
+    return int(fields[1]), int(fields[2]), int(fields[3]), int(fields[19])
+
+
+def leftover_processes(job_pid, job_start):
+    # Processes of the sandbox user that outlived the job: in its process
+    # group or session, or orphaned since it started
+    uid = os.getuid()
+    leftovers = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit() or int(name) == os.getpid():
+            continue
+        try:
+            if os.stat('/proc/' + name).st_uid != uid:
+                continue
+            ppid, pgrp, session, start = process_stat(int(name))
+        except (IOError, OSError):
+            # Exited meanwhile
+            continue
+        if job_pid in (pgrp, session) or (ppid == 1 and start >= job_start):
+            leftovers.append(int(name))
+    return leftovers
+
+
+while True:
+    line = jobs.readline()
+    if not line:
+        break
+    job = json.loads(line)
+    token = job.pop('token')
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        # The job can read the worker's globals
+        line = token = None
+        try:
+            run_job(job, write_fd)
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    try:
+        job_start = process_stat(pid)[3]
+    except (IOError, OSError):
+        job_start = None
+
+    output = []
+    deadline = time.time() + job['realtime']
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0 or not select.select([read_fd], [], [], remaining)[0]:
+            result = {'error': 'Timed out'}
+            break
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            try:
+                result = json.loads(''.join(output))
+            except ValueError:
+                result = {'error': 'Exited without a result'}
+            break
+        output.append(chunk)
+    os.close(read_fd)
+
+    # Kill anything the job left running
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+    os.waitpid(pid, 0)
+
+    # Anything that is still running could read the jobs and forge the
+    # results that this worker is sent later, so the worker is retired
+    try:
+        leftovers = leftover_processes(pid, job_start) if job_start is not None else None
+    except OSError:
+        leftovers = None
+    if leftovers != []:
+        result['retire'] = True
+
+    result['token'] = token
+    results.write(json.dumps(result) + '\\n')
+    results.flush()
+""" % {
+    'prewarmed_modules': PREWARMED_MODULES,
+    'json_safe': inspect.getsource(json_safe),
+}
+
+
+class WorkerError(Exception):
+    """
+    A pool worker stopped working; the job should be run some other way.
+    """
+
+
+def _worker_limits():
+    """
+    Limits the process of a pool worker, as codejail does for its processes.
+
+    codejail's RLIMIT_NPROC isn't applied: it counts every process of the
+    sandbox user, so the idle workers of every LMS process would use it up,
+    and it is set to 0 for each job anyway.
+    """
+    os.setsid()
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+
+
+class SandboxWorker(object):
+    """
+    A sandboxed Python process that runs jobs.
+    """
+    def __init__(self):
+        command = jail_code.COMMANDS["python"]
+        cmd = []
+        if command['user']:
+            cmd.extend(['sudo', '-u', command['user']])
+        cmd.extend(command['cmdline_start'])
+        cmd.extend(['-c', WORKER_CODE])
+
+        # The sandbox user needs to be able to read its working directory
+        self.homedir = tempfile.mkdtemp(prefix="codejail-pool-")
+        os.chmod(self.homedir, 0o775)
+
+        self.process = subprocess.Popen(
+            cmd, cwd=self.homedir, env={}, preexec_fn=_worker_limits,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, close_fds=True,
+        )
+        self.jobs = 0
+        # Whether the worker must not run any more jobs
+        self.retired = False
+
+    def run(self, code, globals_dict, slug=None):
+        """
+        Runs `code` with `globals_dict`, as codejail's safe_exec does.
+
+        Raises WorkerError if the worker couldn't run it.
+        """
+        rlimits = []
+        if jail_code.LIMITS.get("CPU"):
+            rlimits.append((resource.RLIMIT_CPU, jail_code.LIMITS["CPU"]))
+        if jail_code.LIMITS.get("VMEM"):
+            rlimits.append((resource.RLIMIT_AS, jail_code.LIMITS["VMEM"]))
+        realtime = jail_code.LIMITS.get("REALTIME") or 1
+
+        token = uuid.uuid4().hex
+        job = {
+            'token': token,
+            'code': code,
+            'globals': json_safe(globals_dict),
+            'rlimits': rlimits,
+            'realtime': realtime,
+        }
+        self.jobs += 1
+        if slug:
+            log.info("Executing jailed code %s in pool worker %s", slug, self.process.pid)
+
+        try:
+            self.process.stdin.write(json.dumps(job) + '\n')
+            self.process.stdin.flush()
+            if not select.select([self.process.stdout], [], [], realtime + WORKER_GRACE_TIME)[0]:
+                raise WorkerError("Timed out")
+            result = json.loads(self.process.stdout.readline())
+        except (IOError, OSError, ValueError) as exception:
+            raise WorkerError(exception)
+        if result.pop('token', None) != token:
+            raise WorkerError("Mismatched result")
+        if result.pop('retire', False):
+            log.warning("Retiring pool worker %s: a process outlived job %s", self.process.pid, slug)
+            self.retired = True
+
+        if 'error' in result:
+            raise SafeExecException("Couldn't execute jailed code: %s" % result['error'])
+        globals_dict.update(result['globals'])
+
+    def close(self):
+        """
+        Stops the worker.
+        """
+        try:
+            self.process.stdin.close()
+        except IOError:
+            pass
+        if self.process.poll() is None:
+            try:
+                self.process.terminate()
+            except OSError:
+                pass
+        self.process.wait()
+        try:
+            os.rmdir(self.homedir)
+        except OSError:
+            pass
+
+
+class SandboxPool(object):
+    """
+    Up to `size` idle SandboxWorkers, each replaced after `max_jobs` jobs.
+    """
+    def __init__(self, size, max_jobs):
+        self.size = size
+        self.max_jobs = max_jobs
+        self._idle = []
+        self._lock = threading.Lock()
+
+        # Start the workers now, so that they are warm for the first jobs
+        for _ in xrange(size):
+            self._idle.append(SandboxWorker())
+
+    def _checkout(self):
+        """
+        Returns an idle worker, or a new one if there isn't any.
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return SandboxWorker()
+
+    def _checkin(self, worker):
+        """
+        Returns `worker` to the pool, or replaces it if it has run enough jobs.
+        """
+        if worker.retired or worker.jobs >= self.max_jobs:
+            worker.close()
+            worker = SandboxWorker()
+
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(worker)
+                return
+        worker.close()
+
+    def safe_exec(self, code, globals_dict, python_path=None, extra_files=None, slug=None):
+        """
+        Executes `code` as codejail's safe_exec does, in a pool worker.
+        """
+        if python_path or extra_files:
+            # These need files in the sandbox
+            return codejail_safe_exec(
+                code, globals_dict, python_path=python_path, extra_files=extra_files, slug=slug,
+            )
+
+        worker = self._checkout()
+        try:
+            worker.run(code, globals_dict, slug=slug)
+        except WorkerError:
+            log.exception("Sandbox pool worker %s failed, running %s with codejail", worker.process.pid, slug)
+            worker.close()
+            return codejail_safe_exec(code, globals_dict, slug=slug)
+        except SafeExecException:
+            self._checkin(worker)
+            raise
+        self._checkin(worker)
+
+
+# The size and max_jobs of the pool, or None if there is no pool
+POOL_CONFIG = None
+
+_POOL = None
+_POOL_PID = None
+_POOL_LOCK = threading.Lock()
+
+
+def configure(size, max_jobs=100):
+    """
+    Runs sandboxed code in a pool of `size` workers, replaced after `max_jobs`
+    jobs each. A size of 0 disables the pool.
+    """
+    global POOL_CONFIG  # pylint: disable=global-statement
+    POOL_CONFIG = (size, max_jobs) if size else None
+
+
+def get_pool():
+    """
+    Returns the SandboxPool of this process, or None if there isn't one.
+    """
+    global _POOL, _POOL_PID  # pylint: disable=global-statement
+    if POOL_CONFIG is None or not jail_code.is_configured("python"):
+        return None
+
+    # The pipes to workers can't be shared with forked processes
+    if _POOL_PID != os.getpid():
+        with _POOL_LOCK:
+            if _POOL_PID != os.getpid():
+                _POOL = SandboxPool(*POOL_CONFIG)
+                _POOL_PID = os.getpid()
+    return _POOL
@@ -4,9 +4,14 @@ from codejail.safe_exec import safe_exec as codejail_safe_exec
 from codejail.safe_exec import not_safe_exec as codejail_not_safe_exec
 from codejail.safe_exec import json_safe, SafeExecException
 from . import lazymod
+from . import pool
 from dogapi import dog_stats_api
 
+from collections import OrderedDict
 import hashlib
+import json
+import re
+import threading
 
 # Establish the Python environment for Capa.
 # Capa assumes float-friendly division always.
@@ -46,6 +51,15 @@ for name, modname in ASSUMED_IMPORTS:
 
 LAZY_IMPORTS = "".join(LAZY_IMPORTS)
 
+# The number of bytes of results to keep in each process, most recently used
+# first, in front of the cache passed to safe_exec.  Popular problems run the
+# same code with the same seeds for many students.
+LOCAL_RESULT_CACHE_BYTES = 10 * 1024 * 1024
+
+# Errors that come from the code itself, rather than from it being killed for
+# running out of time, say, and so are worth caching.
+DETERMINISTIC_ERROR_RE = re.compile(r"\w(Error|Exception)\b")
+
 
 def update_hash(hasher, obj):
     """
@@ -70,6 +84,99 @@ def update_hash(hasher, obj):
         hasher.update(repr(obj))
 
 
+def canonical_form(obj):
+    """
+    Return a form of the JSON-safe object `obj` whose repr is the same for
+    equal objects: dictionaries become sorted lists of (key, value) tuples.
+
+    This does what `update_hash` does, but lets `repr` do most of the work.
+
+    """
+    if isinstance(obj, dict):
+        return sorted((k, canonical_form(v)) for k, v in obj.iteritems())
+    if isinstance(obj, list) and any(isinstance(e, (dict, list)) for e in obj):
+        return [canonical_form(e) for e in obj]
+    return obj
+
+
+class LocalResultCache(object):
+    """
+    The results of safe_exec, as JSON, by cache key, holding at most
+    `max_bytes` of them, most recently used first.
+
+    Results are kept serialized so that callers can't change them.
+
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._results = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the result cached for `key`, or None."""
+        with self._lock:
+            result_json = self._results.pop(key, None)
+            if result_json is None:
+                return None
+            self._results[key] = result_json
+        return json.loads(result_json)
+
+    def set(self, key, result_json):
+        """Cache the JSON `result_json` for `key`."""
+        if len(result_json) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._results.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._results[key] = result_json
+            self._bytes += len(result_json)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._results.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        """Forget every result."""
+        with self._lock:
+            self._results.clear()
+            self._bytes = 0
+
+
+LOCAL_RESULT_CACHE = LocalResultCache(LOCAL_RESULT_CACHE_BYTES)
+
+
+def get_cached_result(cache, key):
+    """
+    Return the (emsg, cleaned_results) cached for `key`, from this process
+    or from `cache`, or None if there is none.
+    """
+    cached = LOCAL_RESULT_CACHE.get(key)
+    if cached is not None:
+        dog_stats_api.increment('capa.safe_exec.cache', tags=['result:hit', 'tier:local'])
+        return cached
+
+    cached = cache.get(key)
+    if cached is not None:
+        dog_stats_api.increment('capa.safe_exec.cache', tags=['result:hit', 'tier:shared'])
+        LOCAL_RESULT_CACHE.set(key, json.dumps(cached))
+        return cached
+
+    dog_stats_api.increment('capa.safe_exec.cache', tags=['result:miss'])
+    return None
+
+
+def set_cached_result(cache, key, result):
+    """
+    Cache `result`, an (emsg, cleaned_results) pair, for `key`, in this
+    process and in `cache`.
+    """
+    result_json = json.dumps(result)
+    dog_stats_api.histogram('capa.safe_exec.cache.bytes', len(result_json))
+    LOCAL_RESULT_CACHE.set(key, result_json)
+    cache.set(key, result)
+
+
 @dog_stats_api.timed('capa.safe_exec.time')
 def safe_exec(
     code,
@@ -99,7 +206,8 @@ def safe_exec(
 
     `cache` is an object with .get(key) and .set(key, value) methods.  It will be used
     to cache the execution, taking into account the code, the values of the globals,
-    and the random seed.
+    and the random seed.  Results are also kept in this process, in front of `cache`.
+    Errors are cached too, unless the code didn't run to completion (timed out, say).
 
     `slug` is an arbitrary string, a description that's meaningful to the
     caller, that will be used in log messages.
@@ -112,9 +220,9 @@ def safe_exec(
         safe_globals = json_safe(globals_dict)
         md5er = hashlib.md5()
         md5er.update(repr(code))
-        update_hash(md5er, safe_globals)
+        md5er.update(repr(canonical_form(safe_globals)))
         key = "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
-        cached = cache.get(key)
+        cached = get_cached_result(cache, key)
         if cached is not None:
             # We have a cached result.  The result is a pair: the exception
             # message, if any, else None; and the resulting globals dictionary.
@@ -128,8 +236,11 @@ def safe_exec(
     code_prolog = CODE_PROLOG % random_seed
 
     # Decide which code executor to use.
+    sandbox_pool = pool.get_pool()
     if unsafely:
         exec_fn = codejail_not_safe_exec
+    elif sandbox_pool is not None:
+        exec_fn = sandbox_pool.safe_exec
     else:
         exec_fn = codejail_safe_exec
 
@@ -146,9 +257,9 @@ def safe_exec(
 
     # Put the result back in the cache.  This is complicated by the fact that
     # the globals dict might not be entirely serializable.
-    if cache:
+    if cache and (emsg is None or DETERMINISTIC_ERROR_RE.search(emsg)):
         cleaned_results = json_safe(globals_dict)
-        cache.set(key, (emsg, cleaned_results))
+        set_cached_result(cache, key, (emsg, cleaned_results))
 
     # If an exception happened, raise it now.
     if emsg:
@@ -0,0 +1,131 @@
+"""Test the pool of sandboxed processes in pool.py"""
+
+import copy
+import sys
+import unittest
+
+from mock import patch
+
+from capa.safe_exec import pool, safe_exec
+from codejail import jail_code
+from codejail.safe_exec import SafeExecException
+
+
+class TestSandboxPool(unittest.TestCase):
+    """
+    Tests of running code in pool workers.
+
+    Workers run this Python, unsandboxed, which is enough to test the pool.
+    """
+    def setUp(self):
+        commands = copy.deepcopy(jail_code.COMMANDS)
+        limits = copy.deepcopy(jail_code.LIMITS)
+        self.addCleanup(setattr, jail_code, 'COMMANDS', commands)
+        self.addCleanup(setattr, jail_code, 'LIMITS', limits)
+        jail_code.configure("python", sys.executable)
+        jail_code.LIMITS["REALTIME"] = 5
+
+        self.pool = pool.SandboxPool(size=1, max_jobs=3)
+        self.addCleanup(self.close_pool)
+
+    def close_pool(self):
+        """Stop the workers of the pool."""
+        for worker in self.pool._idle:  # pylint: disable=protected-access
+            worker.close()
+
+    def test_set_values(self):
+        g = {'b': 5}
+        self.pool.safe_exec("a = b * 2", g)
+        self.assertEqual(g['a'], 10)
+
+    def test_raising_exceptions(self):
+        with self.assertRaises(SafeExecException) as cm:
+            self.pool.safe_exec("1/0", {})
+        self.assertIn("ZeroDivisionError", cm.exception.message)
+
+    def test_jobs_dont_share_state(self):
+        self.pool.safe_exec("import math; math.pi = 3", {})
+
+        g = {}
+        self.pool.safe_exec("import math; a = math.pi", g)
+        self.assertNotEqual(g['a'], 3)
+
+    def test_worker_reused_then_replaced(self):
+        worker = self.pool._idle[0]  # pylint: disable=protected-access
+        for _ in xrange(2):
+            self.pool.safe_exec("a = 1", {})
+            self.assertIs(self.pool._idle[0], worker)  # pylint: disable=protected-access
+
+        self.pool.safe_exec("a = 1", {})
+        self.assertIsNot(self.pool._idle[0], worker)  # pylint: disable=protected-access
+
+    def test_time_limit(self):
+        jail_code.LIMITS["REALTIME"] = 1
+        with self.assertRaises(SafeExecException):
+            self.pool.safe_exec("while True: pass", {})
+
+        # the worker is still usable
+        g = {}
+        self.pool.safe_exec("a = 17", g)
+        self.assertEqual(g['a'], 17)
+
+    def test_forged_results_are_ignored(self):
+        # a job that writes a result for the next job doesn't get it accepted
+        self.pool.safe_exec(
+            "import os, json\n"
+            "try:\n"
+            "    os.write(1, json.dumps({'globals': {'a': 'forged'}, 'token': 'x'}) + '\\n')\n"
+            "except OSError:\n"
+            "    pass\n",
+            {}
+        )
+
+        g = {}
+        self.pool.safe_exec("a = 'real'", g)
+        self.assertEqual(g['a'], 'real')
+
+    def test_tokens_are_hidden(self):
+        g = {}
+        self.pool.safe_exec("import sys; main = sys.modules['__main__']; a = [main.token, main.line]", g)
+        self.assertEqual(g['a'], [None, None])
+
+    def test_processes_outliving_jobs_retire_worker(self):
+        worker = self.pool._idle[0]  # pylint: disable=protected-access
+        g = {}
+        self.pool.safe_exec(
+            "import os, time\n"
+            "try:\n"
+            "    if os.fork() == 0:\n"
+            "        os.setsid()\n"
+            "        os.closerange(3, 256)\n"
+            "        time.sleep(10)\n"
+            "        os._exit(0)\n"
+            "    forked = True\n"
+            "except OSError:\n"
+            "    forked = False\n",
+            g
+        )
+
+        if g['forked']:
+            # RLIMIT_NPROC doesn't apply to root, so the escaped process is only caught afterwards
+            self.assertIsNot(self.pool._idle[0], worker)  # pylint: disable=protected-access
+        else:
+            self.assertIs(self.pool._idle[0], worker)  # pylint: disable=protected-access
+
+    def test_worker_failure_falls_back_to_codejail(self):
+        g = {}
+        with patch('capa.safe_exec.pool.codejail_safe_exec') as mock_safe_exec:
+            self.pool.safe_exec("import os; os.kill(os.getppid(), 9)", g)
+        mock_safe_exec.assert_called_with("import os; os.kill(os.getppid(), 9)", g, slug=None)
+
+    def test_files_run_with_codejail(self):
+        with patch('capa.safe_exec.pool.codejail_safe_exec') as mock_safe_exec:
+            self.pool.safe_exec("import constant", {}, python_path=["pylib"])
+        self.assertTrue(mock_safe_exec.called)
+
+    def test_capa_safe_exec(self):
+        with patch('capa.safe_exec.pool.get_pool', return_value=self.pool):
+            g = {}
+            # capa's prolog and assumed imports are there
+            safe_exec("a = int(math.pi) / 2", g)
+        self.assertEqual(g['a'], 1.5)
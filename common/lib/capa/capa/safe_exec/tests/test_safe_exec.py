@@ -1,18 +1,24 @@
 """Test safe_exec.py"""
 
 import hashlib
+import importlib
 import os
 import os.path
 import random
 import textwrap
 import unittest
 
+from mock import patch
 from nose.plugins.skip import SkipTest
 
 from capa.safe_exec import safe_exec, update_hash
+from capa.safe_exec.safe_exec import LOCAL_RESULT_CACHE
 from codejail.safe_exec import SafeExecException
 from codejail.jail_code import is_configured
 
+# The module, which the package's safe_exec function hides
+safe_exec_module = importlib.import_module('capa.safe_exec.safe_exec')
+
 
 class TestSafeExec(unittest.TestCase):
     def test_set_values(self):
@@ -110,6 +116,9 @@ class DictCache(object):
 class TestSafeExecCaching(unittest.TestCase):
     """Test that caching works on safe_exec."""
 
+    def setUp(self):
+        LOCAL_RESULT_CACHE.clear()
+
     def test_cache_miss_then_hit(self):
         g = {}
         cache = {}
@@ -122,6 +131,7 @@ class TestSafeExecCaching(unittest.TestCase):
 
         # Fiddle with the cache, then try it again.
         cache[cache.keys()[0]] = (None, {'a': 17})
+        LOCAL_RESULT_CACHE.clear()
 
         g = {}
         safe_exec("a = int(math.pi)", g, cache=DictCache(cache))
@@ -153,6 +163,7 @@ class TestSafeExecCaching(unittest.TestCase):
 
         # Change the value stored in the cache, the result should change.
         cache[cache.keys()[0]] = ("Hey there!", {})
+        LOCAL_RESULT_CACHE.clear()
 
         with self.assertRaises(SafeExecException):
             safe_exec(code, g, cache=DictCache(cache))
@@ -163,9 +174,62 @@ class TestSafeExecCaching(unittest.TestCase):
 
         # Change it again, now no exception!
         cache[cache.keys()[0]] = (None, {'a': 17})
+        LOCAL_RESULT_CACHE.clear()
         safe_exec(code, g, cache=DictCache(cache))
         self.assertEqual(g['a'], 17)
 
+    def test_local_cache_hit(self):
+        cache = {}
+        safe_exec("a = int(math.pi)", {}, cache=DictCache(cache))
+
+        # The shared cache isn't consulted again in this process.
+        with patch.object(DictCache, 'get') as mock_get:
+            g = {}
+            safe_exec("a = int(math.pi)", g, cache=DictCache(cache))
+        self.assertEqual(g['a'], 3)
+        self.assertFalse(mock_get.called)
+
+    def test_local_cache_filled_from_shared_cache(self):
+        cache = {}
+        safe_exec("a = int(math.pi)", {}, cache=DictCache(cache))
+        LOCAL_RESULT_CACHE.clear()
+
+        safe_exec("a = int(math.pi)", {}, cache=DictCache(cache))
+        cache.clear()
+
+        g = {}
+        safe_exec("a = int(math.pi)", g, cache=DictCache(cache))
+        self.assertEqual(g['a'], 3)
+
+    def test_cached_results_cant_be_changed(self):
+        cache = {}
+        g = {}
+        safe_exec("a = [1, 2]", g, cache=DictCache(cache))
+        g['a'].append(3)
+
+        g = {}
+        safe_exec("a = [1, 2]", g, cache=DictCache(cache))
+        self.assertEqual(g['a'], [1, 2])
+
+    def test_cache_metrics(self):
+        with patch.object(safe_exec_module, 'dog_stats_api') as mock_stats:
+            safe_exec("a = 1", {}, cache=DictCache({}))
+            safe_exec("a = 1", {}, cache=DictCache({}))
+
+        mock_stats.increment.assert_any_call('capa.safe_exec.cache', tags=['result:miss'])
+        mock_stats.increment.assert_any_call('capa.safe_exec.cache', tags=['result:hit', 'tier:local'])
+        self.assertTrue(mock_stats.histogram.called)
+
+    def test_incomplete_runs_not_cached(self):
+        cache = {}
+        with patch.object(safe_exec_module, 'codejail_safe_exec') as mock_safe_exec:
+            mock_safe_exec.side_effect = SafeExecException(
+                "Couldn't execute jailed code: stdout: '', stderr: '' with status code: -9"
+            )
+            with self.assertRaises(SafeExecException):
+                safe_exec("a = 1", {}, cache=DictCache(cache))
+        self.assertEqual(cache, {})
+
     def test_unicode_submission(self):
         # Check that using non-ASCII unicode does not raise an encoding error.
         # Try several non-ASCII unicode characters
@@ -0,0 +1,144 @@
+"""
+Tests of LoncapaProblem construction.
+"""
+from collections import OrderedDict
+import os
+import textwrap
+import unittest
+
+import mock
+
+from capa import capa_problem
+from capa.capa_problem import LoncapaProblem
+from capa.safe_exec.safe_exec import LOCAL_RESULT_CACHE
+from . import test_capa_system, new_loncapa_problem
+
+
+class ParsedProblemCacheTest(unittest.TestCase):
+    """
+    Tests of the cache of parsed problem trees.
+    """
+    def setUp(self):
+        super(ParsedProblemCacheTest, self).setUp()
+        patcher = mock.patch.object(capa_problem, '_parsed_problems', OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    xml_str = textwrap.dedent("""
+        <problem>
+            <startouttext/>Which is it?<endouttext/>
+            <stringresponse answer="this">
+                <textline size="20"/>
+            </stringresponse>
+        </problem>
+    """)
+
+    def test_problems_share_parse(self):
+        capa_system = test_capa_system()
+        first = LoncapaProblem(self.xml_str, id='1', seed=1, capa_system=capa_system)
+        with mock.patch.object(LoncapaProblem, '_assign_ids') as assign_ids:
+            second = LoncapaProblem(self.xml_str, id='1', seed=2, capa_system=capa_system)
+        self.assertFalse(assign_ids.called)
+
+        # The problem text was parsed once, and ids were assigned to the cached tree
+        self.assertEqual(len(capa_problem._parsed_problems), 1)  # pylint: disable=protected-access
+        parsed_problem = capa_problem._parsed_problems.values()[0]  # pylint: disable=protected-access
+        self.assertEqual(parsed_problem.tree.find('.//textline').get('id'), '1_2_1')
+        self.assertNotIn('startouttext', parsed_problem.problem_text)
+
+        # Each problem has its own copy of the tree, with responders of its own
+        for problem in (first, second):
+            responder_xml, = problem.responders.keys()
+            self.assertIs(responder_xml, problem.tree.find('.//stringresponse'))
+            self.assertIsNot(responder_xml, parsed_problem.tree.find('.//stringresponse'))
+            self.assertEqual(responder_xml.get('id'), '1_2')
+            self.assertIn('Which is it?', problem.get_html())
+        self.assertIsNot(first.tree, second.tree)
+
+    def test_problem_ids(self):
+        capa_system = test_capa_system()
+        first = LoncapaProblem(self.xml_str, id='first', seed=1, capa_system=capa_system)
+        second = LoncapaProblem(self.xml_str, id='second', seed=1, capa_system=capa_system)
+
+        # The ids of the cached trees depend on the problem id
+        self.assertEqual(len(capa_problem._parsed_problems), 2)  # pylint: disable=protected-access
+        self.assertEqual(first.tree.find('.//textline').get('id'), 'first_2_1')
+        self.assertEqual(second.tree.find('.//textline').get('id'), 'second_2_1')
+
+    def test_edited_includes_are_read_again(self):
+        capa_system = test_capa_system()
+        xml_str = '<problem><include file="cache_include.xml"/></problem>'
+        path = capa_system.filestore.getsyspath('cache_include.xml')
+        self.addCleanup(os.remove, path)
+
+        with open(path, 'w') as include_file:
+            include_file.write('<p>First</p>')
+        os.utime(path, (1000000000, 1000000000))
+        self.assertIn('First', new_loncapa_problem(xml_str, capa_system=capa_system).get_html())
+        self.assertIn('First', new_loncapa_problem(xml_str, capa_system=capa_system).get_html())
+
+        with open(path, 'w') as include_file:
+            include_file.write('<p>Second</p>')
+        os.utime(path, (1000000060, 1000000060))
+        self.assertIn('Second', new_loncapa_problem(xml_str, capa_system=capa_system).get_html())
+
+    def test_cache_size(self):
+        with mock.patch.object(capa_problem, 'PARSED_PROBLEM_CACHE_SIZE', 2):
+            for index in xrange(3):
+                new_loncapa_problem('<problem><p>{}</p></problem>'.format(index))
+        self.assertEqual(len(capa_problem._parsed_problems), 2)  # pylint: disable=protected-access
+
+
+class DictCache(object):
+    """A cache over a dict, for counting cached results."""
+    def __init__(self, d):
+        self.cache = d
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache[key] = value
+
+
+class ScriptContextTest(unittest.TestCase):
+    """
+    Tests of running the scripts of a problem.
+    """
+    def setUp(self):
+        super(ScriptContextTest, self).setUp()
+        LOCAL_RESULT_CACHE.clear()
+
+    xml_str = textwrap.dedent("""
+        <problem>
+            <script type="loncapa/python">
+        {}
+            </script>
+            <p>$answer</p>
+        </problem>
+    """)
+
+    def construct_for_student(self, script, anonymous_student_id, cache):
+        """Returns a LoncapaProblem of `script` for the student, seeded alike for everyone."""
+        capa_system = test_capa_system()
+        capa_system.anonymous_student_id = anonymous_student_id
+        capa_system.cache = DictCache(cache)
+        return new_loncapa_problem(self.xml_str.format(script), capa_system=capa_system, seed=4)
+
+    def test_result_shared_between_students(self):
+        cache = {}
+        first = self.construct_for_student("answer = random.randint(1, 100)", 'first', cache)
+        second = self.construct_for_student("answer = random.randint(1, 100)", 'second', cache)
+
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(first.context['answer'], second.context['answer'])
+        self.assertEqual(second.context['anonymous_student_id'], 'second')
+
+    def test_result_for_each_student(self):
+        cache = {}
+        first = self.construct_for_student("answer = anonymous_student_id", 'first', cache)
+        second = self.construct_for_student("answer = anonymous_student_id", 'second', cache)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(first.context['answer'], 'first')
+        self.assertEqual(second.context['answer'], 'second')
@@ -559,6 +559,111 @@ class CourseFields(object):
                               default=False,
                               scope=Scope.settings)
 
+# The functions below compute course metadata from the fields of either a
+# CourseDescriptor, or any other object with the same fields (such as the
+# course summaries cached by the LMS), so that both compute it the same way.
+
+def _course_sorting_dates(course):
+    """
+    Returns the announcement and (advertised) start dates of `course`, and
+    the current time, as used to compute course_is_newish and course_sorting_score.
+    """
+    try:
+        start = dateutil.parser.parse(course.advertised_start)
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=UTC())
+    except (ValueError, AttributeError):
+        start = course.start
+
+    now = datetime.now(UTC())
+
+    return course.announcement, start, now
+
+
+def course_is_newish(course):
+    """
+    Returns if the course has been flagged as new. If
+    there is no flag, return a heuristic value considering the
+    announcement and the start dates.
+    """
+    flag = course.is_new
+    if flag is None:
+        # Use a heuristic if the course has not been flagged
+        announcement, start, now = _course_sorting_dates(course)
+        if announcement and (now - announcement).days < 30:
+            # The course has been announced for less that month
+            return True
+        elif (now - start).days < 1:
+            # The course has not started yet
+            return True
+        else:
+            return False
+    elif isinstance(flag, basestring):
+        return flag.lower() in ['true', 'yes', 'y']
+    else:
+        return bool(flag)
+
+
+def course_sorting_score(course):
+    """
+    Returns a number that can be used to sort courses according to how
+    "new" they are (see CourseDescriptor.sorting_score).
+    """
+    # Make courses that have an announcement date shave a lower
+    # score than courses than don't, older courses should have a
+    # higher score.
+    announcement, start, now = _course_sorting_dates(course)
+    scale = 300.0  # about a year
+    if announcement:
+        days = (now - announcement).days
+        score = -exp(-days / scale)
+    else:
+        days = (now - start).days
+        score = exp(days / scale)
+    return score
+
+
+def course_start_date_is_still_default(course):
+    """
+    Checks if the start date set for the course is still default, i.e. .start has not been modified,
+    and .advertised_start has not been set.
+    """
+    return course.advertised_start is None and course.start == CourseFields.start.default
+
+
+def course_start_date_text(course, i18n):
+    """
+    Returns the desired text corresponding the course's start date.  Prefers .advertised_start,
+    then falls back to .start
+
+    `i18n` is the runtime "i18n" service, which translates and formats the text.
+    """
+    _ = i18n.ugettext
+    strftime = i18n.strftime
+
+    def try_parse_iso_8601(text):
+        try:
+            result = Date().from_json(text)
+            if result is None:
+                result = text.title()
+            else:
+                result = strftime(result, "SHORT_DATE")
+        except ValueError:
+            result = text.title()
+
+        return result
+
+    if isinstance(course.advertised_start, basestring):
+        return try_parse_iso_8601(course.advertised_start)
+    elif course_start_date_is_still_default(course):
+        # Translators: TBD stands for 'To Be Determined' and is used when a course
+        # does not yet have an announced start date.
+        return _('TBD')
+    else:
+        when = course.advertised_start or course.start
+        return strftime(when, "SHORT_DATE")
+
+
 class CourseDescriptor(CourseFields, SequenceDescriptor):
     module_class = SequenceModule
 
@@ -830,22 +935,7 @@ class CourseDescriptor(CourseFields, SequenceDescriptor):
         there is no flag, return a heuristic value considering the
         announcement and the start dates.
         """
-        flag = self.is_new
-        if flag is None:
-            # Use a heuristic if the course has not been flagged
-            announcement, start, now = self._sorting_dates()
-            if announcement and (now - announcement).days < 30:
-                # The course has been announced for less that month
-                return True
-            elif (now - start).days < 1:
-                # The course has not started yet
-                return True
-            else:
-                return False
-        elif isinstance(flag, basestring):
-            return flag.lower() in ['true', 'yes', 'y']
-        else:
-            return bool(flag)
+        return course_is_newish(self)
 
     @property
     def sorting_score(self):
@@ -857,37 +947,7 @@ class CourseDescriptor(CourseFields, SequenceDescriptor):
 
         The lower the number the "newer" the course.
         """
-        # Make courses that have an announcement date shave a lower
-        # score than courses than don't, older courses should have a
-        # higher score.
-        announcement, start, now = self._sorting_dates()
-        scale = 300.0  # about a year
-        if announcement:
-            days = (now - announcement).days
-            score = -exp(-days / scale)
-        else:
-            days = (now - start).days
-            score = exp(days / scale)
-        return score
-
-    def _sorting_dates(self):
-        # utility function to get datetime objects for dates used to
-        # compute the is_new flag and the sorting_score
-
-        announcement = self.announcement
-        if announcement is not None:
-            announcement = announcement
-
-        try:
-            start = dateutil.parser.parse(self.advertised_start)
-            if start.tzinfo is None:
-                start = start.replace(tzinfo=UTC())
-        except (ValueError, AttributeError):
-            start = self.start
-
-        now = datetime.now(UTC())
-
-        return announcement, start, now
+        return course_sorting_score(self)
 
     @lazy
     def grading_context(self):
@@ -960,31 +1020,7 @@ class CourseDescriptor(CourseFields, SequenceDescriptor):
         Returns the desired text corresponding the course's start date.  Prefers .advertised_start,
         then falls back to .start
         """
-        i18n = self.runtime.service(self, "i18n")
-        _ = i18n.ugettext
-        strftime = i18n.strftime
-
-        def try_parse_iso_8601(text):
-            try:
-                result = Date().from_json(text)
-                if result is None:
-                    result = text.title()
-                else:
-                    result = strftime(result, "SHORT_DATE")
-            except ValueError:
-                result = text.title()
-
-            return result
-
-        if isinstance(self.advertised_start, basestring):
-            return try_parse_iso_8601(self.advertised_start)
-        elif self.start_date_is_still_default:
-            # Translators: TBD stands for 'To Be Determined' and is used when a course
-            # does not yet have an announced start date.
-            return _('TBD')
-        else:
-            when = self.advertised_start or self.start
-            return strftime(when, "SHORT_DATE")
+        return course_start_date_text(self, self.runtime.service(self, "i18n"))
 
     @property
     def start_date_is_still_default(self):
@@ -992,7 +1028,7 @@ class CourseDescriptor(CourseFields, SequenceDescriptor):
         Checks if the start date set for the course is still default, i.e. .start has not been modified,
         and .advertised_start has not been set.
         """
-        return self.advertised_start is None and self.start == CourseFields.start.default
+        return course_start_date_is_still_default(self)
 
     @property
     def end_date_text(self):
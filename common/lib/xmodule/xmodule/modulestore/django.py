@@ -11,14 +11,17 @@ from django.conf import settings
 if not settings.configured:
     settings.configure()
 from django.core.cache import get_cache, InvalidCacheBackendError
+import django.dispatch
 import django.utils
 
+import logging
 import re
 import threading
 
 from xmodule.util.django import get_current_request_hostname
 import xmodule.modulestore  # pylint: disable=unused-import
 from xmodule.modulestore.mixed import MixedModuleStore
+from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
 from xmodule.modulestore.draft_and_published import BranchSettingMixin
 from xmodule.contentstore.django import contentstore
 import xblock.reference.plugins
@@ -30,6 +33,8 @@ try:
 except ImportError:
     HAS_REQUEST_CACHE = False
 
+log = logging.getLogger(__name__)
+
 ASSET_IGNORE_REGEX = getattr(settings, "ASSET_IGNORE_REGEX", r"(^\._.*$)|(^\.DS_Store$)|(^.*~$)")
 
 
@@ -44,6 +49,48 @@ def load_function(path):
     return getattr(import_module(module_path), name)
 
 
+class SignalHandler(object):
+    """
+    Sends django signals when the published content of a course changes in
+    the modulestore, or it is deleted, so that data derived from courses
+    (such as course_overviews) can be updated.
+
+    Receivers are connected to the class attributes, e.g.
+
+        from xmodule.modulestore.django import SignalHandler
+
+        @receiver(SignalHandler.course_published)
+        def listen_for_course_publish(sender, course_key, **kwargs):
+            ...
+
+    Receivers run synchronously, while the modulestore is being written to,
+    so they should be quick. Errors they raise are logged and ignored.
+    """
+    course_published = django.dispatch.Signal(providing_args=["course_key"])
+    course_deleted = django.dispatch.Signal(providing_args=["course_key"])
+
+    _mapping = {
+        "course_published": course_published,
+        "course_deleted": course_deleted,
+    }
+
+    def __init__(self, modulestore_class):
+        self.modulestore_class = modulestore_class
+
+    def send(self, signal_name, **kwargs):
+        """
+        Send the named signal, logging rather than raising errors from its receivers.
+        """
+        signal = self._mapping[signal_name]
+        responses = signal.send_robust(sender=self.modulestore_class, **kwargs)
+
+        for receiver, response in responses:
+            if isinstance(response, Exception):
+                log.error(
+                    "Receiver %s of %s raised %r", receiver, signal_name, response
+                )
+
+
 def create_modulestore_instance(engine, content_store, doc_store_config, options, i18n_service=None, fs_service=None):
     """
     This will return a new instance of a modulestore given an engine and options
@@ -70,10 +117,21 @@ def create_modulestore_instance(engine, content_store, doc_store_config, options
 
     if issubclass(class_, MixedModuleStore):
         _options['create_modulestore_instance'] = create_modulestore_instance
+        _options['signal_handler'] = SignalHandler(class_)
 
     if issubclass(class_, BranchSettingMixin):
         _options['branch_setting_func'] = _get_modulestore_branch_setting
 
+    if issubclass(class_, SplitMongoModuleStore):
+        _options.setdefault(
+            'course_structure_cache_max_bytes', getattr(settings, 'COURSE_STRUCTURE_CACHE_MAX_BYTES', 0)
+        )
+        # course structures are only shared between processes if a cache is configured for them
+        try:
+            _options['course_structure_cache'] = get_cache('course_structure_cache')
+        except InvalidCacheBackendError:
+            pass
+
     return class_(
         contentstore=content_store,
         metadata_inheritance_cache_subsystem=metadata_inheritance_cache,
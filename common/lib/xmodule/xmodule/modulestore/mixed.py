@@ -17,7 +17,7 @@ from opaque_keys.edx.locations import SlashSeparatedCourseKey
 from . import ModuleStoreWriteBase
 from . import ModuleStoreEnum
 from .exceptions import ItemNotFoundError, DuplicateCourseError
-from .draft_and_published import ModuleStoreDraftAndPublished
+from .draft_and_published import ModuleStoreDraftAndPublished, DIRECT_ONLY_CATEGORIES
 from .split_migrator import SplitMigrator
 
 
@@ -91,16 +91,24 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
     """
     ModuleStore knows how to route requests to the right persistence ms
     """
-    def __init__(self, contentstore, mappings, stores, i18n_service=None, fs_service=None, create_modulestore_instance=None, **kwargs):
+    def __init__(
+            self, contentstore, mappings, stores, i18n_service=None, fs_service=None,
+            create_modulestore_instance=None, signal_handler=None, **kwargs
+    ):
         """
         Initialize a MixedModuleStore. Here we look into our passed in kwargs which should be a
         collection of other modulestore configuration information
+
+        signal_handler, if given, is told when the published content of courses changes,
+        or courses are deleted (see xmodule.modulestore.django.SignalHandler)
         """
         super(MixedModuleStore, self).__init__(contentstore, **kwargs)
 
         if create_modulestore_instance is None:
             raise ValueError('MixedModuleStore constructor must be passed a create_modulestore_instance function')
 
+        self.signal_handler = signal_handler
+
         self.modulestores = []
         self.mappings = {}
 
@@ -307,7 +315,9 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         """
         assert(isinstance(course_key, CourseKey))
         store = self._get_modulestore_for_courseid(course_key)
-        return store.delete_course(course_key, user_id)
+        result = store.delete_course(course_key, user_id)
+        self._send_signal('course_deleted', course_key)
+        return result
 
     @strip_key
     def get_parent_location(self, location, **kwargs):
@@ -374,6 +384,7 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         # add new course to the mapping
         self.mappings[course_key] = store
 
+        self._send_signal('course_published', course_key)
         return course
 
     @strip_key
@@ -392,7 +403,9 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         # to have only course re-runs go to split. This code, however, uses the config'd priority
         dest_modulestore = self._get_modulestore_for_courseid(dest_course_id)
         if source_modulestore == dest_modulestore:
-            return source_modulestore.clone_course(source_course_id, dest_course_id, user_id, fields, **kwargs)
+            result = source_modulestore.clone_course(source_course_id, dest_course_id, user_id, fields, **kwargs)
+            self._send_signal('course_published', dest_course_id)
+            return result
 
         if dest_modulestore.get_modulestore_type() == ModuleStoreEnum.Type.split:
             split_migrator = SplitMigrator(dest_modulestore, source_modulestore)
@@ -401,6 +414,7 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
             )
             # the super handles assets and any other necessities
             super(MixedModuleStore, self).clone_course(source_course_id, dest_course_id, user_id, fields, **kwargs)
+            self._send_signal('course_published', dest_course_id)
 
     @strip_key
     def create_item(self, user_id, course_key, block_type, block_id=None, fields=None, **kwargs):
@@ -420,7 +434,10 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
                 in the newly created block
         """
         modulestore = self._verify_modulestore_support(course_key, 'create_item')
-        return modulestore.create_item(user_id, course_key, block_type, block_id=block_id, fields=fields, **kwargs)
+        xblock = modulestore.create_item(user_id, course_key, block_type, block_id=block_id, fields=fields, **kwargs)
+        if block_type in DIRECT_ONLY_CATEGORIES:
+            self._send_signal('course_published', course_key)
+        return xblock
 
     @strip_key
     def create_child(self, user_id, parent_usage_key, block_type, block_id=None, fields=None, **kwargs):
@@ -440,7 +457,12 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
                 in the newly created block
         """
         modulestore = self._verify_modulestore_support(parent_usage_key.course_key, 'create_child')
-        return modulestore.create_child(user_id, parent_usage_key, block_type, block_id=block_id, fields=fields, **kwargs)
+        xblock = modulestore.create_child(
+            user_id, parent_usage_key, block_type, block_id=block_id, fields=fields, **kwargs
+        )
+        if block_type in DIRECT_ONLY_CATEGORIES:
+            self._send_signal('course_published', parent_usage_key.course_key)
+        return xblock
 
     @strip_key
     def import_xblock(self, user_id, course_key, block_type, block_id, fields=None, runtime=None, **kwargs):
@@ -450,7 +472,10 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         Defer to the course's modulestore if it supports this method
         """
         store = self._verify_modulestore_support(course_key, 'import_xblock')
-        return store.import_xblock(user_id, course_key, block_type, block_id, fields, runtime)
+        xblock = store.import_xblock(user_id, course_key, block_type, block_id, fields, runtime)
+        if block_type in DIRECT_ONLY_CATEGORIES:
+            self._send_signal('course_published', course_key)
+        return xblock
 
     @strip_key
     def update_item(self, xblock, user_id, allow_not_found=False, **kwargs):
@@ -459,7 +484,10 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         (content, children, and metadata) attribute the change to the given user.
         """
         store = self._verify_modulestore_support(xblock.location.course_key, 'update_item')
-        return store.update_item(xblock, user_id, allow_not_found, **kwargs)
+        updated_xblock = store.update_item(xblock, user_id, allow_not_found, **kwargs)
+        if xblock.location.category in DIRECT_ONLY_CATEGORIES:
+            self._send_signal('course_published', xblock.location.course_key)
+        return updated_xblock
 
     @strip_key
     def delete_item(self, location, user_id, **kwargs):
@@ -467,7 +495,10 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         Delete the given item from persistence. kwargs allow modulestore specific parameters.
         """
         store = self._verify_modulestore_support(location.course_key, 'delete_item')
-        return store.delete_item(location, user_id=user_id, **kwargs)
+        result = store.delete_item(location, user_id=user_id, **kwargs)
+        if location.category in DIRECT_ONLY_CATEGORIES:
+            self._send_signal('course_published', location.course_key)
+        return result
 
     def revert_to_published(self, location, user_id):
         """
@@ -561,7 +592,9 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         Returns the newly published item.
         """
         store = self._verify_modulestore_support(location.course_key, 'publish')
-        return store.publish(location, user_id, **kwargs)
+        xblock = store.publish(location, user_id, **kwargs)
+        self._send_signal('course_published', location.course_key)
+        return xblock
 
     @strip_key
     def unpublish(self, location, user_id, **kwargs):
@@ -570,7 +603,9 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         Returns the newly unpublished item.
         """
         store = self._verify_modulestore_support(location.course_key, 'unpublish')
-        return store.unpublish(location, user_id, **kwargs)
+        xblock = store.unpublish(location, user_id, **kwargs)
+        self._send_signal('course_published', location.course_key)
+        return xblock
 
     def convert_to_draft(self, location, user_id):
         """
@@ -591,6 +626,16 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         store = self._verify_modulestore_support(xblock.location.course_key, 'has_changes')
         return store.has_changes(xblock)
 
+    def _send_signal(self, signal_name, course_key):
+        """
+        Tells the signal handler, if there is one, that the course has changed.
+
+        course_published is sent after any write that can change what the LMS shows: publishing
+        or unpublishing, and changes to blocks that are always published (DIRECT_ONLY_CATEGORIES).
+        """
+        if self.signal_handler is not None:
+            self.signal_handler.send(signal_name, course_key=course_key)
+
     def _verify_modulestore_support(self, course_key, method):
         """
         Finds and returns the store that contains the course for the given location, and verifying
@@ -15,7 +15,6 @@ structure:
 import pymongo
 import sys
 import logging
-import copy
 import re
 from uuid import uuid4
 
@@ -57,6 +56,15 @@ BLOCK_TYPES_WITH_CHILDREN = list(set(
     name for name, class_ in XBlock.load_classes() if getattr(class_, 'has_children', False)
 ))
 
+# Version of the format of the metadata inheritance index stored in the
+# metadata_inheritance_cache_subsystem. Cached entries of any other version
+# (including trees cached before the index was versioned) are recomputed.
+METADATA_INHERITANCE_INDEX_VERSION = 1
+
+# Seconds after which the lock on incremental updates of a course's cached
+# metadata inheritance index expires, if its holder never releases it
+METADATA_INHERITANCE_LOCK_TIMEOUT = 60
+
 # Allow us to call _from_deprecated_(son|string) throughout the file
 # pylint: disable=protected-access
 
@@ -544,6 +552,17 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
 
     def _compute_metadata_inheritance_tree(self, course_id):
         '''
+        Compute the metadata inheritance index of the whole course. The index is a dict with these keys:
+
+            version: METADATA_INHERITANCE_INDEX_VERSION
+            root: the url of the course
+            containers: maps the url of each container to a dict with its own inheritable
+                'metadata' and its 'children' (the union of its draft and published children)
+            parents: maps the url of each child of a container to the url of that container
+            inherited: maps the url of each child of a container to the metadata that it inherits
+
+        Unchanged metadata dicts are shared between parents and children rather than copied.
+
         TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
         '''
         # get all collections in the course, this query should not return any leaf nodes
@@ -556,72 +575,180 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
             ('_id.course', course_id.course),
             ('_id.category', {'$in': BLOCK_TYPES_WITH_CHILDREN})
         ])
-        # we just want the Location, children, and inheritable metadata
-        record_filter = {'_id': 1, 'definition.children': 1}
-
-        # just get the inheritable metadata since that is all we need for the computation
-        # this minimizes both data pushed over the wire
-        for field_name in InheritanceMixin.fields:
-            record_filter['metadata.{0}'.format(field_name)] = 1
 
         # call out to the DB
-        resultset = self.collection.find(query, record_filter)
+        resultset = self.collection.find(query, self._inheritance_record_filter())
 
         # it's ok to keep these as deprecated strings b/c the overall cache is indexed by course_key and this
         # is a dictionary relative to that course
-        results_by_url = {}
-        root = None
-
-        # now go through the results and order them by the location url
+        index = {
+            'version': METADATA_INHERITANCE_INDEX_VERSION,
+            'root': None,
+            'containers': {},
+            'parents': {},
+            'inherited': {},
+        }
         for result in resultset:
-            # manually pick it apart b/c the db has tag and we want as_published revision regardless
-            location = as_published(Location._from_deprecated_son(result['_id'], course_id.run))
-
-            location_url = unicode(location)
-            if location_url in results_by_url:
-                # found either draft or live to complement the other revision
-                existing_children = results_by_url[location_url].get('definition', {}).get('children', [])
-                additional_children = result.get('definition', {}).get('children', [])
-                total_children = existing_children + additional_children
-                # use set to get rid of duplicates. We don't care about order; so, it shouldn't matter.
-                results_by_url[location_url].setdefault('definition', {})['children'] = set(total_children)
-            else:
-                results_by_url[location_url] = result
+            location = self._add_inheritance_container(index, course_id, result)
             if location.category == 'course':
-                root = location_url
+                index['root'] = unicode(location)
 
         # now traverse the tree and compute down the inherited metadata
-        metadata_to_inherit = {}
+        root = index['root']
+        if root is not None:
+            self._compute_inherited_metadata(index, root, index['containers'][root]['metadata'])
 
-        def _compute_inherited_metadata(url):
-            """
-            Helper method for computing inherited metadata for a specific location url
-            """
-            my_metadata = results_by_url[url].get('metadata', {})
-
-            # go through all the children and recurse, but only if we have
-            # in the result set. Remember results will not contain leaf nodes
-            for child in results_by_url[url].get('definition', {}).get('children', []):
-                if child in results_by_url:
-                    new_child_metadata = copy.deepcopy(my_metadata)
-                    new_child_metadata.update(results_by_url[child].get('metadata', {}))
-                    results_by_url[child]['metadata'] = new_child_metadata
-                    metadata_to_inherit[child] = new_child_metadata
-                    _compute_inherited_metadata(child)
+        return index
+
+    @staticmethod
+    def _inheritance_record_filter():
+        """
+        Return the fields to fetch for containers in the metadata inheritance index.
+        """
+        # we just want the Location, children, and inheritable metadata
+        record_filter = {'_id': 1, 'definition.children': 1}
+
+        # just get the inheritable metadata since that is all we need for the computation
+        # this minimizes both data pushed over the wire
+        for field_name in InheritanceMixin.fields:
+            record_filter['metadata.{0}'.format(field_name)] = 1
+        return record_filter
+
+    @staticmethod
+    def _add_inheritance_container(index, course_id, result):
+        """
+        Add the container `result` fetched from the DB to the metadata inheritance `index`,
+        and return its published location.
+        """
+        # manually pick it apart b/c the db has tag and we want as_published revision regardless
+        location = as_published(Location._from_deprecated_son(result['_id'], course_id.run))
+
+        location_url = unicode(location)
+        children = result.get('definition', {}).get('children', [])
+        container = index['containers'].get(location_url)
+        if container is not None:
+            # found either draft or live to complement the other revision
+            # use set to get rid of duplicates. We don't care about order; so, it shouldn't matter.
+            container['children'] = list(set(container['children'] + children))
+        else:
+            container = index['containers'][location_url] = {
+                'metadata': result.get('metadata', {}),
+                'children': children,
+            }
+        for child in container['children']:
+            index['parents'][child] = location_url
+        return location
+
+    @staticmethod
+    def _compute_inherited_metadata(index, url, my_metadata):
+        """
+        Compute down the metadata inherited by every descendant of the container at `url`,
+        given the metadata `my_metadata` of that container (including what it inherits).
+        """
+        containers = index['containers']
+        # go through all the children and recurse, but only if we have
+        # in the result set. Remember results will not contain leaf nodes
+        for child in containers[url]['children']:
+            if child in containers:
+                child_metadata = containers[child]['metadata']
+                if child_metadata:
+                    new_child_metadata = dict(my_metadata)
+                    new_child_metadata.update(child_metadata)
                 else:
-                    # this is likely a leaf node, so let's record what metadata we need to inherit
-                    metadata_to_inherit[child] = my_metadata
+                    # nothing to override, so share the parent's (unmodified) dict
+                    new_child_metadata = my_metadata
+                index['inherited'][child] = new_child_metadata
+                MongoModuleStore._compute_inherited_metadata(index, child, new_child_metadata)
+            else:
+                # this is likely a leaf node, so let's record what metadata we need to inherit
+                index['inherited'][child] = my_metadata
+
+    def _update_metadata_inheritance_index(self, index, course_id, location):
+        """
+        Update the metadata inheritance `index` to reflect the current contents of the DB
+        for the item at `location`. Only the container at `location`, and any containers
+        newly added under it, are refetched, and only the inherited metadata of its
+        subtree is recomputed.
+        """
+        # leaves can't affect what anything else inherits
+        if location.category not in BLOCK_TYPES_WITH_CHILDREN:
+            return
+
+        containers = index['containers']
+        url = unicode(as_published(location))
+        old_children = containers.get(url, {}).get('children', [])
+
+        # refetch the container, then any of its descendants that aren't in the index yet
+        to_fetch = [as_published(location)]
+        containers.pop(url, None)
+        while to_fetch:
+            query = {'_id': {'$in': [
+                revision_fcn(child_location).to_deprecated_son()
+                for child_location in to_fetch
+                for revision_fcn in (as_published, as_draft)
+            ]}}
+            fetched = set()
+            for result in self.collection.find(query, self._inheritance_record_filter()):
+                fetched.add(unicode(self._add_inheritance_container(index, course_id, result)))
+
+            to_fetch = []
+            for fetched_url in fetched:
+                for child in containers[fetched_url]['children']:
+                    child_location = course_id.make_usage_key_from_deprecated_string(child)
+                    if child_location.category in BLOCK_TYPES_WITH_CHILDREN and child not in containers:
+                        to_fetch.append(child_location)
+
+        # drop the children that were removed from the container (or all of them, if it was deleted)
+        new_children = set(containers.get(url, {}).get('children', []))
+        for child in old_children:
+            if child not in new_children and index['parents'].get(child) == url:
+                self._drop_inheritance_subtree(index, child)
+
+        if url not in containers:
+            return
+
+        if url == index['root']:
+            my_metadata = containers[url]['metadata']
+        else:
+            parent = index['parents'].get(url)
+            if parent is None or parent not in containers:
+                # orphans don't inherit anything
+                return
+            if parent == index['root']:
+                parent_metadata = containers[parent]['metadata']
+            else:
+                parent_metadata = index['inherited'].get(parent, {})
+            my_metadata = dict(parent_metadata)
+            my_metadata.update(containers[url]['metadata'])
+            index['inherited'][url] = my_metadata
 
-        if root is not None:
-            _compute_inherited_metadata(root)
+        self._compute_inherited_metadata(index, url, my_metadata)
 
-        return metadata_to_inherit
+    @staticmethod
+    def _drop_inheritance_subtree(index, url):
+        """
+        Remove the item at `url` and all of its descendants from the metadata inheritance `index`.
+        """
+        index['parents'].pop(url, None)
+        index['inherited'].pop(url, None)
+        container = index['containers'].pop(url, None)
+        if container is not None:
+            for child in container['children']:
+                if index['parents'].get(child) == url:
+                    MongoModuleStore._drop_inheritance_subtree(index, child)
 
     def _get_cached_metadata_inheritance_tree(self, course_id, force_refresh=False):
         '''
         Compute the metadata inheritance for the course.
         '''
-        tree = {}
+        return self._get_cached_metadata_inheritance_index(course_id, force_refresh)['inherited']
+
+    def _get_cached_metadata_inheritance_index(self, course_id, force_refresh=False):
+        '''
+        Return the metadata inheritance index of the course (see _compute_metadata_inheritance_tree),
+        from the request cache or the caching subsystem if possible.
+        '''
+        index = None
 
         course_id = self.fill_in_run(course_id)
         if not force_refresh:
@@ -631,48 +758,114 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
 
             # then look in any caching subsystem (e.g. memcached)
             if self.metadata_inheritance_cache_subsystem is not None:
-                tree = self.metadata_inheritance_cache_subsystem.get(unicode(course_id), {})
+                index = self.metadata_inheritance_cache_subsystem.get(unicode(course_id), None)
             else:
                 logging.warning(
                     'Running MongoModuleStore without a metadata_inheritance_cache_subsystem. This is \
                     OK in localdev and testing environment. Not OK in production.'
                 )
 
-        if not tree:
+        # entries cached in any other format are stale
+        if not index or index.get('version') != METADATA_INHERITANCE_INDEX_VERSION:
             # if not in subsystem, or we are on force refresh, then we have to compute
-            tree = self._compute_metadata_inheritance_tree(course_id)
+            index = self._compute_metadata_inheritance_tree(course_id)
 
             # now write out computed tree to caching subsystem (e.g. memcached), if available
             if self.metadata_inheritance_cache_subsystem is not None:
-                self.metadata_inheritance_cache_subsystem.set(unicode(course_id), tree)
+                self.metadata_inheritance_cache_subsystem.set(unicode(course_id), index)
 
         # now populate a request_cache, if available. NOTE, we are outside of the
         # scope of the above if: statement so that after a memcache hit, it'll get
         # put into the request_cache
+        self._set_request_cached_metadata_inheritance_index(course_id, index)
+
+        return index
+
+    def _set_request_cached_metadata_inheritance_index(self, course_id, index):
+        """
+        Put the metadata inheritance `index` of the course in the request cache, if available.
+        """
         if self.request_cache is not None:
             # we can't assume the 'metadatat_inheritance' part of the request cache dict has been
             # defined
             if 'metadata_inheritance' not in self.request_cache.data:
                 self.request_cache.data['metadata_inheritance'] = {}
-            self.request_cache.data['metadata_inheritance'][unicode(course_id)] = tree
+            self.request_cache.data['metadata_inheritance'][unicode(course_id)] = index
 
-        return tree
-
-    def refresh_cached_metadata_inheritance_tree(self, course_id, runtime=None):
+    def refresh_cached_metadata_inheritance_tree(self, course_id, runtime=None, location=None):
         """
         Refresh the cached metadata inheritance tree for the org/course combination
         for location
 
+        If given a `location`, only the part of the tree affected by the item at that
+        location is recomputed, rather than the whole course.
+
         If given a runtime, it replaces the cached_metadata in that runtime. NOTE: failure to provide
         a runtime may mean that some objects report old values for inherited data.
         """
         course_id = course_id.for_branch(None)
         if not self._is_in_bulk_operation(course_id):
             # below is done for side effects when runtime is None
-            cached_metadata = self._get_cached_metadata_inheritance_tree(course_id, force_refresh=True)
+            if location is None:
+                cached_metadata = self._get_cached_metadata_inheritance_tree(course_id, force_refresh=True)
+            else:
+                cached_metadata = self._update_cached_metadata_inheritance_tree(course_id, location)
             if runtime:
                 runtime.cached_metadata = cached_metadata
 
+    def _update_cached_metadata_inheritance_tree(self, course_id, location):
+        """
+        Incrementally update the cached metadata inheritance index of the course for a change
+        to the item at `location`, and return the updated inheritance tree.
+
+        The cached index is read, updated and written back under a lock, so that concurrent
+        updates from other processes are not lost. If another process holds the lock, the
+        cached index is dropped instead, and the index is recomputed without caching it.
+        """
+        course_id = self.fill_in_run(course_id)
+        cache = self.metadata_inheritance_cache_subsystem
+        if cache is None:
+            index = self._get_cached_metadata_inheritance_index(course_id)
+            self._update_metadata_inheritance_index(index, course_id, location)
+            self._set_request_cached_metadata_inheritance_index(course_id, index)
+            return index['inherited']
+
+        cache_key = unicode(course_id)
+        lock_key = u'{}.update_lock'.format(cache_key)
+        conflicts_key = u'{}.update_conflicts'.format(cache_key)
+
+        # read before taking the lock, so that any process that fails to take it after us is counted
+        cache.add(conflicts_key, 0)
+        conflicts = cache.get(conflicts_key)
+        if not cache.add(lock_key, True, METADATA_INHERITANCE_LOCK_TIMEOUT):
+            # another process is updating the index, and would overwrite ours; make it drop
+            # the index once it is done, and drop it ourselves in case it is done already
+            try:
+                cache.incr(conflicts_key)
+            except ValueError:
+                # evicted since it was added; the holder sees it gone
+                pass
+            cache.delete(cache_key)
+            index = self._compute_metadata_inheritance_tree(course_id)
+            self._set_request_cached_metadata_inheritance_index(course_id, index)
+            return index['inherited']
+
+        try:
+            # the request cache may predate updates from other processes
+            index = cache.get(cache_key)
+            if not index or index.get('version') != METADATA_INHERITANCE_INDEX_VERSION:
+                index = self._compute_metadata_inheritance_tree(course_id)
+            else:
+                self._update_metadata_inheritance_index(index, course_id, location)
+            cache.set(cache_key, index)
+            if conflicts is None or cache.get(conflicts_key) != conflicts:
+                cache.delete(cache_key)
+        finally:
+            cache.delete(lock_key)
+        self._set_request_cached_metadata_inheritance_index(course_id, index)
+
+        return index['inherited']
+
     def _clean_item_data(self, item):
         """
         Renames the '_id' field in item to 'location'
@@ -1228,7 +1421,9 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
             xblock._edit_info = payload['edit_info']
 
             # recompute (and update) the metadata inheritance tree which is cached
-            self.refresh_cached_metadata_inheritance_tree(xblock.scope_ids.usage_id.course_key, xblock.runtime)
+            self.refresh_cached_metadata_inheritance_tree(
+                xblock.scope_ids.usage_id.course_key, xblock.runtime, xblock.scope_ids.usage_id
+            )
             # fire signal that we've written to DB
         except ItemNotFoundError:
             if not allow_not_found:
@@ -563,8 +563,8 @@ class DraftModuleStore(MongoModuleStore):
 
         first_tier = [as_func(location) for as_func in as_functions]
         self._breadth_first(_delete_item, first_tier)
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(location.course_key)
+        # update the part of the metadata inheritance tree which is cached for the deleted subtree
+        self.refresh_cached_metadata_inheritance_tree(location.course_key, location=location)
 
     def _breadth_first(self, function, root_usages):
         """
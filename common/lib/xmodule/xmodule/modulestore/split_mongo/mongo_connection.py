@@ -1,13 +1,17 @@
 """
 Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
 """
+import cPickle as pickle
 import re
 import pymongo
+import threading
 import time
+import zlib
 
 # Import this just to export it
 from pymongo.errors import DuplicateKeyError  # pylint: disable=unused-import
 
+from collections import OrderedDict
 from contracts import check
 from functools import wraps
 from pymongo.errors import AutoReconnect
@@ -17,6 +21,26 @@ import datetime
 import pytz
 
 
+# Strings which recur in the blocks of every structure (block types, and the keys of
+# the blocks' dicts), shared so that each is only held in memory once per process.
+# These come from a small, fixed vocabulary, so this doesn't grow without bound.
+_INTERNED_STRINGS = {}
+
+
+def _intern(value):
+    """
+    Return the shared copy of the string `value`.
+    """
+    return _INTERNED_STRINGS.setdefault(value, value)
+
+
+def _intern_keys(dct):
+    """
+    Return a copy of `dct` whose keys are the shared copies of its keys.
+    """
+    return {_intern(key): value for key, value in dct.iteritems()}
+
+
 def structure_from_mongo(structure):
     """
     Converts the 'blocks' key from a list [block_data] to a map
@@ -24,6 +48,10 @@ def structure_from_mongo(structure):
     Converts 'root' from [block_type, block_id] to BlockKey.
     Converts 'blocks.*.fields.children' from [[block_type, block_id]] to [BlockKey].
     N.B. Does not convert any other ReferenceFields (because we don't know which fields they are at this level).
+
+    To keep the decoded structure compact, each BlockKey and version id is only held once
+    per structure (rather than once for every reference to it), and block types and the
+    keys of the blocks' dicts are shared between all structures.
     """
     check('seq[2]', structure['root'])
     check('list(dict)', structure['blocks'])
@@ -31,12 +59,31 @@ def structure_from_mongo(structure):
         if 'children' in block['fields']:
             check('list(list[2])', block['fields']['children'])
 
-    structure['root'] = BlockKey(*structure['root'])
+    block_keys = {}
+    versions = {}
+
+    def block_key(block_type, block_id):
+        """Returns the structure's BlockKey for the given block."""
+        key = (block_type, block_id)
+        if key not in block_keys:
+            block_keys[key] = BlockKey(_intern(block_type), block_id)
+        return block_keys[key]
+
+    structure['root'] = block_key(*structure['root'])
     new_blocks = {}
     for block in structure['blocks']:
+        block = _intern_keys(block)
+        block['block_type'] = _intern(block['block_type'])
+        block['fields'] = _intern_keys(block['fields'])
         if 'children' in block['fields']:
-            block['fields']['children'] = [BlockKey(*child) for child in block['fields']['children']]
-        new_blocks[BlockKey(block['block_type'], block.pop('block_id'))] = block
+            block['fields']['children'] = [block_key(*child) for child in block['fields']['children']]
+        if 'edit_info' in block:
+            edit_info = block['edit_info'] = _intern_keys(block['edit_info'])
+            for version_key in ('previous_version', 'update_version', 'source_version'):
+                version = edit_info.get(version_key)
+                if version is not None:
+                    edit_info[version_key] = versions.setdefault(version, version)
+        new_blocks[block_key(block['block_type'], block.pop('block_id'))] = block
     structure['blocks'] = new_blocks
 
     return structure
@@ -68,6 +115,112 @@ def structure_to_mongo(structure):
     return new_structure
 
 
+def copy_structure(structure):
+    """
+    Copy `structure` deeply enough that the changes the runtime makes in place to
+    the structures it loads (merging definition fields into the blocks' 'fields', and
+    caching subtree edit info in their 'edit_info') don't affect the original.
+    This is much cheaper than a deepcopy.
+    """
+    new_structure = dict(structure)
+    new_blocks = {}
+    for block_key, block in structure['blocks'].iteritems():
+        new_block = dict(block)
+        new_block['fields'] = dict(block['fields'])
+        if 'children' in new_block['fields']:
+            new_block['fields']['children'] = list(new_block['fields']['children'])
+        if 'edit_info' in block:
+            new_block['edit_info'] = dict(block['edit_info'])
+        new_blocks[block_key] = new_block
+    new_structure['blocks'] = new_blocks
+    return new_structure
+
+
+class CourseStructureCache(object):
+    """
+    Two-tier cache of decoded course structures, keyed by their version guid.
+
+    Structures are never changed once saved (every edit creates a new version), so
+    cached entries never need to be invalidated. The first tier is an in-process LRU of
+    decoded structures, bounded by the total size of the structures when pickled. That
+    is an approximation: decoded structures take a few times as much memory. The second,
+    optional, tier is a cache shared between processes (e.g. memcached, or anything
+    implementing the `get` and `set` methods of django's cache API), which holds the
+    structures pickled and compressed.
+
+    Callers get their own copy of each structure (see `copy_structure`), so that the
+    changes they make to it don't reach the cache.
+    """
+    def __init__(self, max_bytes=0, shared_cache=None):
+        """
+        max_bytes: the maximum pickled size of the structures in the in-process tier (0 disables it)
+        shared_cache: the shared tier, if any
+        """
+        self.max_bytes = max_bytes
+        self.shared_cache = shared_cache
+        # maps version guids to (structure, pickled size)
+        self._structures = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, version_guid):
+        """
+        Return a copy of the structure with id `version_guid`, or None if it isn't cached.
+        """
+        with self._lock:
+            entry = self._structures.pop(version_guid, None)
+            if entry is not None:
+                # move it to the most recently used end
+                self._structures[version_guid] = entry
+        structure = entry[0] if entry is not None else None
+
+        if structure is None and self.shared_cache is not None:
+            compressed = self.shared_cache.get(self._shared_key(version_guid))
+            if compressed is not None:
+                pickled = zlib.decompress(compressed)
+                structure = pickle.loads(pickled)
+                self._add(version_guid, structure, len(pickled))
+
+        if structure is None:
+            return None
+        return copy_structure(structure)
+
+    def set(self, version_guid, structure):
+        """
+        Cache a copy of `structure` as the structure with id `version_guid`.
+        """
+        if self.max_bytes <= 0 and self.shared_cache is None:
+            return
+        pickled = pickle.dumps(structure, pickle.HIGHEST_PROTOCOL)
+        self._add(version_guid, copy_structure(structure), len(pickled))
+        if self.shared_cache is not None:
+            self.shared_cache.set(self._shared_key(version_guid), zlib.compress(pickled))
+
+    def _add(self, version_guid, structure, num_bytes):
+        """
+        Add `structure`, of pickled size `num_bytes`, to the in-process tier, evicting
+        the least recently used structures if it's full.
+        """
+        if num_bytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._structures.pop(version_guid, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._structures[version_guid] = (structure, num_bytes)
+            self._bytes += num_bytes
+            while self._bytes > self.max_bytes:
+                __, (__, evicted_bytes) = self._structures.popitem(last=False)
+                self._bytes -= evicted_bytes
+
+    @staticmethod
+    def _shared_key(version_guid):
+        """
+        Return the key of the structure with id `version_guid` in the shared tier.
+        """
+        return 'course_structure.{}'.format(version_guid)
+
+
 def autoretry_read(wait=0.1, retries=5):
     """
     Automatically retry a read-only method in the case of a pymongo
@@ -99,11 +252,17 @@ class MongoConnection(object):
     Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
     """
     def __init__(
-        self, db, collection, host, port=27017, tz_aware=True, user=None, password=None, **kwargs
+        self, db, collection, host, port=27017, tz_aware=True, user=None, password=None,
+        structure_cache=None, **kwargs
     ):
         """
         Create & open the connection, authenticate, and provide pointers to the collections
+
+        structure_cache: a CourseStructureCache for the structures read through this connection.
+            By default, structures aren't cached.
         """
+        self.structure_cache = structure_cache if structure_cache is not None else CourseStructureCache()
+
         self.database = pymongo.database.Database(
             pymongo.MongoClient(
                 host=host,
@@ -142,8 +301,14 @@ class MongoConnection(object):
     def get_structure(self, key):
         """
         Get the structure from the persistence mechanism whose id is the given key
+
+        Structures are immutable, so they're served from the structure cache when possible.
         """
-        return structure_from_mongo(self.structures.find_one({'_id': key}))
+        structure = self.structure_cache.get(key)
+        if structure is None:
+            structure = structure_from_mongo(self.structures.find_one({'_id': key}))
+            self.structure_cache.set(key, structure)
+        return structure
 
     @autoretry_read()
     def find_structures_by_id(self, ids):
@@ -153,7 +318,21 @@ class MongoConnection(object):
         Arguments:
             ids (list): A list of structure ids
         """
-        return [structure_from_mongo(structure) for structure in self.structures.find({'_id': {'$in': ids}})]
+        structures = []
+        uncached_ids = []
+        for structure_id in ids:
+            structure = self.structure_cache.get(structure_id)
+            if structure is None:
+                uncached_ids.append(structure_id)
+            else:
+                structures.append(structure)
+
+        if uncached_ids:
+            for structure in self.structures.find({'_id': {'$in': uncached_ids}}):
+                structure = structure_from_mongo(structure)
+                self.structure_cache.set(structure['_id'], structure)
+                structures.append(structure)
+        return structures
 
     @autoretry_read()
     def find_structures_derived_from(self, ids):
@@ -190,6 +369,7 @@ class MongoConnection(object):
         Insert a new structure into the database.
         """
         self.structures.insert(structure_to_mongo(structure))
+        self.structure_cache.set(structure['_id'], structure)
 
     @autoretry_read()
     def get_course_index(self, key, ignore_case=False):
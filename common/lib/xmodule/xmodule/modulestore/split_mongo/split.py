@@ -75,7 +75,7 @@ from xmodule.modulestore import (
 
 from ..exceptions import ItemNotFoundError
 from .caching_descriptor_system import CachingDescriptorSystem
-from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection, DuplicateKeyError
+from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection, CourseStructureCache, DuplicateKeyError
 from xmodule.modulestore.split_mongo import BlockKey, CourseEnvelope
 from xmodule.error_module import ErrorDescriptor
 from collections import defaultdict
@@ -573,14 +573,21 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
                  default_class=None,
                  error_tracker=null_error_tracker,
                  i18n_service=None, fs_service=None,
-                 services=None, **kwargs):
+                 services=None, course_structure_cache=None,
+                 course_structure_cache_max_bytes=0, **kwargs):
         """
         :param doc_store_config: must have a host, db, and collection entries. Other common entries: port, tz_aware.
+        :param course_structure_cache: a cache shared between processes (e.g. memcached) in which to keep
+            course structures, in addition to the in-process cache of the most recently used structures,
+            of up to `course_structure_cache_max_bytes` when pickled.
         """
 
         super(SplitMongoModuleStore, self).__init__(contentstore, **kwargs)
 
-        self.db_connection = MongoConnection(**doc_store_config)
+        self.db_connection = MongoConnection(
+            structure_cache=CourseStructureCache(course_structure_cache_max_bytes, course_structure_cache),
+            **doc_store_config
+        )
         self.db = self.db_connection.database
 
         # Code review question: How should I expire entries?
@@ -69,6 +69,32 @@ class MemoryCache(object):
         """
         self._data[key] = value
 
+    def add(self, key, value, timeout=None):  # pylint: disable=unused-argument
+        """
+        Set a key in the cache, unless it is set already.
+
+        Returns whether the key was set.
+        """
+        if key in self._data:
+            return False
+        self._data[key] = value
+        return True
+
+    def incr(self, key, delta=1):
+        """
+        Increment the number at a key, raising ValueError if it is not set.
+        """
+        if key not in self._data:
+            raise ValueError("Key '{}' not found".format(key))
+        self._data[key] += delta
+        return self._data[key]
+
+    def delete(self, key):
+        """
+        Remove a key from the cache.
+        """
+        self._data.pop(key, None)
+
 
 class MongoModulestoreBuilder(object):
     """
@@ -13,6 +13,7 @@ from uuid import uuid4
 from datetime import datetime
 from pytz import UTC
 import unittest
+from mock import patch
 from xblock.core import XBlock
 
 from xblock.fields import Scope, Reference, ReferenceList, ReferenceValueDict
@@ -38,6 +39,7 @@ from xmodule.x_module import XModuleMixin
 from xmodule.modulestore.mongo.base import as_draft
 from xmodule.modulestore.tests.mongo_connection import MONGO_PORT_NUM, MONGO_HOST
 from xmodule.modulestore.edit_info import EditInfoMixin
+from xmodule.modulestore.tests.test_cross_modulestore_import_export import MemoryCache
 
 log = logging.getLogger(__name__)
 
@@ -631,6 +633,85 @@ class TestMongoModuleStore(unittest.TestCase):
         finally:
             shutil.rmtree(root_dir)
 
+    def test_incremental_metadata_inheritance(self):
+        """
+        Tests that the metadata inheritance tree which is updated incrementally on edits
+        matches the tree computed from scratch
+        """
+        with patch.object(self.draft_store, 'metadata_inheritance_cache_subsystem', MemoryCache()):
+            course = self.draft_store.create_course('edX', 'inheritance', 'incremental', self.dummy_user)
+            chapter = self.draft_store.create_child(self.dummy_user, course.location, 'chapter', 'chapter')
+            sequential = self.draft_store.create_child(self.dummy_user, chapter.location, 'sequential', 'sequential')
+            problem = self.draft_store.create_child(self.dummy_user, sequential.location, 'problem', 'problem')
+
+            def assert_tree_is_current():
+                """Compares the cached tree with one computed from scratch."""
+                tree = self.draft_store._get_cached_metadata_inheritance_tree(course.id)
+                self.assertEqual(tree, self.draft_store._compute_metadata_inheritance_tree(course.id)['inherited'])
+                return tree
+
+            chapter = self.draft_store.get_item(chapter.location)
+            chapter.showanswer = 'never'
+            self.draft_store.update_item(chapter, self.dummy_user)
+            assert_tree_is_current()
+            self.assertEqual(self.draft_store.get_item(problem.location).showanswer, 'never')
+
+            self.draft_store.delete_item(sequential.location, self.dummy_user)
+            tree = assert_tree_is_current()
+            self.assertNotIn(unicode(problem.location), tree)
+
+    def test_concurrent_metadata_inheritance_updates(self):
+        """
+        Tests that the cached inheritance tree is dropped, rather than overwritten with a stale
+        one, when another process updates it at the same time
+        """
+        cache = MemoryCache()
+        with patch.object(self.draft_store, 'metadata_inheritance_cache_subsystem', cache):
+            course = self.draft_store.create_course('edX', 'inheritance', 'concurrent', self.dummy_user)
+            chapter = self.draft_store.create_child(self.dummy_user, course.location, 'chapter', 'chapter')
+            problem = self.draft_store.create_child(self.dummy_user, chapter.location, 'problem', 'problem')
+            cache_key = unicode(course.id)
+            lock_key = u'{}.update_lock'.format(cache_key)
+            self.draft_store._get_cached_metadata_inheritance_tree(course.id)
+            self.assertNotIn(lock_key, cache._data)
+
+            # another process holds the lock
+            cache.add(lock_key, True)
+            chapter = self.draft_store.get_item(chapter.location)
+            chapter.showanswer = 'never'
+            self.draft_store.update_item(chapter, self.dummy_user)
+            self.assertIsNone(cache.get(cache_key))
+            self.assertEqual(self.draft_store.get_item(problem.location).showanswer, 'never')
+            cache.delete(lock_key)
+
+            # another process fails to take the lock while we hold it
+            self.draft_store._get_cached_metadata_inheritance_tree(course.id)
+            update_index = self.draft_store._update_metadata_inheritance_index
+
+            def update_while_contended(*args):
+                """Updates the index, while another process waits for the lock."""
+                cache.incr(u'{}.update_conflicts'.format(cache_key))
+                update_index(*args)
+
+            with patch.object(self.draft_store, '_update_metadata_inheritance_index', update_while_contended):
+                chapter = self.draft_store.get_item(chapter.location)
+                chapter.showanswer = 'always'
+                self.draft_store.update_item(chapter, self.dummy_user)
+            self.assertIsNone(cache.get(cache_key))
+            self.assertNotIn(lock_key, cache._data)
+
+    def test_stale_metadata_inheritance_format(self):
+        """
+        Tests that cached inheritance trees without the current version are recomputed
+        """
+        course_key = SlashSeparatedCourseKey('edX', 'toy', '2012_Fall')
+        cache = MemoryCache()
+        cache.set(unicode(course_key), {'i4x://edX/toy/chapter/Overview': {}})
+        with patch.object(self.draft_store, 'metadata_inheritance_cache_subsystem', cache):
+            tree = self.draft_store._get_cached_metadata_inheritance_tree(course_key)
+        self.assertEqual(tree, self.draft_store._compute_metadata_inheritance_tree(course_key)['inherited'])
+        self.assertEqual(cache.get(unicode(course_key))['inherited'], tree)
+
 
 class TestMongoKeyValueStore(object):
     """
@@ -0,0 +1,145 @@
+"""
+Tests of how the split modulestore decodes and caches course structures.
+"""
+import cPickle as pickle
+import unittest
+
+from bson.objectid import ObjectId
+
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.mongo_connection import CourseStructureCache, structure_from_mongo
+from xmodule.modulestore.tests.test_cross_modulestore_import_export import MemoryCache
+
+
+def make_structure():
+    """
+    Returns a minimal decoded structure.
+    """
+    root = BlockKey('course', 'course')
+    chapter = BlockKey('chapter', 'chapter')
+    return {
+        '_id': ObjectId(),
+        'root': root,
+        'blocks': {
+            root: {'block_type': 'course', 'fields': {'children': [chapter]}, 'edit_info': {}},
+            chapter: {'block_type': 'chapter', 'fields': {}, 'edit_info': {}},
+        },
+    }
+
+
+def pickled_size(structure):
+    """
+    Returns the size that CourseStructureCache counts `structure` as.
+    """
+    return len(pickle.dumps(structure, pickle.HIGHEST_PROTOCOL))
+
+
+class TestCourseStructureCache(unittest.TestCase):
+    """
+    Tests of CourseStructureCache.
+    """
+    def test_disabled(self):
+        cache = CourseStructureCache()
+        structure = make_structure()
+        cache.set(structure['_id'], structure)
+        self.assertIsNone(cache.get(structure['_id']))
+
+    def test_lru_eviction(self):
+        structures = [make_structure() for __ in xrange(3)]
+        # room for two of the structures
+        cache = CourseStructureCache(max_bytes=int(pickled_size(structures[0]) * 2.5))
+        cache.set(structures[0]['_id'], structures[0])
+        cache.set(structures[1]['_id'], structures[1])
+
+        # using the first structure makes the second the least recently used
+        self.assertEqual(cache.get(structures[0]['_id']), structures[0])
+        cache.set(structures[2]['_id'], structures[2])
+
+        self.assertEqual(cache.get(structures[0]['_id']), structures[0])
+        self.assertIsNone(cache.get(structures[1]['_id']))
+        self.assertEqual(cache.get(structures[2]['_id']), structures[2])
+
+    def test_too_large(self):
+        structure = make_structure()
+        cache = CourseStructureCache(max_bytes=pickled_size(structure) - 1)
+        cache.set(structure['_id'], structure)
+        self.assertIsNone(cache.get(structure['_id']))
+
+    def test_copies_are_isolated(self):
+        cache = CourseStructureCache(max_bytes=1024 * 1024)
+        structure = make_structure()
+        cache.set(structure['_id'], structure)
+
+        # changes made in place by the runtime must not reach the cache
+        structure['blocks'][structure['root']]['fields']['display_name'] = 'changed'
+        cached = cache.get(structure['_id'])
+        cached['blocks'][cached['root']]['fields']['children'].append(BlockKey('chapter', 'other'))
+        cached['blocks'][cached['root']]['edit_info']['_subtree_edited_on'] = 'now'
+
+        self.assertEqual(cache.get(structure['_id']), make_structure_like(structure))
+
+    def test_shared_tier(self):
+        shared_cache = MemoryCache()
+        structure = make_structure()
+        CourseStructureCache(max_bytes=1024 * 1024, shared_cache=shared_cache).set(structure['_id'], structure)
+
+        # another process, with an empty in-process tier, finds it in the shared tier
+        self.assertEqual(
+            CourseStructureCache(max_bytes=1024 * 1024, shared_cache=shared_cache).get(structure['_id']), structure
+        )
+        self.assertEqual(CourseStructureCache(shared_cache=shared_cache).get(structure['_id']), structure)
+        self.assertIsNone(CourseStructureCache(shared_cache=shared_cache).get(ObjectId()))
+
+
+def make_structure_like(structure):
+    """
+    Returns a structure with the id of `structure`, and the contents of make_structure().
+    """
+    expected = make_structure()
+    expected['_id'] = structure['_id']
+    return expected
+
+
+class TestStructureFromMongo(unittest.TestCase):
+    """
+    Tests of decoding structures read from mongo.
+    """
+    def test_shared_keys_and_versions(self):
+        version = ObjectId()
+        structure = structure_from_mongo({
+            '_id': version,
+            'root': [u'course', u'course'],
+            'blocks': [
+                {
+                    u'block_type': u'course',
+                    u'block_id': u'course',
+                    u'fields': {u'children': [[u'chapter', u'chapter']]},
+                    u'edit_info': {u'update_version': ObjectId(str(version))},
+                },
+                {
+                    u'block_type': u'chapter',
+                    u'block_id': u'chapter',
+                    u'fields': {},
+                    u'edit_info': {u'update_version': ObjectId(str(version))},
+                },
+            ],
+        })
+
+        root = structure['root']
+        chapter = BlockKey(u'chapter', u'chapter')
+        self.assertEqual(root, BlockKey(u'course', u'course'))
+        self.assertEqual(structure['blocks'][root]['fields']['children'], [chapter])
+
+        # each BlockKey and version is held once per structure
+        blocks_by_key = {block_key: block_key for block_key in structure['blocks']}
+        self.assertIs(blocks_by_key[root], root)
+        self.assertIs(structure['blocks'][root]['fields']['children'][0], blocks_by_key[chapter])
+        self.assertIs(
+            structure['blocks'][root]['edit_info']['update_version'],
+            structure['blocks'][chapter]['edit_info']['update_version']
+        )
+
+        # dict keys are shared between blocks
+        root_keys = {key: key for key in structure['blocks'][root]}
+        for key in structure['blocks'][chapter]:
+            self.assertIs(key, root_keys[key])
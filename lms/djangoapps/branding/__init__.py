@@ -2,17 +2,23 @@ from xmodule.modulestore.django import modulestore
 from xmodule.course_module import CourseDescriptor
 from django.conf import settings
 
+from course_overviews.models import CourseOverview
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
 from microsite_configuration import microsite
 
 def get_visible_courses():
     """
     Return the set of CourseDescriptors that should be visible in this branded instance
+
+    With FEATURES['ENABLE_COURSE_OVERVIEWS'], these are CourseOverviews instead.
     """
-    _courses = modulestore().get_courses()
+    if settings.FEATURES.get('ENABLE_COURSE_OVERVIEWS', False):
+        courses = CourseOverview.get_all_courses()
+    else:
+        _courses = modulestore().get_courses()
 
-    courses = [c for c in _courses
-               if isinstance(c, CourseDescriptor)]
+        courses = [c for c in _courses
+                   if isinstance(c, CourseDescriptor)]
     courses = sorted(courses, key=lambda course: course.number)
 
     subdomain = microsite.get_value('subdomain', 'default')
@@ -32,6 +32,7 @@ from django.contrib.auth.models import User
 from django.core.mail import EmailMultiAlternatives, get_connection
 from django.core.urlresolvers import reverse
 
+from bulk_email.throttling import get_rate_limiter
 from bulk_email.models import (
     CourseEmail, Optout, CourseEmailTemplate,
     SEND_TO_MYSELF, SEND_TO_ALL, TO_OPTIONS,
@@ -91,6 +92,15 @@ BULK_EMAIL_FAILURE_ERRORS = (
 )
 
 
+def _is_throttling_error(exc):
+    """
+    Returns whether `exc` means an email was rejected for being sent too fast.
+    """
+    if isinstance(exc, SMTPDataError):
+        return 400 <= exc.smtp_code < 500
+    return isinstance(exc, SESMaxSendingRateExceededError)
+
+
 def _get_recipient_queryset(user_id, to_option, course_id, course_location):
     """
     Returns a query set of email recipients corresponding to the requested to_option category.
@@ -98,7 +108,7 @@ def _get_recipient_queryset(user_id, to_option, course_id, course_location):
     `to_option` is either SEND_TO_MYSELF, SEND_TO_STAFF, or SEND_TO_ALL.
 
     Recipients who are in more than one category (e.g. enrolled in the course and are staff or self)
-    will be properly deduped.
+    will be properly deduped, and users who opted out of email from the course are excluded.
     """
     if to_option not in TO_OPTIONS:
         log.error("Unexpected bulk email TO_OPTION found: %s", to_option)
@@ -128,7 +138,18 @@ def _get_recipient_queryset(user_id, to_option, course_id, course_location):
             unenrolled_staff_qset = use_read_replica_if_available(unenrolled_staff_qset)
 
             unenrolled_staff_ids = [user.id for user in unenrolled_staff_qset]
-            recipient_qset = enrollment_qset | User.objects.filter(id__in=unenrolled_staff_ids)
+            recipient_qset = enrollment_qset
+            if unenrolled_staff_ids:
+                # The OR outer-joins the staff with their enrollments in other
+                # courses, which would return them once for each of those. The
+                # DISTINCT is still over the enrollments of this course only.
+                recipient_qset = (recipient_qset | User.objects.filter(id__in=unenrolled_staff_ids)).distinct()
+
+    # Users who opted out are never recipients, so subtasks get lists that are
+    # already filtered. This is an anti-join on the (user, course) index of
+    # Optout for each recipient; NOT IN matches nothing if the ids include NULL.
+    optout_ids = Optout.objects.filter(course_id=course_id, user__isnull=False).values('user_id')
+    recipient_qset = recipient_qset.exclude(id__in=optout_ids)
 
     # again, use read_replica if available to lighten the load for large queries
     return use_read_replica_if_available(recipient_qset)
@@ -283,7 +304,8 @@ def send_course_email(entry_id, email_id, to_list, global_email_context, subtask
         Most values will be zero on initial call, but may be different when the task is
         invoked as part of a retry.
 
-    Sends to all addresses contained in to_list that are not also in the Optout table.
+    Sends to all addresses contained in to_list, from which users who opted out were excluded
+    when the subtasks were queued.
     Emails are sent multi-part, in both plain text and html.  Updates InstructorTask object
     with status information (sends, failures, skips) and updates number of subtasks completed.
     """
@@ -347,26 +369,6 @@ def send_course_email(entry_id, email_id, to_list, global_email_context, subtask
     return new_subtask_status.to_dict()
 
 
-def _filter_optouts_from_recipients(to_list, course_id):
-    """
-    Filters a recipient list based on student opt-outs for a given course.
-
-    Returns the filtered recipient list, as well as the number of optouts
-    removed from the list.
-    """
-    optouts = Optout.objects.filter(
-        course_id=course_id,
-        user__in=[i['pk'] for i in to_list]
-    ).values_list('user__email', flat=True)
-    optouts = set(optouts)
-    # Only count the num_optout for the first time the optouts are calculated.
-    # We assume that the number will not change on retries, and so we don't need
-    # to calculate it each time.
-    num_optout = len(optouts)
-    to_list = [recipient for recipient in to_list if recipient['email'] not in optouts]
-    return to_list, num_optout
-
-
 def _get_source_address(course_id, course_title):
     """
     Calculates an email address to be used as the 'from-address' for sent emails.
@@ -407,7 +409,8 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         template.  It does not include 'name' and 'email', which will be provided by the to_list.
       * `subtask_status` : object of class SubtaskStatus representing current status.
 
-    Sends to all addresses contained in to_list that are not also in the Optout table.
+    Sends to all addresses contained in to_list, from which users who opted out were excluded
+    when the subtasks were queued.
     Emails are sent multi-part, in both plain text and html.
 
     Returns a tuple of two values:
@@ -426,16 +429,6 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         log.exception("Task %s: could not find email id:%s to send.", task_id, email_id)
         raise
 
-    # Exclude optouts (if not a retry):
-    # Note that we don't have to do the optout logic at all if this is a retry,
-    # because we have presumably already performed the optout logic on the first
-    # attempt.  Anyone on the to_list on a retry has already passed the filter
-    # that existed at that time, and we don't need to keep checking for changes
-    # in the Optout list.
-    if subtask_status.get_retry_count() == 0:
-        to_list, num_optout = _filter_optouts_from_recipients(to_list, course_email.course_id)
-        subtask_status.increment(skipped=num_optout)
-
     course_title = global_email_context['course_title']
     subject = "[" + course_title + "] " + course_email.subject
 
@@ -445,6 +438,8 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
 
     # use the CourseEmailTemplate that was associated with the CourseEmail
     course_email_template = course_email.get_template()
+    rate_limiter = get_rate_limiter()
+    consecutive_throttles = 0
     try:
         connection = get_connection()
         connection.open()
@@ -483,7 +478,10 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
             # for a period of time between all emails within this task.  Choice of
             # the value depends on the number of workers that might be sending email in
             # parallel, and what the SES throttle rate is.
-            if subtask_status.retried_nomax > 0:
+            # With a shared rate limit, every email waits for its turn instead.
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            elif subtask_status.retried_nomax > 0:
                 sleep(settings.BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS)
 
             try:
@@ -492,9 +490,18 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
                 with dog_stats_api.timer('course_email.single_send.time.overall', tags=[_statsd_tag(course_title)]):
                     connection.send_messages([email_msg])
 
-            except SMTPDataError as exc:
+            except (SMTPDataError, SESMaxSendingRateExceededError) as exc:
+                if (rate_limiter is not None and _is_throttling_error(exc) and
+                        consecutive_throttles < rate_limiter.throttled_retries):
+                    # Send the email again, at the lowered rate.
+                    log.info('Task %s: email with id %s to %s throttled, sending it again', task_id, email_id, email)
+                    dog_stats_api.increment('course_email.throttled', tags=[_statsd_tag(course_title)])
+                    rate_limiter.throttled()
+                    consecutive_throttles += 1
+                    continue
+
                 # According to SMTP spec, we'll retry error codes in the 4xx range.  5xx range indicates hard failure.
-                if exc.smtp_code >= 400 and exc.smtp_code < 500:
+                if _is_throttling_error(exc):
                     # This will cause the outer handler to catch the exception and retry the entire task.
                     raise exc
                 else:
@@ -521,9 +528,12 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
             # successfully been processed.  (That way, if there were a failure that
             # needed to be retried, the user is still on the list.)
             to_list.pop()
+            consecutive_throttles = 0
 
     except INFINITE_RETRY_ERRORS as exc:
         dog_stats_api.increment('course_email.infinite_retry', tags=[_statsd_tag(course_title)])
+        if rate_limiter is not None:
+            rate_limiter.throttled()
         # Increment the "retried_nomax" counter, update other counters with progress to date,
         # and set the state to RETRY:
         subtask_status.increment(retried_nomax=1, state=RETRY)
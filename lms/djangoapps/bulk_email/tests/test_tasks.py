@@ -36,6 +36,9 @@ from instructor_task.models import InstructorTask
 from instructor_task.tests.test_base import InstructorTaskCourseTestCase
 from instructor_task.tests.factories import InstructorTaskFactory
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
+from student.models import CourseEnrollment
+from student.roles import CourseStaffRole
+from student.tests.factories import UserFactory
 
 
 class TestTaskFailure(Exception):
@@ -225,20 +228,34 @@ class TestBulkEmailInstructorTask(InstructorTaskCourseTestCase):
             get_conn.return_value.send_messages.side_effect = cycle([None])
             self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails - 1, num_emails - 1)
 
-    def test_skipped(self):
+    def test_optouts_not_queued(self):
         # Select number of emails to fit into a single subtask.
         num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
         # We also send email to the instructor:
         students = self._create_students(num_emails - 1)
         # have every fourth student optout:
-        expected_skipped = int((num_emails + 3) / 4.0)
-        expected_succeeds = num_emails - expected_skipped
+        num_optouts = int((num_emails + 3) / 4.0)
+        expected_succeeds = num_emails - num_optouts
         for index in range(0, num_emails, 4):
             Optout.objects.create(user=students[index], course_id=self.course.id)
-        # mark some students as opting out
+        # students who opted out are not recipients, rather than skipped
         with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
             get_conn.return_value.send_messages.side_effect = cycle([None])
-            self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, expected_succeeds, skipped=expected_skipped)
+            self._test_run_with_task(send_bulk_course_email, 'emailed', expected_succeeds, expected_succeeds)
+
+    def test_staff_enrolled_in_other_courses(self):
+        # Select number of emails to fit into a single subtask.
+        num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
+        # We also send email to the instructor and to a course staff member:
+        self._create_students(num_emails - 2)
+        staff = UserFactory.create()
+        CourseStaffRole(self.course.id).add_users(staff)
+        # who is only sent the email once, however many other courses they are enrolled in:
+        for course in ("first", "second"):
+            CourseEnrollment.enroll(staff, SlashSeparatedCourseKey("other", course, "run"))
+        with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+            get_conn.return_value.send_messages.side_effect = cycle([None])
+            self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
 
     def _test_email_address_failures(self, exception):
         """Test that celery handles bad address errors by failing and not retrying."""
@@ -373,6 +390,23 @@ class TestBulkEmailInstructorTask(InstructorTaskCourseTestCase):
     def test_retry_after_ses_throttling_error(self):
         self._test_retry_after_unlimited_retry_error(SESMaxSendingRateExceededError(455, "Throttling: Sending rate exceeded"))
 
+    def test_throttling_with_rate_limit(self):
+        # With a shared rate limit, throttled emails are sent again by the task itself, more slowly.
+        num_emails = 8
+        # We also send email to the instructor:
+        self._create_students(num_emails - 1)
+        rate_limiter = Mock(throttled_retries=5)
+        with patch('bulk_email.tasks.get_rate_limiter', return_value=rate_limiter):
+            with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+                # Cycle through two throttling errors followed by a success.
+                get_conn.return_value.send_messages.side_effect = cycle(
+                    [SESMaxSendingRateExceededError(455, "Throttling: Sending rate exceeded")] * 2 + [None]
+                )
+                self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
+
+        self.assertEqual(rate_limiter.throttled.call_count, 2 * num_emails)
+        self.assertEqual(rate_limiter.acquire.call_count, 3 * num_emails)
+
     def _test_immediate_failure(self, exception):
         """Test that celery can hit a maximum number of retries."""
         # Doesn't really matter how many recipients, since we expect
@@ -0,0 +1,80 @@
+"""
+Unit tests for the shared rate limit on bulk email.
+"""
+import unittest
+
+from django.core.cache import get_cache
+from mock import patch
+
+from bulk_email.throttling import SendRateLimiter
+
+
+class FakeClock(object):
+    """A clock that only moves when slept on."""
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class SendRateLimiterTest(unittest.TestCase):
+    """
+    Tests of the token bucket that bulk email tasks take tokens from.
+    """
+    def setUp(self):
+        self.cache = get_cache('django.core.cache.backends.locmem.LocMemCache', LOCATION='bulk-email-throttling')
+        self.cache.clear()
+        self.limiter = SendRateLimiter(self.cache, initial_rate=4, min_rate=1, max_rate=6)
+        self.clock = FakeClock(1000.0)
+        patcher = patch('bulk_email.throttling.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_tokens_spread_over_second(self):
+        times = []
+        for __ in xrange(3):
+            self.limiter.acquire()
+            times.append(self.clock.now)
+        self.assertEqual(times, [1000.0, 1000.25, 1000.5])
+
+    def test_waits_for_next_second(self):
+        # Other tasks took the tokens of this second
+        self.cache.set('bulk_email.rate_limit.tokens.1000', 4)
+
+        self.limiter.acquire()
+        self.assertEqual(self.clock.now, 1001.0)
+
+    def test_rate_increased_when_tokens_run_out(self):
+        for __ in xrange(4):
+            self.limiter.acquire()
+        self.assertEqual(self.limiter.get_rate(), 5)
+
+    def test_rate_not_increased_after_throttling(self):
+        self.limiter.throttled()
+        rate = self.limiter.get_rate()
+        for __ in xrange(rate):
+            self.limiter.acquire()
+        self.assertEqual(self.limiter.get_rate(), rate)
+
+    def test_max_rate(self):
+        self.cache.set('bulk_email.rate_limit.rate', 6)
+        for __ in xrange(6):
+            self.limiter.acquire()
+        self.assertEqual(self.limiter.get_rate(), 6)
+
+    def test_throttled(self):
+        self.limiter.throttled()
+        self.assertEqual(self.limiter.get_rate(), 3)
+
+        # Other tasks throttled at the same time don't lower the rate again
+        self.limiter.throttled()
+        self.assertEqual(self.limiter.get_rate(), 3)
+
+    def test_min_rate(self):
+        self.cache.set('bulk_email.rate_limit.rate', 1)
+        self.limiter.throttled()
+        self.assertEqual(self.limiter.get_rate(), 1)
@@ -0,0 +1,145 @@
+"""
+A limit on the rate at which all bulk email tasks together send email.
+
+Email providers limit how fast an account sends (SES, to a number of emails
+per second), and reject emails sent faster. Tasks used to find out by being
+rejected, and then be retried later, sleeping between emails
+(BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS) without regard to each other.
+
+With BULK_EMAIL_RATE_LIMIT set, e.g.::
+
+  BULK_EMAIL_RATE_LIMIT = {
+      'INITIAL_RATE': 10,
+      'MIN_RATE': 1,
+      'MAX_RATE': 14,
+  }
+
+send_course_email tasks take a token from a bucket in the Django cache before
+sending each email. The bucket is refilled with `rate` tokens every second,
+handed out in order: the task that takes the n'th token of a second waits
+until n / rate of the second has passed, so emails are spread evenly over the
+second, and a task that finds no tokens left waits for the next second.
+
+The rate adapts to the provider. When an email is rejected for being sent
+too fast, the rate is cut by DECREASE_FACTOR, at most once a second however
+many tasks are rejected, and the task sends the email again itself, up to
+THROTTLED_RETRIES times in a row, rather than being retried later. When
+every token of a second is taken, and no email has been rejected for
+THROTTLE_MEMORY seconds, the rate goes up by one, up to MAX_RATE.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Seconds that rates are kept for after they last changed
+RATE_TIMEOUT = 60 * 60 * 24
+
+# Seconds that the count of the tokens taken in a second is kept for
+TOKENS_TIMEOUT = 10
+
+
+class SendRateLimiter(object):
+    """
+    A token bucket in `cache` that fills at an adaptive rate of between
+    `min_rate` and `max_rate` tokens per second.
+    """
+    key_prefix = 'bulk_email.rate_limit'
+
+    def __init__(self, cache, initial_rate, min_rate, max_rate,  # pylint: disable=redefined-outer-name
+                 decrease_factor=0.75, throttled_retries=5, throttle_memory=60):
+        self.cache = cache
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.decrease_factor = decrease_factor
+        self.throttled_retries = throttled_retries
+        self.throttle_memory = throttle_memory
+
+    def _key(self, name):
+        """Returns the cache key of the value `name`."""
+        return '{}.{}'.format(self.key_prefix, name)
+
+    def get_rate(self):
+        """
+        Returns the current rate, in tokens per second.
+        """
+        rate = self.cache.get(self._key('rate'))
+        if rate is None:
+            self.cache.add(self._key('rate'), self.initial_rate, RATE_TIMEOUT)
+            rate = self.cache.get(self._key('rate'), self.initial_rate)
+        return rate
+
+    def acquire(self):
+        """
+        Takes a token, waiting until one is available.
+        """
+        while True:
+            now = time.time()
+            second = int(now)
+            rate = self.get_rate()
+            tokens_key = self._key('tokens.{}'.format(second))
+            self.cache.add(tokens_key, 0, TOKENS_TIMEOUT)
+            try:
+                taken = self.cache.incr(tokens_key)
+            except ValueError:
+                # Evicted since it was added
+                taken = 1
+
+            if taken <= rate:
+                if taken == rate:
+                    self._increase(rate)
+                wait = second + float(taken - 1) / rate - now
+                if wait > 0:
+                    time.sleep(wait)
+                return
+
+            time.sleep(second + 1 - now)
+
+    def _increase(self, rate):
+        """
+        Raises the rate by one, unless it was recently throttled.
+        """
+        if rate >= self.max_rate or self.cache.get(self._key('throttled')) is not None:
+            return
+        try:
+            self.cache.incr(self._key('rate'))
+        except ValueError:
+            pass
+
+    def throttled(self):
+        """
+        Lowers the rate, after an email was rejected for being sent too fast.
+        """
+        self.cache.set(self._key('throttled'), True, self.throttle_memory)
+
+        # Other tasks were likely rejected at the same time
+        if not self.cache.add(self._key('decreased'), True, 1):
+            return
+        rate = self.get_rate()
+        new_rate = max(self.min_rate, int(rate * self.decrease_factor))
+        if new_rate < rate:
+            try:
+                self.cache.decr(self._key('rate'), rate - new_rate)
+            except ValueError:
+                self.cache.add(self._key('rate'), new_rate, RATE_TIMEOUT)
+
+
+def get_rate_limiter():
+    """
+    Returns the SendRateLimiter configured by BULK_EMAIL_RATE_LIMIT, or None
+    if there is no limit.
+    """
+    config = getattr(settings, 'BULK_EMAIL_RATE_LIMIT', None)
+    if not config:
+        return None
+
+    return SendRateLimiter(
+        cache,
+        initial_rate=config['INITIAL_RATE'],
+        min_rate=config['MIN_RATE'],
+        max_rate=config['MAX_RATE'],
+        decrease_factor=config.get('DECREASE_FACTOR', 0.75),
+        throttled_retries=config.get('THROTTLED_RETRIES', 5),
+        throttle_memory=config.get('THROTTLE_MEMORY', 60),
+    )
@@ -4,8 +4,8 @@ Computes the data to display on the Instructor Dashboard
 from util.json_request import JsonResponse
 import json
 
-from courseware import models
-from django.db.models import Count
+from courseware import dashboard_aggregates, models
+from django.conf import settings
 from django.utils.translation import ugettext as _
 
 from xmodule.modulestore.django import modulestore
@@ -17,6 +17,56 @@ from opaque_keys.edx.locations import Location
 # Used to limit the length of list displayed to the screen.
 MAX_SCREEN_LIST_LENGTH = 250
 
+
+def use_aggregates(course_id):
+    """
+    Returns whether to read the counts of course `course_id` from the tables
+    kept by courseware.dashboard_aggregates, rather than count StudentModules.
+    """
+    return (
+        settings.FEATURES.get('ENABLE_DASHBOARD_AGGREGATES') and
+        dashboard_aggregates.aggregates_available(course_id)
+    )
+
+
+def problem_grade_counts(course_id, problem_set=None):
+    """
+    Returns the number of students with each grade on the problems of the
+    course (or only on the problems in `problem_set`), as dicts of
+    'module_state_key', 'grade', 'max_grade' and 'count_grade'.
+    """
+    if not use_aggregates(course_id):
+        return dashboard_aggregates.count_problem_grades(course_id, problem_set)
+
+    query = models.ProblemGradeCount.objects.filter(course_id=course_id)
+    if problem_set is not None:
+        query = query.filter(module_state_key__in=problem_set)
+    return [
+        {
+            'module_state_key': row['module_state_key'],
+            'grade': row['grade'],
+            'max_grade': row['max_grade'],
+            'count_grade': row['num_students'],
+        }
+        for row in query.values('module_state_key', 'grade', 'max_grade', 'num_students')
+    ]
+
+
+def sequential_open_counts(course_id):
+    """
+    Returns the number of students that opened each subsection of the course,
+    as dicts of 'module_state_key' and 'count_sequential'.
+    """
+    if not use_aggregates(course_id):
+        return dashboard_aggregates.count_sequential_opens(course_id)
+
+    return [
+        {'module_state_key': row['module_state_key'], 'count_sequential': row['num_students']}
+        for row in models.SequentialOpenCount.objects.filter(course_id=course_id).values(
+            'module_state_key', 'num_students'
+        )
+    ]
+
 def get_problem_grade_distribution(course_id):
     """
     Returns the grade distribution per problem for the course
@@ -31,12 +81,8 @@ def get_problem_grade_distribution(course_id):
         attempting the problem
     """
 
-    # Aggregate query on studentmodule table for grade data for all problems in course
-    db_query = models.StudentModule.objects.filter(
-        course_id__exact=course_id,
-        grade__isnull=False,
-        module_type__exact="problem",
-    ).values('module_state_key', 'grade', 'max_grade').annotate(count_grade=Count('grade'))
+    # Grade data for all problems in course
+    db_query = problem_grade_counts(course_id)
 
     prob_grade_distrib = {}
     total_student_count = {}
@@ -74,11 +120,8 @@ def get_sequential_open_distrib(course_id):
     Outputs a dict mapping the 'module_id' to the number of students that have opened that subsection/sequential.
     """
 
-    # Aggregate query on studentmodule table for "opening a subsection" data
-    db_query = models.StudentModule.objects.filter(
-        course_id__exact=course_id,
-        module_type__exact="sequential",
-    ).values('module_state_key').annotate(count_sequential=Count('module_state_key'))
+    # "Opening a subsection" data
+    db_query = sequential_open_counts(course_id)
 
     # Build set of "opened" data for each subsection that has "opened" data
     sequential_open_distrib = {}
@@ -104,17 +147,11 @@ def get_problem_set_grade_distrib(course_id, problem_set):
       'grade_distrib' - array of tuples (`grade`,`count`) ordered by `grade`
     """
 
-    # Aggregate query on studentmodule table for grade data for set of problems in course
-    db_query = models.StudentModule.objects.filter(
-        course_id__exact=course_id,
-        grade__isnull=False,
-        module_type__exact="problem",
-        module_state_key__in=problem_set,
-    ).values(
-        'module_state_key',
-        'grade',
-        'max_grade',
-    ).annotate(count_grade=Count('grade')).order_by('module_state_key', 'grade')
+    # Grade data for set of problems in course
+    db_query = sorted(
+        problem_grade_counts(course_id, problem_set),
+        key=lambda row: (row['module_state_key'], row['grade']),
+    )
 
     prob_grade_distrib = {}
 
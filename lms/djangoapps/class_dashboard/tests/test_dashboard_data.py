@@ -5,11 +5,13 @@ Tests for class dashboard (Metrics tab in instructor dashboard)
 import json
 from mock import patch
 
+from django.conf import settings
 from django.test.utils import override_settings
 from django.core.urlresolvers import reverse
 from django.test.client import RequestFactory
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from courseware.dashboard_aggregates import update_course_aggregates
 from courseware.tests.tests import TEST_DATA_MONGO_MODULESTORE
 from courseware.tests.factories import StudentModuleFactory
 from student.tests.factories import UserFactory, CourseEnrollmentFactory, AdminFactory
@@ -126,6 +128,22 @@ class TestGetProblemGradeDistribution(ModuleStoreTestCase):
                 sum_attempts += item[1]
             self.assertEquals(USER_COUNT, sum_attempts)
 
+    @patch.dict(settings.FEATURES, {'ENABLE_DASHBOARD_AGGREGATES': True})
+    def test_aggregates(self):
+        # Not counted yet, so counted from StudentModule
+        __, total_student_count = get_problem_grade_distribution(self.course.id)
+        probset_grade_distrib = get_problem_set_grade_distrib(self.course.id, total_student_count)
+        sequential_open_distrib = get_sequential_open_distrib(self.course.id)
+
+        update_course_aggregates(self.course.id)
+        with patch('courseware.dashboard_aggregates.count_problem_grades') as mock_count:
+            self.assertEquals(get_problem_grade_distribution(self.course.id)[1], total_student_count)
+            self.assertEquals(
+                get_problem_set_grade_distrib(self.course.id, total_student_count), probset_grade_distrib
+            )
+            self.assertEquals(get_sequential_open_distrib(self.course.id), sequential_open_distrib)
+        self.assertFalse(mock_count.called)
+
     def test_get_d3_problem_grade_distrib(self):
 
         d3_data = get_d3_problem_grade_distrib(self.course.id)
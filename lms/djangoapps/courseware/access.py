@@ -14,8 +14,10 @@ from xmodule.x_module import XModule
 
 from xblock.core import XBlock
 
+from course_overviews.models import CourseOverview
 from external_auth.models import ExternalAuthMap
 from courseware.masquerade import is_masquerading_as_student
+from courseware.navigation import NavigationItem
 from django.utils.timezone import UTC
 from student.roles import (
     GlobalStaff, CourseStaffRole, CourseInstructorRole,
@@ -48,8 +50,8 @@ def has_access(user, action, obj, course_key=None):
     user: a Django user object. May be anonymous. If none is passed,
                     anonymous is assumed
 
-    obj: The object to check access for.  A module, descriptor, location, or
-                    certain special strings (e.g. 'global')
+    obj: The object to check access for.  A module, descriptor, location, course
+                    overview, or certain special strings (e.g. 'global')
 
     action: A string specifying the action that the client is trying to perform.
 
@@ -72,6 +74,10 @@ def has_access(user, action, obj, course_key=None):
     if isinstance(obj, CourseDescriptor):
         return _has_access_course_desc(user, action, obj)
 
+    # A CourseOverview has the fields of its course that the checks use
+    if isinstance(obj, CourseOverview):
+        return _has_access_course_desc(user, action, obj)
+
     if isinstance(obj, ErrorDescriptor):
         return _has_access_error_desc(user, action, obj, course_key)
 
@@ -82,6 +88,10 @@ def has_access(user, action, obj, course_key=None):
     if isinstance(obj, XBlock):
         return _has_access_descriptor(user, action, obj, course_key)
 
+    # A NavigationItem has the fields of its descriptor that the checks use
+    if isinstance(obj, NavigationItem):
+        return _has_access_descriptor(user, action, obj, course_key)
+
     if isinstance(obj, CourseKey):
         return _has_access_course_key(user, action, obj)
 
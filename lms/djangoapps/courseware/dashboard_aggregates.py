@@ -0,0 +1,158 @@
+"""
+Counts of the grades students have on each problem of a course, and of the
+students that opened each of its subsections, for the Metrics tab of the
+instructor dashboard (class_dashboard).
+
+The dashboard used to count them with GROUP BY queries over every
+StudentModule of the course each time it was loaded, which takes tens of
+seconds in the largest courses. With FEATURES['ENABLE_DASHBOARD_AGGREGATES']
+set, it reads them from the ProblemGradeCount and SequentialOpenCount tables
+instead, once the course has been counted.
+
+update_course_aggregates is run periodically for each course (by the
+update_dashboard_aggregates command). Its first run counts every StudentModule
+of the course. Later runs only recount the modules that have StudentModules
+modified since the previous run, so a run costs in proportion to the activity
+in the course since then. StudentModules are counted on the read replica, if
+there is one; runs overlap by UPDATE_OVERLAP, so that modifications which
+reach the replica late are still counted.
+
+Deleting a StudentModule records a DashboardAggregatesDeletion, and the first
+run at least UPDATE_OVERLAP after it recounts its module, so that the replica
+no longer has the deleted StudentModule by then.
+"""
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils.timezone import UTC
+
+from courseware.models import (
+    DashboardAggregatesDeletion, DashboardAggregatesLog, ProblemGradeCount, SequentialOpenCount, StudentModule
+)
+from util.query import use_read_replica_if_available
+
+# How far back each run rescans modifications the previous run may not have seen
+UPDATE_OVERLAP = timedelta(minutes=5)
+
+# Number of modules recounted per query
+RECOUNT_CHUNK_SIZE = 100
+
+
+def aggregates_available(course_id):
+    """
+    Returns whether the counts of course `course_id` have been computed.
+    """
+    return DashboardAggregatesLog.objects.filter(course_id=course_id, updated_through__isnull=False).exists()
+
+
+def count_problem_grades(course_id, module_keys=None):
+    """
+    Counts the students with each grade on the problems of course `course_id`
+    (or only on the problems `module_keys`).
+
+    Returns dicts of 'module_state_key' (a deprecated location string),
+    'grade', 'max_grade' and 'count_grade'.
+    """
+    query = StudentModule.objects.filter(
+        course_id__exact=course_id,
+        grade__isnull=False,
+        module_type__exact="problem",
+    )
+    if module_keys is not None:
+        query = query.filter(module_state_key__in=module_keys)
+    return use_read_replica_if_available(
+        query.values('module_state_key', 'grade', 'max_grade').annotate(count_grade=Count('grade'))
+    )
+
+
+def count_sequential_opens(course_id, module_keys=None):
+    """
+    Counts the students that opened the subsections of course `course_id` (or
+    only the subsections `module_keys`).
+
+    Returns dicts of 'module_state_key' (a deprecated location string) and
+    'count_sequential'.
+    """
+    query = StudentModule.objects.filter(
+        course_id__exact=course_id,
+        module_type__exact="sequential",
+    )
+    if module_keys is not None:
+        query = query.filter(module_state_key__in=module_keys)
+    return use_read_replica_if_available(
+        query.values('module_state_key').annotate(count_sequential=Count('module_state_key'))
+    )
+
+
+@transaction.commit_on_success
+def _recount(course_id, module_keys=None):
+    """
+    Replaces the counts of course `course_id` (or only of the modules
+    `module_keys`) by a new count of its StudentModules.
+    """
+    problem_counts = ProblemGradeCount.objects.filter(course_id=course_id)
+    sequential_counts = SequentialOpenCount.objects.filter(course_id=course_id)
+    if module_keys is not None:
+        problem_counts = problem_counts.filter(module_state_key__in=module_keys)
+        sequential_counts = sequential_counts.filter(module_state_key__in=module_keys)
+    problem_counts.delete()
+    sequential_counts.delete()
+
+    ProblemGradeCount.objects.bulk_create([
+        ProblemGradeCount(
+            course_id=course_id,
+            module_state_key=course_id.make_usage_key_from_deprecated_string(row['module_state_key']),
+            grade=row['grade'],
+            max_grade=row['max_grade'],
+            num_students=row['count_grade'],
+        )
+        for row in count_problem_grades(course_id, module_keys)
+    ])
+    SequentialOpenCount.objects.bulk_create([
+        SequentialOpenCount(
+            course_id=course_id,
+            module_state_key=course_id.make_usage_key_from_deprecated_string(row['module_state_key']),
+            num_students=row['count_sequential'],
+        )
+        for row in count_sequential_opens(course_id, module_keys)
+    ])
+
+
+def update_course_aggregates(course_id, rebuild=False):
+    """
+    Recounts the modules of course `course_id` that have StudentModules
+    modified or deleted since the last update, or every module if the course has not
+    been counted yet (or `rebuild` is set).
+
+    Returns the number of modules recounted, or None if every module was.
+    """
+    started = datetime.now(UTC())
+    log, __ = DashboardAggregatesLog.objects.get_or_create(course_id=course_id)
+    deletions = list(DashboardAggregatesDeletion.objects.filter(
+        course_id=course_id, deleted__lt=started - UPDATE_OVERLAP
+    ).values_list('id', 'module_state_key'))
+
+    if rebuild or log.updated_through is None:
+        _recount(course_id)
+        recounted = None
+    else:
+        modified = StudentModule.objects.filter(
+            course_id=course_id,
+            module_type__in=['problem', 'sequential'],
+            modified__gte=log.updated_through,
+        ).values_list('module_state_key', flat=True).distinct()
+        module_keys = set(use_read_replica_if_available(modified))
+        module_keys.update(module_key for __, module_key in deletions)
+        module_keys = sorted(module_keys)
+        for index in xrange(0, len(module_keys), RECOUNT_CHUNK_SIZE):
+            _recount(course_id, [
+                course_id.make_usage_key_from_deprecated_string(module_key)
+                for module_key in module_keys[index:index + RECOUNT_CHUNK_SIZE]
+            ])
+        recounted = len(module_keys)
+
+    log.updated_through = started - UPDATE_OVERLAP
+    log.save()
+    DashboardAggregatesDeletion.objects.filter(id__in=[deletion_id for deletion_id, __ in deletions]).delete()
+    return recounted
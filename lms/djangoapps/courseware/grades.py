@@ -1,9 +1,11 @@
 # Compute grades using real division, with no integer truncation
 from __future__ import division
 from collections import defaultdict
+import hashlib
 import json
 import random
 import logging
+from itertools import islice
 
 from contextlib import contextmanager
 from django.conf import settings
@@ -13,17 +15,17 @@ from django.test.client import RequestFactory
 import dogstats_wrapper as dog_stats_api
 
 from courseware import courses
-from courseware.model_data import FieldDataCache
+from courseware.model_data import FieldDataCache, StudentModuleSnapshot, chunked_query
 from student.models import anonymous_id_for_user
 from xmodule import graders
 from xmodule.graders import Score
 from xmodule.modulestore.django import modulestore
-from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.util.duedate import get_extended_due_date
-from .models import StudentModule
+from .models import StudentModule, StudentSectionScore
 from .module_render import get_module_for_descriptor
 from submissions import api as sub_api  # installed from the edx-submissions repository
 from opaque_keys import InvalidKeyError
+from xblock.fields import Scope
 
 log = logging.getLogger("edx.courseware")
 
@@ -79,78 +81,89 @@ def answer_distributions(course_key):
     generate the report.
 
     This method will try to use a read-replica database if one is available.
-    """
-    # dict: { module.module_state_key : (url_name, display_name) }
-    state_keys_to_problem_info = {}  # For caching, used by url_and_display_name
-
-    def url_and_display_name(usage_key):
-        """
-        For a given usage_key, return the problem's url and display_name.
-        Handle modulestore access and caching. This method ignores permissions.
 
-        Raises:
-            InvalidKeyError: if the usage_key does not parse
-            ItemNotFoundError: if there is no content that corresponds
-                to this usage_key.
-        """
-        problem_store = modulestore()
-        if usage_key not in state_keys_to_problem_info:
-            problem = problem_store.get_item(usage_key)
-            problem_info = (problem.url_name, problem.display_name_with_default)
-            state_keys_to_problem_info[usage_key] = problem_info
-
-        return state_keys_to_problem_info[usage_key]
+    The whole distribution is built in memory; for large courses, the
+    calculate_answer_distribution_csv instructor task counts the answers in
+    parallel and stores the distribution as a report instead.
+    """
+    problem_info = problem_url_and_display_names(course_key)
 
     # Iterate through all problems submitted for this course in no particular
     # order, and build up our answer_counts dict that we will eventually return
     answer_counts = defaultdict(lambda: defaultdict(int))
-    for module in StudentModule.all_submitted_problems_read_only(course_key):
+    modules = StudentModule.all_submitted_problems_read_only(course_key).values_list('id', 'module_state_key', 'state')
+    for module_id, module_state_key, state in modules.iterator():
         try:
-            state_dict = json.loads(module.state) if module.state else {}
-            raw_answers = state_dict.get("student_answers", {})
+            answers = student_answers(state)
         except ValueError:
             log.error(
                 "Answer Distribution: Could not parse module state for " +
-                "StudentModule id={}, course={}".format(module.id, course_key)
+                "StudentModule id={}, course={}".format(module_id, course_key)
             )
             continue
+        if not answers:
+            continue
 
         try:
-            url, display_name = url_and_display_name(module.module_state_key.map_into_course(course_key))
-            # Each problem part has an ID that is derived from the
-            # module.module_state_key (with some suffix appended)
-            for problem_part_id, raw_answer in raw_answers.items():
-                # Convert whatever raw answers we have (numbers, unicode, None, etc.)
-                # to be unicode values. Note that if we get a string, it's always
-                # unicode and not str -- state comes from the json decoder, and that
-                # always returns unicode for strings.
-                answer = unicode(raw_answer)
-                answer_counts[(url, display_name, problem_part_id)][answer] += 1
-
-        except (ItemNotFoundError, InvalidKeyError):
+            url, display_name = problem_info[course_key.make_usage_key_from_deprecated_string(module_state_key)]
+        except (KeyError, InvalidKeyError):
             msg = "Answer Distribution: Item {} referenced in StudentModule {} " + \
-                  "for user {} in course {} not found; " + \
+                  "in course {} not found; " + \
                   "This can happen if a student answered a question that " + \
                   "was later deleted from the course. This answer will be " + \
                   "omitted from the answer distribution CSV."
-            log.warning(
-                msg.format(module.module_state_key, module.id, module.student_id, course_key)
-            )
+            log.warning(msg.format(module_state_key, module_id, course_key))
             continue
 
+        # Each problem part has an ID that is derived from the
+        # module.module_state_key (with some suffix appended)
+        for problem_part_id, answer in answers.iteritems():
+            answer_counts[(url, display_name, problem_part_id)][answer] += 1
+
     return answer_counts
 
+
+def problem_url_and_display_names(course_key):
+    """
+    Return a dict mapping the usage key of every problem of the course
+    `course_key` to the problem's (url_name, display_name), found in a single
+    query of the modulestore.
+    """
+    return {
+        problem.location: (problem.url_name, problem.display_name_with_default)
+        for problem in modulestore().get_items(course_key, qualifiers={'category': 'problem'})
+    }
+
+
+def student_answers(state):
+    """
+    Return the answers in the StudentModule `state` of a problem, as a dict
+    mapping each problem part id to the answer as unicode.
+
+    Raises ValueError if the state can't be parsed. States without answers
+    (e.g. those created by viewing the progress page) aren't parsed at all.
+    """
+    if not state or '"student_answers"' not in state:
+        return {}
+
+    raw_answers = json.loads(state).get("student_answers", {})
+    # Convert whatever raw answers we have (numbers, unicode, None, etc.)
+    # to be unicode values. Note that if we get a string, it's always
+    # unicode and not str -- state comes from the json decoder, and that
+    # always returns unicode for strings.
+    return {problem_part_id: unicode(raw_answer) for problem_part_id, raw_answer in raw_answers.iteritems()}
+
 @transaction.commit_manually
-def grade(student, request, course, keep_raw_scores=False):
+def grade(student, request, course, keep_raw_scores=False, module_scores=None):
     """
     Wraps "_grade" with the manual_transaction context manager just in case
     there are unanticipated errors.
     """
     with manual_transaction():
-        return _grade(student, request, course, keep_raw_scores)
+        return _grade(student, request, course, keep_raw_scores, module_scores)
 
 
-def _grade(student, request, course, keep_raw_scores):
+def _grade(student, request, course, keep_raw_scores, module_scores=None):
     """
     Unwrapped version of "grade"
 
@@ -169,6 +182,9 @@ def _grade(student, request, course, keep_raw_scores):
     - keep_raw_scores : if True, then value for key 'raw_scores' contains scores
       for every graded module
 
+    module_scores: an optional StudentModuleScores preloaded for this student,
+      used instead of querying StudentModule for each graded section and problem.
+
     More information on the format is in the docstring for CourseGrader.
     """
     grading_context = course.grading_context
@@ -181,6 +197,26 @@ def _grade(student, request, course, keep_raw_scores):
         course.id.to_deprecated_string(), anonymous_id_for_user(student, course.id)
     )
 
+    use_stored_scores = _use_persistent_section_scores()
+    stored_section_scores = {}
+    if use_stored_scores:
+        with manual_transaction():
+            stored_section_scores = StudentSectionScore.scores_for_student(student, course.id)
+
+    # Within a request, load the student's StudentModules for every graded
+    # module up front, for the checks and FieldDataCaches below to share
+    snapshot = None
+    if module_scores is None:
+        snapshot = StudentModuleSnapshot.for_request(student, course.id)
+    if snapshot is not None:
+        with manual_transaction():
+            snapshot.fetch(
+                descriptor.location
+                for sections in grading_context['graded_sections'].itervalues()
+                for section in sections
+                for descriptor in section['xmoduledescriptors']
+            )
+
     totaled_scores = {}
     # This next complicated loop is just to collect the totaled_scores, which is
     # passed to the grader
@@ -190,10 +226,14 @@ def _grade(student, request, course, keep_raw_scores):
             section_descriptor = section['section_descriptor']
             section_name = section_descriptor.display_name_with_default
 
+            stored_entries = None
+            if use_stored_scores:
+                stored_entries = _stored_section_entries(stored_section_scores, section, submissions_scores)
+
             # some problems have state that is updated independently of interaction
             # with the LMS, so they need to always be scored. (E.g. foldit.,
             # combinedopenended)
-            should_grade_section = any(
+            should_grade_section = stored_entries is not None or any(
                 descriptor.always_recalculate_grades for descriptor in section['xmoduledescriptors']
             )
 
@@ -206,7 +246,16 @@ def _grade(student, request, course, keep_raw_scores):
                     for descriptor in section['xmoduledescriptors']
                 )
 
-            if not should_grade_section:
+            if not should_grade_section and module_scores is not None:
+                should_grade_section = any(
+                    module_scores.get(student, descriptor.location) is not None
+                    for descriptor in section['xmoduledescriptors']
+                )
+            elif not should_grade_section and snapshot is not None:
+                should_grade_section = bool(snapshot.fetch(
+                    descriptor.location for descriptor in section['xmoduledescriptors']
+                ))
+            elif not should_grade_section:
                 with manual_transaction():
                     should_grade_section = StudentModule.objects.filter(
                         student=student,
@@ -228,26 +277,48 @@ def _grade(student, request, course, keep_raw_scores):
                         field_data_cache = FieldDataCache([descriptor], course.id, student)
                     return get_module_for_descriptor(student, request, descriptor, field_data_cache, course.id)
 
-                for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, create_module):
-
-                    (correct, total) = get_score(
-                        course.id, student, module_descriptor, create_module, scores_cache=submissions_scores
+                if stored_entries is None and use_stored_scores and \
+                        not _section_has_live_scores(section, submissions_scores):
+                    stored_entries = _compute_section_entries(
+                        course.id, student, section_descriptor, create_module, module_scores
                     )
-                    if correct is None and total is None:
-                        continue
-
-                    if settings.GENERATE_PROFILE_SCORES:  	# for debugging!
-                        if total > 1:
-                            correct = random.randrange(max(total - 2, 1), total + 1)
-                        else:
-                            correct = total
-
-                    graded = module_descriptor.graded
-                    if not total > 0:
-                        #We simply cannot grade a problem that is 12/0, because we might need it as a percentage
-                        graded = False
-
-                    scores.append(Score(correct, total, graded, module_descriptor.display_name_with_default))
+                    with manual_transaction():
+                        StudentSectionScore.save_for_section(
+                            student,
+                            course.id,
+                            section_descriptor.location,
+                            _section_fingerprint(section),
+                            [descriptor.location.to_deprecated_string() for descriptor in section['xmoduledescriptors']],
+                            stored_entries
+                        )
+
+                if stored_entries is not None:
+                    for correct, total, graded, display_name in _weighted_entries(stored_entries):
+                        if not total > 0:
+                            graded = False
+                        scores.append(Score(correct, total, graded, display_name))
+                else:
+                    for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, create_module):
+
+                        (correct, total) = get_score(
+                            course.id, student, module_descriptor, create_module,
+                            scores_cache=submissions_scores, module_scores=module_scores
+                        )
+                        if correct is None and total is None:
+                            continue
+
+                        if settings.GENERATE_PROFILE_SCORES:  	# for debugging!
+                            if total > 1:
+                                correct = random.randrange(max(total - 2, 1), total + 1)
+                            else:
+                                correct = total
+
+                        graded = module_descriptor.graded
+                        if not total > 0:
+                            #We simply cannot grade a problem that is 12/0, because we might need it as a percentage
+                            graded = False
+
+                        scores.append(Score(correct, total, graded, module_descriptor.display_name_with_default))
 
                 _, graded_total = graders.aggregate_scores(scores, section_name)
                 if keep_raw_scores:
@@ -348,6 +419,18 @@ def _progress_summary(student, request, course):
 
     submissions_scores = sub_api.get_scores(course.id.to_deprecated_string(), anonymous_id_for_user(student, course.id))
 
+    use_stored_scores = _use_persistent_section_scores()
+    stored_section_scores = {}
+    graded_sections = {}
+    if use_stored_scores:
+        with manual_transaction():
+            stored_section_scores = StudentSectionScore.scores_for_student(student, course.id)
+        graded_sections = {
+            section['section_descriptor'].location.to_deprecated_string(): section
+            for sections in course.grading_context['graded_sections'].itervalues()
+            for section in sections
+        }
+
     chapters = []
     # Don't include chapters that aren't displayable (e.g. due to error)
     for chapter_module in course_module.get_display_items():
@@ -368,15 +451,26 @@ def _progress_summary(student, request, course):
 
                 module_creator = section_module.xmodule_runtime.get_module
 
-                for module_descriptor in yield_dynamic_descriptor_descendents(section_module, module_creator):
-                    course_id = course.id
-                    (correct, total) = get_score(
-                        course_id, student, module_descriptor, module_creator, scores_cache=submissions_scores
-                    )
-                    if correct is None and total is None:
-                        continue
-
-                    scores.append(Score(correct, total, graded, module_descriptor.display_name_with_default))
+                stored_entries = None
+                section = graded_sections.get(section_module.location.to_deprecated_string())
+                if section is not None:
+                    stored_entries = _stored_section_entries(stored_section_scores, section, submissions_scores)
+
+                if stored_entries is not None:
+                    scores = [
+                        Score(correct, total, graded, display_name)
+                        for correct, total, _, display_name in _weighted_entries(stored_entries)
+                    ]
+                else:
+                    for module_descriptor in yield_dynamic_descriptor_descendents(section_module, module_creator):
+                        course_id = course.id
+                        (correct, total) = get_score(
+                            course_id, student, module_descriptor, module_creator, scores_cache=submissions_scores
+                        )
+                        if correct is None and total is None:
+                            continue
+
+                        scores.append(Score(correct, total, graded, module_descriptor.display_name_with_default))
 
                 scores.reverse()
                 section_total, _ = graders.aggregate_scores(
@@ -403,7 +497,7 @@ def _progress_summary(student, request, course):
     return chapters
 
 
-def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=None):
+def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=None, module_scores=None):
     """
     Return the score for a user on a problem, as a tuple (correct, total).
     e.g. (5,7) if you got 5 out of 7 points.
@@ -417,6 +511,8 @@ def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=
            Can return None if user doesn't have access, or if something else went wrong.
     scores_cache: A dict of location names to (earned, possible) point tuples.
            If an entry is found in this cache, it takes precedence.
+    module_scores: An optional StudentModuleScores to read the user's StudentModule
+           grade from, instead of querying for it.
     """
     scores_cache = scores_cache or {}
 
@@ -443,18 +539,41 @@ def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=
         # These are not problems, and do not have a score
         return (None, None)
 
-    try:
-        student_module = StudentModule.objects.get(
-            student=user,
-            course_id=course_id,
-            module_state_key=problem_descriptor.location
-        )
-    except StudentModule.DoesNotExist:
-        student_module = None
+    (correct, total) = _get_unweighted_score(course_id, user, problem_descriptor, module_creator, module_scores)
+    if correct is None and total is None:
+        return (None, None)
+
+    return weighted_score(correct, total, problem_descriptor.weight, problem_descriptor.location)
 
-    if student_module is not None and student_module.max_grade is not None:
-        correct = student_module.grade if student_module.grade is not None else 0
-        total = student_module.max_grade
+
+def _get_unweighted_score(course_id, user, problem_descriptor, module_creator, module_scores=None):
+    """
+    Return the (correct, total) score stored in StudentModule for a problem
+    that has a score, before the problem's weight is applied. If the problem
+    hasn't been graded yet, its total is found by instantiating it.
+
+    Returns (None, None) if the problem couldn't be loaded.
+    """
+    if module_scores is not None and module_scores.covers(problem_descriptor.location):
+        stored_score = module_scores.get(user, problem_descriptor.location)
+    else:
+        snapshot = StudentModuleSnapshot.for_request(user, course_id)
+        if snapshot is not None:
+            student_module = snapshot.get(problem_descriptor.location)
+        else:
+            try:
+                student_module = StudentModule.objects.get(
+                    student=user,
+                    course_id=course_id,
+                    module_state_key=problem_descriptor.location
+                )
+            except StudentModule.DoesNotExist:
+                student_module = None
+        stored_score = (student_module.grade, student_module.max_grade) if student_module is not None else None
+
+    if stored_score is not None and stored_score[1] is not None:
+        correct = stored_score[0] if stored_score[0] is not None else 0
+        total = stored_score[1]
     else:
         # If the problem was not in the cache, or hasn't been graded yet,
         # we need to instantiate the problem.
@@ -471,11 +590,17 @@ def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=
         if total is None:
             return (None, None)
 
-    # Now we re-weight the problem, if specified
-    weight = problem_descriptor.weight
+    return (correct, total)
+
+
+def weighted_score(correct, total, weight, location=None):
+    """
+    Re-weight a (correct, total) score so that `total` becomes `weight`, if a
+    weight is specified.
+    """
     if weight is not None:
         if total == 0:
-            log.exception("Cannot reweight a problem with zero total points. Problem: " + str(student_module))
+            log.exception("Cannot reweight a problem with zero total points. Problem: " + str(location))
             return (correct, total)
         correct = correct * weight / total
         total = weight
@@ -483,6 +608,108 @@ def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=
     return (correct, total)
 
 
+def _use_persistent_section_scores():
+    """
+    Returns True if section scores should be read from and written to
+    StudentSectionScore.
+    """
+    # Random profile scores must never be persisted.
+    return settings.FEATURES.get('ENABLE_PERSISTENT_SECTION_SCORES', False) and not settings.GENERATE_PROFILE_SCORES
+
+
+def _section_fingerprint(section):
+    """
+    Returns a hash of the grading-relevant content of `section`, a section
+    description from `CourseDescriptor.grading_context`.
+
+    Besides the weight and grading of each module, this covers the content
+    and settings its maximum score is derived from (e.g. the XML of a
+    problem), since stored scores keep the totals they were computed with.
+    """
+    md5 = hashlib.md5()
+    for descriptor in section['xmoduledescriptors']:
+        md5.update(json.dumps([
+            descriptor.location.to_deprecated_string(),
+            descriptor.weight,
+            descriptor.graded,
+            descriptor.display_name_with_default,
+            descriptor.get_explicitly_set_fields_by_scope(Scope.content),
+            descriptor.get_explicitly_set_fields_by_scope(Scope.settings),
+        ], sort_keys=True))
+    return md5.hexdigest()
+
+
+def _section_has_live_scores(section, submissions_scores):
+    """
+    Returns True if some module in `section` has to be scored at grading time,
+    either because it always recalculates its grade or because its score comes
+    from the submissions API. Such sections are never persisted.
+    """
+    return any(
+        descriptor.always_recalculate_grades or descriptor.location.to_deprecated_string() in submissions_scores
+        for descriptor in section['xmoduledescriptors']
+    )
+
+
+def _stored_section_entries(stored_section_scores, section, submissions_scores):
+    """
+    Returns the persisted score entries for `section`, or None if there is no
+    stored row for it or the stored row is out of date.
+
+    stored_section_scores: dict returned by StudentSectionScore.scores_for_student
+    section: a section description from `CourseDescriptor.grading_context`
+    """
+    if _section_has_live_scores(section, submissions_scores):
+        return None
+
+    section_score = stored_section_scores.get(section['section_descriptor'].location.to_deprecated_string())
+    if section_score is None or section_score.fingerprint != _section_fingerprint(section):
+        return None
+
+    return section_score.entries
+
+
+def _compute_section_entries(course_id, student, section_descriptor, module_creator, module_scores=None):
+    """
+    Scores every module in a section for `student`, and returns the results as
+    StudentSectionScore entries:
+
+        [location, correct, total, weight, graded, display_name]
+
+    where correct and total are unweighted.
+    """
+    entries = []
+    for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, module_creator):
+        if not module_descriptor.has_score:
+            continue
+
+        (correct, total) = _get_unweighted_score(
+            course_id, student, module_descriptor, module_creator, module_scores
+        )
+        if correct is None and total is None:
+            continue
+
+        entries.append([
+            module_descriptor.location.to_deprecated_string(),
+            correct,
+            total,
+            module_descriptor.weight,
+            module_descriptor.graded,
+            module_descriptor.display_name_with_default,
+        ])
+    return entries
+
+
+def _weighted_entries(entries):
+    """
+    Yields a weighted (correct, total, graded, display_name) tuple for each
+    StudentSectionScore entry.
+    """
+    for location, correct, total, weight, graded, display_name in entries:
+        correct, total = weighted_score(correct, total, weight, location)
+        yield correct, total, graded, display_name
+
+
 @contextmanager
 def manual_transaction():
     """A context manager for managing manual transactions"""
@@ -496,7 +723,53 @@ def manual_transaction():
         transaction.commit()
 
 
-def iterate_grades_for(course_id, students):
+class StudentModuleScores(object):
+    """
+    The grade and max_grade of every StudentModule that a batch of students
+    has for the graded modules of a course.
+
+    These are loaded with a few chunked queries up front, so that the batch
+    can be graded without querying StudentModule once per graded section and
+    once per problem for every student.
+    """
+    def __init__(self, course, students, chunk_size=500):
+        usage_keys = set(
+            descriptor.location
+            for sections in course.grading_context['graded_sections'].itervalues()
+            for section in sections
+            for descriptor in section['xmoduledescriptors']
+        )
+        self.locations = set(usage_key.to_deprecated_string() for usage_key in usage_keys)
+        self._scores = defaultdict(dict)
+
+        # values_list skips the (potentially large) state column, but also
+        # skips the field's conversion of module_state_key into a UsageKey
+        key_field = StudentModule._meta.get_field('module_state_key')  # pylint: disable=protected-access
+        query = StudentModule.objects.filter(
+            course_id=course.id,
+            student__in=[student.id for student in students],
+        ).values_list('student_id', 'module_state_key', 'grade', 'max_grade')
+
+        rows = chunked_query(query, 'module_state_key__in', usage_keys, chunk_size)
+        for student_id, module_state_key, module_grade, max_grade in rows:
+            location = key_field.to_python(module_state_key).to_deprecated_string()
+            self._scores[student_id][location] = (module_grade, max_grade)
+
+    def covers(self, usage_key):
+        """
+        Returns True if StudentModules for `usage_key` were loaded.
+        """
+        return usage_key.to_deprecated_string() in self.locations
+
+    def get(self, student, usage_key):
+        """
+        Returns the (grade, max_grade) of the StudentModule that `student` has
+        for `usage_key`, or None if there is none.
+        """
+        return self._scores[student.id].get(usage_key.to_deprecated_string())
+
+
+def iterate_grades_for(course_id, students, batch_size=100):
     """Given a course_id and an iterable of students (User), yield a tuple of:
 
     (student, gradeset, err_msg) for every student enrolled in the course.
@@ -513,6 +786,9 @@ def iterate_grades_for(course_id, students):
     - grade_breakdown : A breakdown of the major components that
         make up the final grade. (For display)
     - raw_scores: contains scores for every graded module
+
+    Students are graded in batches of `batch_size`, and the StudentModule
+    grades of each batch are loaded together (see StudentModuleScores).
     """
     course = courses.get_course_by_id(course_id)
 
@@ -521,25 +797,32 @@ def iterate_grades_for(course_id, students):
     # grading that student.
     request = RequestFactory().get('/')
 
-    for student in students:
-        with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=[u'action:{}'.format(course_id)]):
-            try:
-                request.user = student
-                # Grading calls problem rendering, which calls masquerading,
-                # which checks session vars -- thus the empty session dict below.
-                # It's not pretty, but untangling that is currently beyond the
-                # scope of this feature.
-                request.session = {}
-                gradeset = grade(student, request, course)
-                yield student, gradeset, ""
-            except Exception as exc:  # pylint: disable=broad-except
-                # Keep marching on even if this student couldn't be graded for
-                # some reason, but log it for future reference.
-                log.exception(
-                    'Cannot grade student %s (%s) in course %s because of exception: %s',
-                    student.username,
-                    student.id,
-                    course_id,
-                    exc.message
-                )
-                yield student, {}, exc.message
+    students = iter(students)
+    while True:
+        student_batch = list(islice(students, batch_size))
+        if not student_batch:
+            break
+
+        module_scores = StudentModuleScores(course, student_batch)
+        for student in student_batch:
+            with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=[u'action:{}'.format(course_id)]):
+                try:
+                    request.user = student
+                    # Grading calls problem rendering, which calls masquerading,
+                    # which checks session vars -- thus the empty session dict below.
+                    # It's not pretty, but untangling that is currently beyond the
+                    # scope of this feature.
+                    request.session = {}
+                    gradeset = grade(student, request, course, module_scores=module_scores)
+                    yield student, gradeset, ""
+                except Exception as exc:  # pylint: disable=broad-except
+                    # Keep marching on even if this student couldn't be graded for
+                    # some reason, but log it for future reference.
+                    log.exception(
+                        'Cannot grade student %s (%s) in course %s because of exception: %s',
+                        student.username,
+                        student.id,
+                        course_id,
+                        exc.message
+                    )
+                    yield student, {}, exc.message
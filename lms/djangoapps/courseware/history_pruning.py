@@ -0,0 +1,123 @@
+"""
+Pruning of courseware.models.StudentModuleHistory by a retention policy.
+
+A history row is written every time a problem's StudentModule is saved, and
+the table grows without bound. STUDENT_MODULE_HISTORY_RETENTION says which
+rows to keep: a row is kept if it is
+
+* one of the KEEP_LAST most recent rows of its StudentModule,
+* a graded transition, one that changed the grade of its StudentModule, if
+  KEEP_GRADED is set, or
+* less than KEEP_DAYS days old, if KEEP_DAYS is set,
+
+and all other rows are deleted. Pruning the rows that are left again deletes
+nothing more.
+
+StudentModule ids are pruned in ranges, each by a chain of
+courseware.tasks.prune_student_module_history tasks, which can run in
+parallel. A task prunes BATCH_SIZE StudentModules at a time, sleeping for
+SLEEP seconds between batches so that replicas keep up with the deletes.
+After TASK_SECONDS, it queues a task for the rest of its range, so an
+interrupted range is resumed from the last one queued.
+"""
+from datetime import timedelta
+from itertools import groupby
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from courseware.models import StudentModuleHistory
+
+log = logging.getLogger(__name__)
+
+DEFAULT_RETENTION = {
+    'KEEP_LAST': 10,
+    'KEEP_GRADED': True,
+    'KEEP_DAYS': None,
+    'BATCH_SIZE': 1000,
+    'SLEEP': 1,
+    'TASK_SECONDS': 300,
+}
+
+# Number of history rows to delete in each DELETE statement
+DELETE_CHUNK_SIZE = 1000
+
+
+def get_retention_policy():
+    """
+    Returns STUDENT_MODULE_HISTORY_RETENTION, with defaults for any settings it leaves out.
+    """
+    policy = dict(DEFAULT_RETENTION)
+    policy.update(getattr(settings, 'STUDENT_MODULE_HISTORY_RETENTION', {}))
+    return policy
+
+
+def history_ids_to_delete(history, policy, cutoff=None):
+    """
+    Returns the ids of the rows of `history` that `policy` doesn't keep.
+
+    `history` is the rows of one StudentModule, oldest first, as tuples of
+    (id, created, grade, max_grade). Rows created at or after `cutoff` are kept.
+    """
+    keep_from = len(history) - policy['KEEP_LAST']
+    last_grade = None
+    ids = []
+    for index, (history_id, created, grade, max_grade) in enumerate(history):
+        graded_transition = grade is not None and (grade, max_grade) != last_grade
+        if grade is not None:
+            last_grade = (grade, max_grade)
+
+        if index >= keep_from:
+            continue
+        if graded_transition and policy['KEEP_GRADED']:
+            continue
+        if cutoff is not None and created >= cutoff:
+            continue
+        ids.append(history_id)
+    return ids
+
+
+def prune_student_modules(start_id, end_id, policy, dry_run=False):
+    """
+    Deletes the history rows of StudentModules with ids from `start_id` up to
+    `end_id` that `policy` doesn't keep. Returns the number of rows deleted.
+    """
+    cutoff = now() - timedelta(days=policy['KEEP_DAYS']) if policy['KEEP_DAYS'] is not None else None
+
+    rows = StudentModuleHistory.objects.filter(
+        student_module_id__gte=start_id, student_module_id__lt=end_id
+    ).order_by('student_module', 'created', 'id').values_list(
+        'student_module_id', 'id', 'created', 'grade', 'max_grade'
+    )
+    ids_to_delete = []
+    for __, module_rows in groupby(rows.iterator(), lambda row: row[0]):
+        history = [row[1:] for row in module_rows]
+        ids_to_delete.extend(history_ids_to_delete(history, policy, cutoff))
+
+    verb = "Would have deleted" if dry_run else "Deleting"
+    log.info(
+        u"%s %d history rows of StudentModules %d to %d", verb, len(ids_to_delete), start_id, end_id - 1
+    )
+    if ids_to_delete and not dry_run:
+        _delete_history(ids_to_delete)
+    return len(ids_to_delete)
+
+
+@transaction.commit_on_success
+def _delete_history(ids_to_delete):
+    """
+    Deletes the history rows with ids `ids_to_delete`.
+
+    The ORM would read every row, state and all, before deleting it.
+    """
+    cursor = connection.cursor()
+    for start in xrange(0, len(ids_to_delete), DELETE_CHUNK_SIZE):
+        chunk = ids_to_delete[start:start + DELETE_CHUNK_SIZE]
+        cursor.execute(
+            "DELETE FROM {table} WHERE id IN ({ids})".format(
+                table=StudentModuleHistory._meta.db_table,  # pylint: disable=protected-access
+                ids=",".join(str(history_id) for history_id in chunk),
+            )
+        )
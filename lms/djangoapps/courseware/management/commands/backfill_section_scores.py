@@ -0,0 +1,148 @@
+"""
+A Django command that populates and verifies the persisted section scores
+(courseware.models.StudentSectionScore) of every student enrolled in a course.
+
+By default, every enrolled student is graded once, which stores a score row
+for each graded section they have started.
+
+With --verify, the stored section scores are instead compared against scores
+recomputed from StudentModule, and any differences are reported. Adding --fix
+replaces the mismatched rows with the recomputed scores.
+"""
+import json
+from optparse import make_option
+from textwrap import dedent
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.client import RequestFactory
+
+from courseware import grades
+from courseware.model_data import FieldDataCache
+from courseware.models import StudentSectionScore
+from courseware.module_render import get_module_for_descriptor
+from student.models import CourseEnrollment
+from xmodule.modulestore.django import modulestore
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.locations import SlashSeparatedCourseKey
+
+
+class Command(BaseCommand):
+    """
+    Backfill or verify the stored section scores of a course.
+    """
+    args = "<course_id>"
+    help = dedent(__doc__).strip()
+    option_list = BaseCommand.option_list + (
+        make_option('--verify',
+                    action='store_true',
+                    default=False,
+                    help='Compare stored section scores against recomputed ones instead of backfilling'),
+        make_option('--fix',
+                    action='store_true',
+                    default=False,
+                    help='With --verify, replace stored section scores that do not match'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("course_id not specified")
+
+        if not settings.FEATURES.get('ENABLE_PERSISTENT_SECTION_SCORES', False):
+            raise CommandError("FEATURES['ENABLE_PERSISTENT_SECTION_SCORES'] is not enabled")
+
+        try:
+            course_id = SlashSeparatedCourseKey.from_deprecated_string(args[0])
+        except InvalidKeyError:
+            raise CommandError("Invalid course_id")
+
+        course = modulestore().get_course(course_id, depth=None)
+        if course is None:
+            raise CommandError("Invalid course_id")
+
+        students = CourseEnrollment.users_enrolled_in(course_id)
+        if options['verify']:
+            self.verify(course, students, options['fix'])
+        else:
+            self.backfill(course, students)
+
+    def backfill(self, course, students):
+        """Grade every student, storing the scores of each section they have started."""
+        graded = failed = 0
+        for student, __, err_msg in grades.iterate_grades_for(course.id, students):
+            if err_msg:
+                failed += 1
+                self.stdout.write(u"Could not grade {}: {}\n".format(student.username, err_msg))
+            else:
+                graded += 1
+
+        self.stdout.write(u"Graded {} students, {} failures\n".format(graded, failed))
+
+    def verify(self, course, students, fix):
+        """Compare every student's stored section scores against recomputed scores."""
+        sections = [
+            section
+            for format_sections in course.grading_context['graded_sections'].itervalues()
+            for section in format_sections
+        ]
+
+        checked = stale = mismatched = 0
+        for student in students:
+            stored_section_scores = StudentSectionScore.scores_for_student(student, course.id)
+            if not stored_section_scores:
+                continue
+
+            create_module = self._module_creator(course, student)
+            for section in sections:
+                section_descriptor = section['section_descriptor']
+                section_score = stored_section_scores.get(section_descriptor.location.to_deprecated_string())
+                if section_score is None:
+                    continue
+
+                checked += 1
+                if section_score.fingerprint != grades._section_fingerprint(section):  # pylint: disable=protected-access
+                    # Out-of-date rows are ignored and recomputed by grades.grade()
+                    stale += 1
+                    continue
+
+                # Round-trip through JSON so the recomputed entries compare equal to stored ones
+                entries = json.loads(json.dumps(
+                    grades._compute_section_entries(  # pylint: disable=protected-access
+                        course.id, student, section_descriptor, create_module
+                    )
+                ))
+                if entries == section_score.entries:
+                    continue
+
+                mismatched += 1
+                self.stdout.write(u"Mismatch for {} in {}:\n  stored:     {}\n  recomputed: {}\n".format(
+                    student.username, section_descriptor.location, section_score.entries, entries
+                ))
+                if fix:
+                    StudentSectionScore.save_for_section(
+                        student,
+                        course.id,
+                        section_descriptor.location,
+                        section_score.fingerprint,
+                        [descriptor.location.to_deprecated_string() for descriptor in section['xmoduledescriptors']],
+                        entries
+                    )
+
+        self.stdout.write(u"Checked {} stored sections: {} mismatched{}, {} out of date\n".format(
+            checked, mismatched, " (fixed)" if fix else "", stale
+        ))
+
+    @staticmethod
+    def _module_creator(course, student):
+        """Returns a function that instantiates a descriptor for `student`."""
+        # Grading code expects a request with the student attached, as in grades.iterate_grades_for
+        request = RequestFactory().get('/')
+        request.user = student
+        request.session = {}
+
+        def create_module(descriptor):
+            '''creates an XModule instance given a descriptor'''
+            field_data_cache = FieldDataCache([descriptor], course.id, student)
+            return get_module_for_descriptor(student, request, descriptor, field_data_cache, course.id)
+
+        return create_module
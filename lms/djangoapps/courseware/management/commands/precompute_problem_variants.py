@@ -0,0 +1,47 @@
+"""
+A Django command that runs the scripts of every variant of the randomized
+problems of a course, so that their results are cached before students load
+them (see courseware.tasks). Run it before a problem set is released to a
+large course.
+
+By default the variants are computed by this command. With --queue, a celery
+task is queued to compute them instead.
+"""
+from optparse import make_option
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courseware.tasks import precompute_problem_variants
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+
+
+class Command(BaseCommand):
+    """
+    Precompute the variants of the problems of a course.
+    """
+    args = "<course_id>"
+    help = dedent(__doc__).strip()
+    option_list = BaseCommand.option_list + (
+        make_option('--queue',
+                    action='store_true',
+                    default=False,
+                    help='Queue a celery task to compute the variants'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("course_id not specified")
+
+        try:
+            CourseKey.from_string(args[0])
+        except InvalidKeyError:
+            raise CommandError("Invalid course_id")
+
+        if options['queue']:
+            result = precompute_problem_variants.delay(args[0])
+            self.stdout.write(u"Queued task {}\n".format(result.id))
+        else:
+            variants = precompute_problem_variants(args[0])
+            self.stdout.write(u"Precomputed {} problem variants\n".format(variants))
@@ -0,0 +1,60 @@
+"""
+A Django command that queues celery tasks to delete the StudentModuleHistory
+rows that the retention policy in STUDENT_MODULE_HISTORY_RETENTION doesn't
+keep (see courseware.history_pruning).
+
+The StudentModule ids are split into --tasks ranges, pruned in parallel.
+Tasks log the StudentModule ids they have reached, so a pruning that was
+stopped can be resumed with --start.
+
+clean_history, which deletes rows written in quick succession, is still
+available to run without celery.
+"""
+from optparse import make_option
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+
+from courseware.models import StudentModuleHistory
+from courseware.tasks import prune_student_module_history
+
+
+class Command(BaseCommand):
+    """
+    Queue the pruning of StudentModuleHistory.
+    """
+    help = dedent(__doc__).strip()
+    option_list = BaseCommand.option_list + (
+        make_option('--tasks',
+                    type='int',
+                    default=4,
+                    help='Number of tasks to prune in parallel'),
+        make_option('--start',
+                    type='int',
+                    default=0,
+                    help='StudentModule id to start from'),
+        make_option('--dry-run',
+                    action='store_true',
+                    default=False,
+                    help="Log what would be deleted, without deleting it"),
+    )
+
+    def handle(self, *args, **options):
+        if options['tasks'] < 1:
+            raise CommandError("--tasks must be at least 1")
+
+        last_id = StudentModuleHistory.objects.aggregate(Max('student_module'))['student_module__max']
+        if last_id is None or last_id < options['start']:
+            self.stdout.write("No history to prune\n")
+            return
+
+        start_id = options['start']
+        end_id = last_id + 1
+        range_size = -(-(end_id - start_id) // options['tasks'])
+        for range_start in xrange(start_id, end_id, range_size):
+            range_end = min(range_start + range_size, end_id)
+            result = prune_student_module_history.delay(range_start, range_end, dry_run=options['dry_run'])
+            self.stdout.write(u"Queued task {} for StudentModules {} to {}\n".format(
+                result.id, range_start, range_end - 1
+            ))
@@ -0,0 +1,49 @@
+"""
+A Django command that updates the grade and subsection open counts read by
+the Metrics tab of the instructor dashboard (see
+courseware.dashboard_aggregates), for the given courses or every course.
+
+The first update of a course counts all of its StudentModules; later ones
+only recount the modules with StudentModules modified since. Run it
+periodically (e.g. from cron every few minutes) with
+FEATURES['ENABLE_DASHBOARD_AGGREGATES'] set. --rebuild recounts every module.
+"""
+from optparse import make_option
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courseware.dashboard_aggregates import update_course_aggregates
+from xmodule.modulestore.django import modulestore
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.locations import SlashSeparatedCourseKey
+
+
+class Command(BaseCommand):
+    """
+    Update the dashboard counts of courses.
+    """
+    args = "[<course_id> ...]"
+    help = dedent(__doc__).strip()
+    option_list = BaseCommand.option_list + (
+        make_option('--rebuild',
+                    action='store_true',
+                    default=False,
+                    help='Recount every module, rather than the modules modified since the last update'),
+    )
+
+    def handle(self, *args, **options):
+        if args:
+            try:
+                course_ids = [SlashSeparatedCourseKey.from_deprecated_string(arg) for arg in args]
+            except InvalidKeyError:
+                raise CommandError("Invalid course_id")
+        else:
+            course_ids = [course.id for course in modulestore().get_courses()]
+
+        for course_id in course_ids:
+            recounted = update_course_aggregates(course_id, rebuild=options['rebuild'])
+            if recounted is None:
+                self.stdout.write(u"Counted every module of {}\n".format(course_id.to_deprecated_string()))
+            else:
+                self.stdout.write(u"Recounted {} modules of {}\n".format(recounted, course_id.to_deprecated_string()))
@@ -18,6 +18,9 @@ from opaque_keys.edx.keys import CourseKey, UsageKey
 from django.db import DatabaseError
 from django.contrib.auth.models import User
 
+from crum import get_current_request
+from request_cache.middleware import RequestCache
+
 from xblock.runtime import KeyValueStore
 from xblock.exceptions import KeyValueMultiSaveError, InvalidScopeError
 from xblock.fields import Scope, UserScope
@@ -41,6 +44,107 @@ def chunks(items, chunk_size):
     return (items[i:i + chunk_size] for i in xrange(0, len(items), chunk_size))
 
 
+def chunked_query(query, chunk_field, items, chunk_size=500, **kwargs):
+    """
+    Yields the results of filtering `query` with `chunk_field` set to chunks
+    of `items` of size `chunk_size`, and all other parameters from `**kwargs`
+
+    This works around a limitation in sqlite3 on the number of parameters
+    that can be put into a single query
+    """
+    return chain.from_iterable(
+        query.filter(**dict([(chunk_field, chunk)] + kwargs.items()))
+        for chunk in chunks(items, chunk_size)
+    )
+
+
+class StudentModuleSnapshot(object):
+    """
+    The StudentModules that the requesting user has in a course, shared by
+    every FieldDataCache that is created for that user and course during a
+    request.
+
+    Rows are queried the first time they are asked for, chunked by
+    module_state_key, and are then served from the snapshot, as is the absence
+    of a row. FieldDataCaches save and create rows through the snapshot's
+    StudentModule objects, so it stays up to date with what the LMS runtime
+    writes during the request.
+    """
+    # The key of the snapshots in the request cache
+    REQUEST_CACHE_KEY = 'courseware.model_data.student_module_snapshots'
+
+    def __init__(self, user, course_id):
+        self.user = user
+        self.course_id = course_id
+        # StudentModules (or None where there is none) by usage key
+        self._student_modules = {}
+
+    @classmethod
+    def for_request(cls, user, course_id):
+        """
+        Returns the snapshot of the StudentModules of `user` in `course_id` for
+        the current request, or None outside of a request (in a celery task,
+        say), where a snapshot would go stale, or if `user` is anonymous.
+
+        Requests that go through many students (grading the whole course on
+        the legacy instructor dashboard, say) would keep every student's
+        snapshot until they end, so there is also none if `user` isn't the
+        user making the request.
+        """
+        request = get_current_request()
+        if request is None or not user.is_authenticated():
+            return None
+        request_user = getattr(request, 'user', None)
+        if request_user is None or request_user.id != user.id:
+            return None
+
+        snapshots = RequestCache.get_request_cache().data.setdefault(cls.REQUEST_CACHE_KEY, {})
+        snapshot = snapshots.get((user.id, course_id))
+        if snapshot is None:
+            snapshot = snapshots[(user.id, course_id)] = cls(user, course_id)
+        return snapshot
+
+    def fetch(self, usage_keys, chunk_size=500):
+        """
+        Returns the StudentModules that the user has for `usage_keys`, querying
+        for the ones that haven't been asked for yet.
+        """
+        usage_keys = dict((usage_key.map_into_course(self.course_id), usage_key) for usage_key in usage_keys)
+        missing = [usage_key for key, usage_key in usage_keys.iteritems() if key not in self._student_modules]
+        if missing:
+            for usage_key in missing:
+                self._student_modules[usage_key.map_into_course(self.course_id)] = None
+            student_modules = chunked_query(
+                StudentModule.objects,
+                'module_state_key__in',
+                missing,
+                chunk_size,
+                course_id=self.course_id,
+                student=self.user.pk,
+            )
+            for student_module in student_modules:
+                self.add(student_module)
+
+        return [
+            self._student_modules[key] for key in usage_keys
+            if self._student_modules[key] is not None
+        ]
+
+    def get(self, usage_key):
+        """
+        Returns the StudentModule that the user has for `usage_key`, querying
+        for it if it hasn't been asked for yet, or None if there is none.
+        """
+        student_modules = self.fetch([usage_key])
+        return student_modules[0] if student_modules else None
+
+    def add(self, student_module):
+        """
+        Adds `student_module`, which has just been loaded or created, to the snapshot.
+        """
+        self._student_modules[student_module.module_state_key.map_into_course(self.course_id)] = student_module
+
+
 class FieldDataCache(object):
     """
     A cache of django model objects needed to supply the data
@@ -67,6 +171,9 @@ class FieldDataCache(object):
         self.course_id = course_id
         self.user = user
 
+        # Rows locked for update have to be read from the database
+        self.snapshot = None if select_for_update else StudentModuleSnapshot.for_request(user, course_id)
+
         if user.is_authenticated():
             for scope, fields in self._fields_to_cache().items():
                 for field_object in self._retrieve_fields(scope, fields):
@@ -134,17 +241,15 @@ class FieldDataCache(object):
         This works around a limitation in sqlite3 on the number of parameters
         that can be put into a single query
         """
-        res = chain.from_iterable(
-            self._query(model_class, **dict([(chunk_field, chunk)] + kwargs.items()))
-            for chunk in chunks(items, chunk_size)
-        )
-        return res
+        return chunked_query(self._query(model_class), chunk_field, items, chunk_size, **kwargs)
 
     def _retrieve_fields(self, scope, fields):
         """
         Queries the database for all of the fields in the specified scope
         """
         if scope == Scope.user_state:
+            if self.snapshot is not None:
+                return self.snapshot.fetch(descriptor.scope_ids.usage_id for descriptor in self.descriptors)
             return self._chunked_query(
                 StudentModule,
                 'module_state_key__in',
@@ -242,15 +347,22 @@ class FieldDataCache(object):
             # When we start allowing block_scope_ids to be either Locations or Locators,
             # this assertion will fail. Fix the code here when that happens!
             assert(isinstance(key.block_scope_id, UsageKey))
-            field_object, _ = StudentModule.objects.get_or_create(
-                course_id=self.course_id,
-                student=User.objects.get(id=key.user_id),
-                module_state_key=key.block_scope_id,
-                defaults={
-                    'state': json.dumps({}),
-                    'module_type': key.block_scope_id.category,
-                },
-            )
+            snapshot = self.snapshot if key.user_id == self.user.id else None
+            if snapshot is not None:
+                # Another FieldDataCache of this request may have created it
+                field_object = snapshot.get(key.block_scope_id)
+            if field_object is None:
+                field_object, _ = StudentModule.objects.get_or_create(
+                    course_id=self.course_id,
+                    student=User.objects.get(id=key.user_id),
+                    module_state_key=key.block_scope_id,
+                    defaults={
+                        'state': json.dumps({}),
+                        'module_type': key.block_scope_id.category,
+                    },
+                )
+                if snapshot is not None:
+                    snapshot.add(field_object)
         elif key.scope == Scope.user_state_summary:
             field_object, _ = XModuleUserStateSummaryField.objects.get_or_create(
                 field_name=key.field_name,
@@ -12,10 +12,12 @@ file and check it in at the same time as your model changes. To do that,
 ASSUMPTIONS: modules have unique IDs, even across different module_types
 
 """
+import json
+
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 from xmodule_django.models import CourseKeyField, LocationKeyField
@@ -259,3 +261,176 @@ class OfflineComputedGradeLog(models.Model):
 
     def __unicode__(self):
         return "[OCGLog] %s: %s" % (self.course_id.to_deprecated_string(), self.created)  # pylint: disable=no-member
+
+
+class StudentSectionScore(models.Model):
+    """
+    Persisted scores for every scorable module in one graded section
+    (subsection) of a course, for one student.
+
+    A course grade can be assembled from one of these rows per section instead
+    of one StudentModule lookup (or module instantiation) per problem. Rows are
+    created by courseware.grades the first time a section is graded, and are
+    kept current by `update_for_module` whenever a module publishes a grade.
+
+    `fingerprint` identifies the section content the row was computed from; a
+    row whose fingerprint no longer matches the course is recomputed.
+    """
+    class Meta:
+        unique_together = (('student', 'course_id', 'section_key'),)
+
+    student = models.ForeignKey(User, db_index=True)
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    section_key = LocationKeyField(max_length=255, db_index=True)
+
+    fingerprint = models.CharField(max_length=32)
+
+    # JSON object with two keys:
+    #   "candidates": locations of every module that could be scored in the section
+    #   "entries": [location, earned, possible, weight, graded, display_name] for
+    #       each module that was scored, in grading order. earned and possible
+    #       are unweighted, as in StudentModule.grade and StudentModule.max_grade.
+    scores = models.TextField(default='{}')
+
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    @property
+    def entries(self):
+        """The score entries stored for this section, in grading order."""
+        return json.loads(self.scores).get('entries', [])
+
+    @classmethod
+    def scores_for_student(cls, student, course_id):
+        """
+        Return a dict mapping deprecated section location strings to the
+        StudentSectionScore rows stored for `student` in `course_id`.
+        """
+        return {
+            section_score.section_key.to_deprecated_string(): section_score
+            for section_score in cls.objects.filter(student=student, course_id=course_id)
+        }
+
+    @classmethod
+    def save_for_section(cls, student, course_id, section_key, fingerprint, candidates, entries):
+        """
+        Create or replace the stored scores of section `section_key`.
+        """
+        section_score, __ = cls.objects.get_or_create(
+            student=student, course_id=course_id, section_key=section_key
+        )
+        section_score.fingerprint = fingerprint
+        section_score.scores = json.dumps({'candidates': candidates, 'entries': entries})
+        section_score.save()
+        return section_score
+
+    @classmethod
+    def update_for_module(cls, student_id, course_id, usage_key, grade, max_grade, weight):
+        """
+        Apply a newly published grade for module `usage_key` to every stored
+        section that contains it.
+
+        If the module was not scored when the section was last computed (for
+        instance it had no max_grade yet, or it was hidden by a dynamic
+        parent), the section row is deleted and recomputed the next time the
+        student is graded.
+        """
+        location = usage_key.to_deprecated_string()
+        for section_score in cls.objects.filter(student_id=student_id, course_id=course_id):
+            data = json.loads(section_score.scores)
+            if location not in data.get('candidates', []):
+                continue
+
+            entry = next((entry for entry in data['entries'] if entry[0] == location), None)
+            if entry is None or max_grade is None:
+                section_score.delete()
+                continue
+
+            entry[1] = grade if grade is not None else 0
+            entry[2] = max_grade
+            entry[3] = weight
+            section_score.scores = json.dumps(data)
+            section_score.save()
+
+    @receiver(post_delete, sender=StudentModule)
+    def discard_scores(sender, instance, **kwargs):  # pylint: disable=no-self-argument, unused-argument
+        """
+        Drops the stored section scores of a student whose module state was
+        deleted (e.g. by an instructor resetting it), so they are recomputed.
+        """
+        StudentSectionScore.objects.filter(
+            student_id=instance.student_id,
+            course_id=instance.course_id
+        ).delete()
+
+
+class ProblemGradeCount(models.Model):
+    """
+    The number of students with each grade on a problem of a course, for the
+    Metrics tab of the instructor dashboard (class_dashboard).
+
+    Kept by courseware.dashboard_aggregates, so that the dashboard does not
+    aggregate every StudentModule of the course each time it is loaded.
+    """
+    class Meta:
+        unique_together = (('course_id', 'module_state_key', 'grade', 'max_grade'),)
+
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    module_state_key = LocationKeyField(max_length=255, db_index=True, db_column='module_id')
+
+    grade = models.FloatField()
+    max_grade = models.FloatField(null=True, blank=True)
+    num_students = models.IntegerField()
+
+
+class SequentialOpenCount(models.Model):
+    """
+    The number of students that opened a subsection (sequential) of a course,
+    for the Metrics tab of the instructor dashboard (class_dashboard).
+
+    Kept by courseware.dashboard_aggregates, as ProblemGradeCount is.
+    """
+    class Meta:
+        unique_together = (('course_id', 'module_state_key'),)
+
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    module_state_key = LocationKeyField(max_length=255, db_index=True, db_column='module_id')
+
+    num_students = models.IntegerField()
+
+
+class DashboardAggregatesLog(models.Model):
+    """
+    When the ProblemGradeCounts and SequentialOpenCounts of a course were
+    updated. They include every StudentModule modified before
+    `updated_through`, which is None until the course is first counted.
+    """
+    course_id = CourseKeyField(max_length=255, unique=True)
+    updated_through = models.DateTimeField(null=True, blank=True)
+
+    @receiver(post_delete, sender=StudentModule)
+    def uncount_module(sender, instance, **kwargs):  # pylint: disable=no-self-argument, unused-argument
+        """
+        Records a deleted StudentModule (e.g. one an instructor reset), if the
+        counts of its course have been computed, so that the next update
+        recounts its module.
+        """
+        if instance.module_type not in ('problem', 'sequential'):
+            return
+        if DashboardAggregatesLog.objects.filter(
+                course_id=instance.course_id, updated_through__isnull=False
+        ).exists():
+            DashboardAggregatesDeletion.objects.create(
+                course_id=instance.course_id,
+                module_state_key=instance.module_state_key,
+            )
+
+
+class DashboardAggregatesDeletion(models.Model):
+    """
+    A StudentModule deleted since the counts of its course were updated. The
+    next update recounts its module, as it does for modified StudentModules.
+    """
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    module_state_key = LocationKeyField(max_length=255, db_column='module_id')
+    deleted = models.DateTimeField(auto_now_add=True)
@@ -21,6 +21,8 @@ from capa.xqueue_interface import XQueueInterface
 from courseware.access import has_access, get_user_role
 from courseware.masquerade import setup_masquerade
 from courseware.model_data import FieldDataCache, DjangoKeyValueStore
+from courseware.models import StudentSectionScore
+from courseware.navigation import get_student_outline
 from lms.lib.xblock.field_data import LmsFieldData
 from lms.lib.xblock.runtime import LmsModuleSystem, unquote_slashes, quote_slashes
 from edxmako.shortcuts import render_to_string
@@ -91,7 +93,7 @@ def make_track_function(request):
     return function
 
 
-def toc_for_course(user, request, course, active_chapter, active_section, field_data_cache):
+def toc_for_course(user, request, course, active_chapter, active_section, field_data_cache, outline=None):
     '''
     Create a table of contents from the module store
 
@@ -113,38 +115,59 @@ def toc_for_course(user, request, course, active_chapter, active_section, field_
     None if this is not the case.
 
     field_data_cache must include data from the course module and 2 levels of its descendents
+
+    outline is the student's navigation outline of the course (see
+    courseware.navigation.get_student_outline), if the caller already has it.
+    The course's modules are only instantiated when the course has no outline.
     '''
 
     with modulestore().bulk_operations(course.id):
-        course_module = get_module_for_descriptor(user, request, course, field_data_cache, course.id)
-        if course_module is None:
-            return None
+        if outline is None:
+            outline = get_student_outline(user, course)
+
+        if outline is not None:
+            if not has_access(user, 'load', course, course.id):
+                return None
+            chapters = outline
+        else:
+            course_module = get_module_for_descriptor(user, request, course, field_data_cache, course.id)
+            if course_module is None:
+                return None
+            chapters = course_module.get_display_items()
+
+        return _toc_from_chapters(chapters, active_chapter, active_section)
 
-        chapters = list()
-        for chapter in course_module.get_display_items():
-            if chapter.hide_from_toc:
-                continue
 
-            sections = list()
-            for section in chapter.get_display_items():
+def _toc_from_chapters(chapters, active_chapter, active_section):
+    """
+    Returns the table of contents of `chapters` (see toc_for_course), which
+    are either chapter modules or courseware.navigation.NavigationItems.
+    """
+    toc = list()
+    for chapter in chapters:
+        if chapter.hide_from_toc:
+            continue
+
+        sections = list()
+        for section in chapter.get_display_items():
 
-                active = (chapter.url_name == active_chapter and
-                          section.url_name == active_section)
+            active = (chapter.url_name == active_chapter and
+                      section.url_name == active_section)
 
-                if not section.hide_from_toc:
-                    sections.append({'display_name': section.display_name_with_default,
-                                     'url_name': section.url_name,
-                                     'format': section.format if section.format is not None else '',
-                                     'due': get_extended_due_date(section),
-                                     'active': active,
-                                     'graded': section.graded,
-                                     })
+            if not section.hide_from_toc:
+                sections.append({'display_name': section.display_name_with_default,
+                                 'url_name': section.url_name,
+                                 'format': section.format if section.format is not None else '',
+                                 'due': get_extended_due_date(section),
+                                 'active': active,
+                                 'graded': section.graded,
+                                 })
 
-            chapters.append({'display_name': chapter.display_name_with_default,
-                             'url_name': chapter.url_name,
-                             'sections': sections,
-                             'active': chapter.url_name == active_chapter})
-        return chapters
+        toc.append({'display_name': chapter.display_name_with_default,
+                    'url_name': chapter.url_name,
+                    'sections': sections,
+                    'active': chapter.url_name == active_chapter})
+    return toc
 
 
 def get_module(user, request, usage_key, field_data_cache,
@@ -361,6 +384,16 @@ def get_module_system_for_user(user, field_data_cache,
         # Save all changes to the underlying KeyValueStore
         student_module.save()
 
+        if settings.FEATURES.get('ENABLE_PERSISTENT_SECTION_SCORES', False):
+            StudentSectionScore.update_for_module(
+                user_id,
+                course_id,
+                descriptor.location,
+                student_module.grade,
+                student_module.max_grade,
+                descriptor.weight
+            )
+
         # Bin score into range and increment stats
         score_bucket = get_score_bucket(student_module.grade, student_module.max_grade)
 
@@ -0,0 +1,198 @@
+"""
+The navigation outline of a course: the chapters and sections that the
+courseware accordion lists.
+
+Instantiating every chapter and section module of a course, for each student
+and each page, only to list them is costly, when almost none of what the
+accordion shows depends on the student. The outline holds the fields of the
+chapters and sections that are the same for every student, and is cached by
+the version of the course's published content (see
+course_overviews.models.CourseOverview.get_version). Access checks and
+extended due dates are applied for each student when it is read.
+"""
+import json
+
+from django.core.cache import cache
+
+from course_overviews.models import CourseOverview
+from courseware.models import StudentModule
+from xmodule.error_module import ErrorDescriptor
+from xmodule.fields import Date
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.django import modulestore
+from xmodule.x_module import XModule
+
+# Outlines are cached by course version, so they only expire to free up space
+OUTLINE_CACHE_TIMEOUT = 60 * 60 * 24
+
+DATE_FIELD = Date()
+
+
+class NavigationItem(object):
+    """
+    A chapter or section of a course, with the fields of its descriptor that
+    the accordion and access checks (courseware.access) read.
+
+    `children` are the sections of a chapter that the student can see.
+    """
+    # Chapters and sections are never detached, see courseware.access
+    _class_tags = frozenset()
+
+    def __init__(self, course_key, fields):
+        self.location = course_key.make_usage_key(fields['category'], fields['url_name'])
+        self.url_name = fields['url_name']
+        self.display_name_with_default = fields['display_name']
+        self.format = fields['format']
+        self.graded = fields['graded']
+        self.due = fields['due']
+        self.hide_from_toc = fields['hide_from_toc']
+        self.start = fields['start']
+        self.visible_to_staff_only = fields['visible_to_staff_only']
+        self.days_early_for_beta = fields['days_early_for_beta']
+        self.extended_due = None
+        self.children = []
+
+    def get_display_items(self):
+        """
+        Returns the sections of a chapter that the student can see, like XModuleMixin.get_display_items.
+        """
+        return self.children
+
+
+def _item_fields(descriptor):
+    """
+    Returns the fields of a chapter or section to store in the outline.
+    """
+    return {
+        'category': descriptor.location.category,
+        'url_name': descriptor.url_name,
+        'display_name': descriptor.display_name_with_default,
+        'format': descriptor.format,
+        'graded': descriptor.graded,
+        'due': getattr(descriptor, 'due', None),
+        'hide_from_toc': descriptor.hide_from_toc,
+        'start': descriptor.start,
+        # Only staff can load modules that failed to load (see courseware.access)
+        'visible_to_staff_only': descriptor.visible_to_staff_only or isinstance(descriptor, ErrorDescriptor),
+        'days_early_for_beta': descriptor.days_early_for_beta,
+    }
+
+
+def _is_same_for_every_student(descriptor):
+    """
+    Returns whether the module of `descriptor` lists itself in the accordion,
+    with the same children for every student.
+
+    A/B tests, for instance, list children chosen for each student instead.
+    """
+    module_class = getattr(descriptor, 'module_class', None)
+    displayable_items = getattr(module_class, 'displayable_items', XModule.displayable_items)
+    return (
+        displayable_items.__func__ is XModule.displayable_items.__func__ and
+        not descriptor.has_dynamic_children()
+    )
+
+
+def _build_outline(course):
+    """
+    Returns the outline of `course`, or None if it isn't the same for every student.
+    """
+    chapters = []
+    for chapter in course.get_children():
+        if not _is_same_for_every_student(chapter):
+            return None
+
+        sections = []
+        for section in chapter.get_children():
+            if not _is_same_for_every_student(section):
+                return None
+            sections.append(_item_fields(section))
+
+        chapter_fields = _item_fields(chapter)
+        chapter_fields['sections'] = sections
+        chapters.append(chapter_fields)
+    return chapters
+
+
+def get_course_outline(course):
+    """
+    Returns the outline of `course`: a list with the fields of each chapter,
+    each with the fields of its sections in 'sections'.
+
+    Returns None if the chapters and sections that the accordion lists differ
+    between students in ways the outline can't describe; the course's modules
+    have to be instantiated for each student to list them.
+    """
+    store = modulestore()
+    if store.get_modulestore_type(course.id) == ModuleStoreEnum.Type.xml:
+        # XML courses are in memory already, and can change without a new version
+        with store.bulk_operations(course.id):
+            return _build_outline(course)
+
+    cache_key = u'courseware.navigation.outline.{}.{}'.format(course.id, CourseOverview.get_version(course.id))
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached['chapters']
+
+    with store.bulk_operations(course.id):
+        chapters = _build_outline(course)
+    cache.set(cache_key, {'chapters': chapters}, OUTLINE_CACHE_TIMEOUT)
+    return chapters
+
+
+def _extended_due_dates(user, course_key, locations):
+    """
+    Returns a dict of the due dates that have been extended for `user`
+    (see instructor.views.tools.set_due_date_extension), by location,
+    among those of `locations`.
+    """
+    if not locations or not user.is_authenticated():
+        return {}
+
+    extended_due_dates = {}
+    student_modules = StudentModule.objects.filter(
+        student_id=user.id, course_id=course_key, module_state_key__in=locations
+    )
+    for student_module in student_modules:
+        extended_due = json.loads(student_module.state or '{}').get('extended_due')
+        if extended_due:
+            location = student_module.module_state_key.map_into_course(course_key)
+            extended_due_dates[location] = DATE_FIELD.from_json(extended_due)
+    return extended_due_dates
+
+
+def get_student_outline(user, course):
+    """
+    Returns the chapters of `course` that `user` can load, as NavigationItems
+    in course order, whose children are the sections of that chapter that
+    `user` can load. These are the display items of the course and chapter
+    modules, including those hidden from the table of contents.
+
+    Returns None if get_course_outline does.
+    """
+    # Imported here, as courseware.access imports this module
+    from courseware.access import has_access
+
+    outline = get_course_outline(course)
+    if outline is None:
+        return None
+
+    chapters = []
+    for chapter_fields in outline:
+        chapter = NavigationItem(course.id, chapter_fields)
+        if not has_access(user, 'load', chapter, course.id):
+            continue
+
+        for section_fields in chapter_fields['sections']:
+            section = NavigationItem(course.id, section_fields)
+            if has_access(user, 'load', section, course.id):
+                chapter.children.append(section)
+        chapters.append(chapter)
+
+    extended_due_dates = _extended_due_dates(user, course.id, [
+        section.location for chapter in chapters for section in chapter.children if section.due
+    ])
+    for chapter in chapters:
+        for section in chapter.children:
+            section.extended_due = extended_due_dates.get(section.location)
+    return chapters
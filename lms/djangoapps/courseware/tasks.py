@@ -0,0 +1,131 @@
+"""
+Celery tasks of the courseware.
+
+Problems randomized per student only have NUM_RANDOMIZATION_BINS variants (see
+xmodule.capa_base.randomization_bin), and problems that are never randomized
+have one. Each variant's scripts are run in the sandbox the first time any
+student loads it, so when a problem set is released to a large course, the
+first thousands of students all run the same few scripts at once.
+
+precompute_problem_variants constructs every variant of every such problem in
+a course ahead of time, which leaves the results of their scripts in the cache
+that the LMS runs scripts with (see capa.safe_exec), keyed by the script and
+its seed. Loading a problem for the first time then finds its variant there.
+
+Problems randomized on every attempt, or whose scripts use the student's
+anonymous id, have a variant per student, and are left alone.
+
+prune_student_module_history deletes the StudentModuleHistory rows that the
+retention policy doesn't keep (see courseware.history_pruning).
+"""
+import time
+
+from celery import task
+from celery.utils.log import get_task_logger
+
+from django.conf import settings
+from django.core.cache import cache
+
+from capa.capa_problem import LoncapaProblem, LoncapaSystem
+from courseware import history_pruning
+from edxmako.shortcuts import render_to_string
+from opaque_keys.edx.keys import CourseKey
+from util.sandboxing import can_execute_unsafe_code, get_python_lib_zip
+from xmodule.capa_base import NUM_RANDOMIZATION_BINS
+from xmodule.contentstore.django import contentstore
+from xmodule.modulestore.django import modulestore, ModuleI18nService
+
+log = get_task_logger(__name__)
+
+
+def variant_seeds(descriptor):
+    """
+    Returns the seeds of all the variants of the problem `descriptor`, or an
+    empty list if there are too many of them to precompute.
+    """
+    if 'anonymous_student_id' in descriptor.data:
+        return []
+    if descriptor.rerandomize == 'never':
+        return [1]
+    if descriptor.rerandomize == 'per_student':
+        return range(NUM_RANDOMIZATION_BINS)
+    return []
+
+
+def precompute_variants(descriptor):
+    """
+    Constructs the LoncapaProblem of each variant of the problem `descriptor`,
+    as the LMS does for a student's first view. Returns the number of variants.
+    """
+    course_key = descriptor.location.course_key
+    seeds = variant_seeds(descriptor)
+    for seed in seeds:
+        capa_system = LoncapaSystem(
+            ajax_url=None,
+            anonymous_student_id=None,
+            cache=cache,
+            can_execute_unsafe_code=lambda: can_execute_unsafe_code(course_key),
+            get_python_lib_zip=lambda: get_python_lib_zip(contentstore, course_key),
+            DEBUG=settings.DEBUG,
+            filestore=descriptor.runtime.resources_fs,
+            i18n=ModuleI18nService(),
+            node_path=settings.NODE_PATH,
+            render_template=render_to_string,
+            seed=None,
+            STATIC_URL=settings.STATIC_URL,
+            xqueue=None,
+            matlab_api_key=descriptor.matlab_api_key,
+        )
+        LoncapaProblem(
+            problem_text=descriptor.data,
+            id=descriptor.location.html_id(),
+            seed=seed,
+            capa_system=capa_system,
+        )
+    return len(seeds)
+
+
+@task()  # pylint: disable=not-callable
+def precompute_problem_variants(course_id):
+    """
+    Precomputes the variants of every problem of the course `course_id`.
+    Returns the number of variants.
+    """
+    course_key = CourseKey.from_string(course_id)
+    variants = 0
+    for descriptor in modulestore().get_items(course_key, qualifiers={'category': 'problem'}):
+        try:
+            variants += precompute_variants(descriptor)
+        except Exception:  # pylint: disable=broad-except
+            # Students get the error when they load the problem, as they did before
+            log.exception(u"Couldn't precompute the variants of problem %s", descriptor.location)
+
+    log.info(u"Precomputed %d problem variants of course %s", variants, course_id)
+    return variants
+
+
+@task(acks_late=True)  # pylint: disable=not-callable
+def prune_student_module_history(start_id, end_id, dry_run=False):
+    """
+    Prunes the history of the StudentModules with ids from `start_id` up to
+    `end_id`, in batches. Queues a task for the rest of the range once it has
+    run for the TASK_SECONDS of the retention policy.
+    """
+    policy = history_pruning.get_retention_policy()
+    deadline = time.time() + policy['TASK_SECONDS']
+    deleted = 0
+    while start_id < end_id:
+        batch_end = min(start_id + policy['BATCH_SIZE'], end_id)
+        deleted += history_pruning.prune_student_modules(start_id, batch_end, policy, dry_run=dry_run)
+        start_id = batch_end
+        if start_id >= end_id:
+            break
+
+        if time.time() >= deadline:
+            log.info(u"Queueing the pruning of the history of StudentModules %d to %d", start_id, end_id - 1)
+            prune_student_module_history.delay(start_id, end_id, dry_run=dry_run)
+            break
+        # Let replicas catch up
+        time.sleep(policy['SLEEP'])
+
+    return deleted
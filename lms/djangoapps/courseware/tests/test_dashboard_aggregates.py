@@ -0,0 +1,117 @@
+"""
+Tests of courseware.dashboard_aggregates
+"""
+from datetime import timedelta
+
+from django.test import TestCase
+from mock import patch
+
+from courseware.dashboard_aggregates import aggregates_available, update_course_aggregates
+from courseware.models import DashboardAggregatesDeletion, ProblemGradeCount, SequentialOpenCount, StudentModule
+from courseware.tests.factories import StudentModuleFactory
+from opaque_keys.edx.locations import SlashSeparatedCourseKey
+
+
+@patch('courseware.dashboard_aggregates.UPDATE_OVERLAP', timedelta(0))
+class UpdateCourseAggregatesTest(TestCase):
+    """
+    Tests of keeping the dashboard counts of a course.
+    """
+    def setUp(self):
+        super(UpdateCourseAggregatesTest, self).setUp()
+        self.course_id = SlashSeparatedCourseKey("MITx", "999", "Robot_Super_Course")
+        self.problems = [self.course_id.make_usage_key('problem', 'p{}'.format(index)) for index in xrange(2)]
+        self.sequential = self.course_id.make_usage_key('sequential', 's0')
+
+        self.modules = [
+            StudentModuleFactory.create(
+                course_id=self.course_id, module_state_key=problem, grade=grade, max_grade=2
+            )
+            for problem in self.problems
+            for grade in (0, 1, 1, 2)
+        ]
+        for __ in xrange(3):
+            StudentModuleFactory.create(
+                course_id=self.course_id, module_state_key=self.sequential, module_type='sequential'
+            )
+
+    def grade_counts(self, problem):
+        """Returns the stored counts of each grade on `problem`."""
+        return {
+            count.grade: count.num_students
+            for count in ProblemGradeCount.objects.filter(course_id=self.course_id, module_state_key=problem)
+        }
+
+    def open_count(self):
+        """Returns the stored count of students that opened the sequential."""
+        return SequentialOpenCount.objects.get(course_id=self.course_id, module_state_key=self.sequential).num_students
+
+    def test_first_update_counts_everything(self):
+        self.assertFalse(aggregates_available(self.course_id))
+        self.assertIsNone(update_course_aggregates(self.course_id))
+
+        self.assertTrue(aggregates_available(self.course_id))
+        for problem in self.problems:
+            self.assertEqual(self.grade_counts(problem), {0: 1, 1: 2, 2: 1})
+        self.assertEqual(self.open_count(), 3)
+
+    def test_update_recounts_modified_modules(self):
+        update_course_aggregates(self.course_id)
+        self.assertEqual(update_course_aggregates(self.course_id), 0)
+
+        module = self.modules[0]
+        module.grade = 2
+        module.save()
+        self.assertEqual(update_course_aggregates(self.course_id), 1)
+
+        self.assertEqual(self.grade_counts(self.problems[0]), {1: 2, 2: 2})
+        self.assertEqual(self.grade_counts(self.problems[1]), {0: 1, 1: 2, 2: 1})
+
+    def test_deleted_modules_uncounted(self):
+        update_course_aggregates(self.course_id)
+
+        self.modules[0].delete()
+        self.modules[1].delete()
+        self.assertEqual(self.grade_counts(self.problems[0]), {0: 1, 1: 2, 2: 1})
+        self.assertEqual(update_course_aggregates(self.course_id), 1)
+
+        self.assertEqual(self.grade_counts(self.problems[0]), {1: 1, 2: 1})
+        self.assertEqual(self.grade_counts(self.problems[1]), {0: 1, 1: 2, 2: 1})
+        self.assertFalse(DashboardAggregatesDeletion.objects.exists())
+        self.assertEqual(update_course_aggregates(self.course_id), 0)
+
+    def test_regraded_modules_uncounted(self):
+        update_course_aggregates(self.course_id)
+
+        module = self.modules[0]
+        module.grade = 2
+        module.save()
+        module.delete()
+        update_course_aggregates(self.course_id)
+        self.assertEqual(self.grade_counts(self.problems[0]), {1: 2, 2: 1})
+
+    def test_deleted_opens_uncounted(self):
+        update_course_aggregates(self.course_id)
+
+        StudentModule.objects.filter(course_id=self.course_id, module_type='sequential')[0].delete()
+        update_course_aggregates(self.course_id)
+        self.assertEqual(self.open_count(), 2)
+
+    def test_recent_deletions_wait_for_replica(self):
+        update_course_aggregates(self.course_id)
+
+        self.modules[0].delete()
+        with patch('courseware.dashboard_aggregates.UPDATE_OVERLAP', timedelta(minutes=5)):
+            self.assertEqual(update_course_aggregates(self.course_id), 0)
+        self.assertEqual(DashboardAggregatesDeletion.objects.count(), 1)
+        self.assertEqual(self.grade_counts(self.problems[0]), {0: 1, 1: 2, 2: 1})
+
+        update_course_aggregates(self.course_id)
+        self.assertEqual(self.grade_counts(self.problems[0]), {1: 2, 2: 1})
+
+    def test_deletions_before_first_update(self):
+        self.modules[0].delete()
+        self.assertFalse(DashboardAggregatesDeletion.objects.exists())
+
+        update_course_aggregates(self.course_id)
+        self.assertEqual(self.grade_counts(self.problems[0]), {1: 2, 2: 1})
@@ -2,19 +2,23 @@
 Test grade calculation.
 """
 from django.http import Http404
+from django.test.client import RequestFactory
 from django.test.utils import override_settings
 from mock import patch
 
+from courseware.models import StudentSectionScore
+from courseware.tests.factories import StudentModuleFactory
 from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
 from student.tests.factories import UserFactory
-from xmodule.modulestore.tests.factories import CourseFactory
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
 
-from courseware.grades import grade, iterate_grades_for
+from courseware.grades import grade, iterate_grades_for, StudentModuleScores
 
 
-def _grade_with_errors(student, request, course, keep_raw_scores=False):
+def _grade_with_errors(student, request, course, keep_raw_scores=False, module_scores=None):
     """This fake grade method will throw exceptions for student3 and
     student4, but allow any other students to go through normal grading.
 
@@ -25,7 +29,7 @@ def _grade_with_errors(student, request, course, keep_raw_scores=False):
     if student.username in ['student3', 'student4']:
         raise Exception("I don't like {}".format(student.username))
 
-    return grade(student, request, course, keep_raw_scores=keep_raw_scores)
+    return grade(student, request, course, keep_raw_scores=keep_raw_scores, module_scores=module_scores)
 
 
 @override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
@@ -121,3 +125,113 @@ class TestGradeIteration(ModuleStoreTestCase):
                 students_to_errors[student] = err_msg
 
         return students_to_gradesets, students_to_errors
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+@patch.dict('django.conf.settings.FEATURES', {'ENABLE_PERSISTENT_SECTION_SCORES': True})
+class TestStudentSectionScores(ModuleStoreTestCase):
+    """
+    Test that section scores are persisted and kept up to date.
+    """
+    def setUp(self):
+        course = CourseFactory.create()
+        chapter = ItemFactory.create(parent_location=course.location, category='chapter')
+        section = ItemFactory.create(
+            parent_location=chapter.location,
+            category='sequential',
+            metadata={'graded': True, 'format': 'Homework'}
+        )
+        self.problem = ItemFactory.create(parent_location=section.location, category='problem')
+        self.course = modulestore().get_course(course.id, depth=None)
+
+        self.student = UserFactory.create()
+        self.student_module = StudentModuleFactory.create(
+            student=self.student,
+            course_id=self.course.id,
+            module_state_key=self.problem.location,
+            grade=1,
+            max_grade=2
+        )
+        self.request = RequestFactory().get('/')
+        self.request.user = self.student
+        self.request.session = {}
+
+    def _raw_scores(self):
+        """Grade the student, returning (earned, possible) for each graded module."""
+        gradeset = grade(self.student, self.request, self.course, keep_raw_scores=True)
+        return [(score.earned, score.possible) for score in gradeset['raw_scores']]
+
+    def test_scores_are_stored(self):
+        self.assertEqual(self._raw_scores(), [(1, 2)])
+        section_score = StudentSectionScore.objects.get(student=self.student, course_id=self.course.id)
+        self.assertEqual(section_score.entries[0][:3], [self.problem.location.to_deprecated_string(), 1, 2])
+
+    def test_stored_scores_are_used(self):
+        self._raw_scores()
+        # Changing StudentModule behind the store's back is not noticed
+        self.student_module.grade = 0
+        self.student_module.save()
+        self.assertEqual(self._raw_scores(), [(1, 2)])
+
+    def test_editing_problem_recomputes_stored_scores(self):
+        self._raw_scores()
+        self.student_module.grade = 0
+        self.student_module.save()
+        # The problem's XML, which its maximum score comes from, is edited
+        self.problem.data = '<problem><multiplechoiceresponse/><multiplechoiceresponse/></problem>'
+        modulestore().update_item(self.problem, self.student.id)
+        self.course = modulestore().get_course(self.course.id, depth=None)
+        self.assertEqual(self._raw_scores(), [(0, 2)])
+
+    def test_grade_event_updates_stored_scores(self):
+        self._raw_scores()
+        StudentSectionScore.update_for_module(self.student.id, self.course.id, self.problem.location, 2, 2, None)
+        self.assertEqual(self._raw_scores(), [(2, 2)])
+
+    def test_deleting_state_discards_stored_scores(self):
+        self._raw_scores()
+        self.student_module.delete()
+        self.assertFalse(StudentSectionScore.objects.filter(student=self.student).exists())
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class TestStudentModuleScores(ModuleStoreTestCase):
+    """
+    Test the bulk loading of StudentModule grades used for batch grading.
+    """
+    def setUp(self):
+        course = CourseFactory.create()
+        chapter = ItemFactory.create(parent_location=course.location, category='chapter')
+        section = ItemFactory.create(
+            parent_location=chapter.location,
+            category='sequential',
+            metadata={'graded': True, 'format': 'Homework'}
+        )
+        self.problem = ItemFactory.create(parent_location=section.location, category='problem')
+        self.html = ItemFactory.create(parent_location=section.location, category='html')
+        self.course = modulestore().get_course(course.id, depth=None)
+
+        self.students = [UserFactory.create(), UserFactory.create()]
+        StudentModuleFactory.create(
+            student=self.students[0],
+            course_id=self.course.id,
+            module_state_key=self.problem.location,
+            grade=1,
+            max_grade=2
+        )
+
+    def test_loaded_scores(self):
+        module_scores = StudentModuleScores(self.course, self.students)
+        self.assertTrue(module_scores.covers(self.problem.location))
+        self.assertFalse(module_scores.covers(self.html.location))
+        self.assertEqual(module_scores.get(self.students[0], self.problem.location), (1, 2))
+        self.assertIsNone(module_scores.get(self.students[1], self.problem.location))
+
+    def test_batched_grades_match(self):
+        request = RequestFactory().get('/')
+        request.session = {}
+        for batch_size in (1, 2):
+            for student, gradeset, err_msg in iterate_grades_for(self.course.id, self.students, batch_size):
+                request.user = student
+                self.assertEqual(err_msg, "")
+                self.assertEqual(gradeset, grade(student, request, self.course))
@@ -0,0 +1,114 @@
+"""
+Tests of courseware.history_pruning
+"""
+from datetime import datetime, timedelta
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.timezone import UTC
+from mock import patch
+
+from courseware.history_pruning import (
+    DEFAULT_RETENTION, get_retention_policy, history_ids_to_delete, prune_student_modules,
+)
+from courseware.models import StudentModuleHistory
+from courseware.tasks import prune_student_module_history
+from courseware.tests.factories import StudentModuleFactory
+
+START = datetime(2014, 1, 1, tzinfo=UTC())
+
+
+def make_policy(**kwargs):
+    """Returns the default retention policy, changed by `kwargs`."""
+    policy = dict(DEFAULT_RETENTION)
+    policy.update(kwargs)
+    return policy
+
+
+class HistoryIdsToDeleteTest(TestCase):
+    """
+    Tests of which history rows a retention policy keeps.
+    """
+    def make_history(self, grades):
+        """Returns history rows with `grades`, out of 2, a day apart."""
+        return [
+            (index, START + timedelta(days=index), grade, None if grade is None else 2)
+            for index, grade in enumerate(grades)
+        ]
+
+    def test_keep_last(self):
+        history = self.make_history([None] * 5)
+        self.assertEqual(history_ids_to_delete(history, make_policy(KEEP_LAST=2)), [0, 1, 2])
+        self.assertEqual(history_ids_to_delete(history, make_policy(KEEP_LAST=10)), [])
+
+    def test_keep_graded(self):
+        history = self.make_history([None, 0, None, 0, 1, 1, 0])
+        self.assertEqual(history_ids_to_delete(history, make_policy(KEEP_LAST=1)), [0, 2, 3, 5])
+        self.assertEqual(
+            history_ids_to_delete(history, make_policy(KEEP_LAST=1, KEEP_GRADED=False)), [0, 1, 2, 3, 4, 5]
+        )
+
+    def test_keep_recent(self):
+        history = self.make_history([None] * 5)
+        cutoff = START + timedelta(days=3)
+        self.assertEqual(history_ids_to_delete(history, make_policy(KEEP_LAST=0), cutoff), [0, 1, 2])
+
+    def test_pruning_again_deletes_nothing(self):
+        history = self.make_history([None, 0, 0, None, 1, 1, None, 0, 0])
+        policy = make_policy(KEEP_LAST=2)
+        ids = history_ids_to_delete(history, policy)
+        pruned = [row for row in history if row[0] not in ids]
+        self.assertEqual(history_ids_to_delete(pruned, policy), [])
+
+    @override_settings(STUDENT_MODULE_HISTORY_RETENTION={'KEEP_LAST': 3})
+    def test_policy_defaults(self):
+        self.assertEqual(get_retention_policy(), make_policy(KEEP_LAST=3))
+
+
+class PruneStudentModulesTest(TestCase):
+    """
+    Tests of pruning the history of StudentModules.
+    """
+    def setUp(self):
+        super(PruneStudentModulesTest, self).setUp()
+        self.modules = [StudentModuleFactory.create() for _ in xrange(2)]
+        StudentModuleHistory.objects.all().delete()
+        for module in self.modules:
+            for index in xrange(5):
+                StudentModuleHistory.objects.create(
+                    student_module=module, created=START + timedelta(days=index), grade=None
+                )
+
+    def remaining(self, module):
+        """Returns the number of history rows of `module` left."""
+        return StudentModuleHistory.objects.filter(student_module=module).count()
+
+    def test_prune(self):
+        deleted = prune_student_modules(
+            self.modules[0].id, self.modules[0].id + 1, make_policy(KEEP_LAST=2)
+        )
+        self.assertEqual(deleted, 3)
+        self.assertEqual(self.remaining(self.modules[0]), 2)
+        self.assertEqual(self.remaining(self.modules[1]), 5)
+
+    def test_dry_run(self):
+        deleted = prune_student_modules(
+            self.modules[0].id, self.modules[1].id + 1, make_policy(KEEP_LAST=2), dry_run=True
+        )
+        self.assertEqual(deleted, 6)
+        self.assertEqual(StudentModuleHistory.objects.count(), 10)
+
+    @override_settings(STUDENT_MODULE_HISTORY_RETENTION={'KEEP_LAST': 2, 'BATCH_SIZE': 1, 'SLEEP': 0})
+    def test_task(self):
+        deleted = prune_student_module_history(self.modules[0].id, self.modules[1].id + 1)
+        self.assertEqual(deleted, 6)
+        self.assertEqual(StudentModuleHistory.objects.count(), 4)
+
+    @override_settings(STUDENT_MODULE_HISTORY_RETENTION={'KEEP_LAST': 2, 'BATCH_SIZE': 1, 'TASK_SECONDS': 0})
+    def test_task_requeued(self):
+        with patch('courseware.tasks.prune_student_module_history.delay') as mock_delay:
+            prune_student_module_history(self.modules[0].id, self.modules[1].id + 1)
+
+        mock_delay.assert_called_with(self.modules[0].id + 1, self.modules[1].id + 1, dry_run=False)
+        self.assertEqual(self.remaining(self.modules[0]), 2)
+        self.assertEqual(self.remaining(self.modules[1]), 5)
@@ -6,7 +6,7 @@ from mock import Mock, patch
 from functools import partial
 
 from courseware.model_data import DjangoKeyValueStore
-from courseware.model_data import InvalidScopeError, FieldDataCache
+from courseware.model_data import InvalidScopeError, FieldDataCache, StudentModuleSnapshot
 from courseware.models import StudentModule
 from courseware.models import XModuleStudentInfoField, XModuleStudentPrefsField
 
@@ -18,6 +18,7 @@ from courseware.tests.factories import StudentPrefsFactory, StudentInfoFactory
 from xblock.fields import Scope, BlockScope, ScopeIds
 from django.test import TestCase
 from django.db import DatabaseError
+from request_cache.middleware import RequestCache
 from xblock.core import KeyValueMultiSaveError
 
 
@@ -339,3 +340,69 @@ class TestStudentInfoStorage(OtherUserFailureTestMixin, StorageTestBase, TestCas
     storage_class = XModuleStudentInfoField
     other_key_factory = partial(DjangoKeyValueStore.Key, Scope.user_info, 2, 'mock_problem')  # user_id=2, not 1
     existing_field_name = "existing_field"
+
+
+class TestStudentModuleSnapshot(TestCase):
+    """Tests of sharing StudentModules between the FieldDataCaches of a request"""
+
+    def setUp(self):
+        RequestCache().clear_request_cache()
+        self.addCleanup(RequestCache().clear_request_cache)
+
+        student_module = StudentModuleFactory(state=json.dumps({'a_field': 'a_value'}))
+        self.user = student_module.student
+        self.assertEqual(self.user.id, 1)   # check our assumption hard-coded in the key functions above.
+        self.descriptor = mock_descriptor([mock_field(Scope.user_state, 'a_field')])
+
+        patcher = patch('courseware.model_data.get_current_request', Mock(return_value=Mock(user=self.user)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_shared_between_caches(self):
+        FieldDataCache([self.descriptor], course_id, self.user)
+
+        with self.assertNumQueries(0):
+            kvs = DjangoKeyValueStore(FieldDataCache([self.descriptor], course_id, self.user))
+            self.assertEquals(kvs.get(user_state_key('a_field')), 'a_value')
+
+    def test_write_through(self):
+        DjangoKeyValueStore(FieldDataCache([self.descriptor], course_id, self.user)).set_many({
+            user_state_key('a_field'): 'new_value',
+        })
+
+        kvs = DjangoKeyValueStore(FieldDataCache([self.descriptor], course_id, self.user))
+        self.assertEquals(kvs.get(user_state_key('a_field')), 'new_value')
+        self.assertEquals(json.loads(StudentModule.objects.get(student=self.user).state), {'a_field': 'new_value'})
+
+    def test_created_module_shared(self):
+        StudentModule.objects.all().delete()
+        DjangoKeyValueStore(FieldDataCache([self.descriptor], course_id, self.user)).set(
+            user_state_key('a_field'), 'created_value'
+        )
+
+        with self.assertNumQueries(0):
+            kvs = DjangoKeyValueStore(FieldDataCache([self.descriptor], course_id, self.user))
+            self.assertEquals(kvs.get(user_state_key('a_field')), 'created_value')
+        self.assertEquals(StudentModule.objects.count(), 1)
+
+    def test_not_shared_for_update(self):
+        FieldDataCache([self.descriptor], course_id, self.user)
+
+        with self.assertNumQueries(1):
+            FieldDataCache([self.descriptor], course_id, self.user, select_for_update=True)
+
+    def test_outside_request(self):
+        FieldDataCache([self.descriptor], course_id, self.user)
+
+        with patch('courseware.model_data.get_current_request', Mock(return_value=None)):
+            with self.assertNumQueries(1):
+                FieldDataCache([self.descriptor], course_id, self.user)
+
+    def test_other_users_not_shared(self):
+        # e.g. the course staff member grading every student of the course
+        with patch('courseware.model_data.get_current_request', Mock(return_value=Mock(user=UserFactory()))):
+            FieldDataCache([self.descriptor], course_id, self.user)
+
+            with self.assertNumQueries(1):
+                FieldDataCache([self.descriptor], course_id, self.user)
+            self.assertNotIn(StudentModuleSnapshot.REQUEST_CACHE_KEY, RequestCache.get_request_cache().data)
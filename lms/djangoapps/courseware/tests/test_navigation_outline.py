@@ -0,0 +1,86 @@
+"""
+Tests of courseware.navigation
+"""
+from datetime import datetime, timedelta
+
+from django.test.utils import override_settings
+from django.utils.timezone import UTC
+
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+
+from courseware.navigation import get_course_outline, get_student_outline
+from courseware.tests.factories import StaffFactory, StudentModuleFactory, UserFactory
+from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class NavigationOutlineTest(ModuleStoreTestCase):
+    """
+    Tests of the navigation outline of a course.
+    """
+    def setUp(self):
+        super(NavigationOutlineTest, self).setUp()
+        self.course = CourseFactory.create()
+        self.chapter = ItemFactory.create(parent=self.course, category='chapter', display_name='Week 1')
+        self.section = ItemFactory.create(parent=self.chapter, category='sequential', display_name='Lesson 1')
+        self.hidden_section = ItemFactory.create(
+            parent=self.chapter, category='sequential', display_name='Staff lesson',
+            metadata={'visible_to_staff_only': True},
+        )
+        self.future_chapter = ItemFactory.create(
+            parent=self.course, category='chapter', display_name='Week 2',
+            metadata={'start': datetime.now(UTC()) + timedelta(days=7)},
+        )
+        self.course = self.store.get_course(self.course.id, depth=2)
+
+    def test_student_outline(self):
+        outline = get_student_outline(UserFactory.create(), self.course)
+
+        self.assertEqual([chapter.location for chapter in outline], [self.chapter.location])
+        self.assertEqual([section.location for section in outline[0].children], [self.section.location])
+        self.assertEqual(outline[0].children[0].display_name_with_default, 'Lesson 1')
+
+    def test_section_without_state(self):
+        self.section.due = datetime.now(UTC()) + timedelta(days=1)
+        self.store.update_item(self.section, self.user.id)
+        course = self.store.get_course(self.course.id, depth=2)
+        user = UserFactory.create()
+        StudentModuleFactory.create(
+            student=user, course_id=self.course.id, module_state_key=self.section.location,
+            module_type='sequential', state=None,
+        )
+
+        outline = get_student_outline(user, course)
+        self.assertEqual([section.location for section in outline[0].children], [self.section.location])
+        self.assertIsNone(outline[0].children[0].extended_due)
+
+    def test_staff_outline(self):
+        outline = get_student_outline(StaffFactory.create(course_key=self.course.id), self.course)
+
+        self.assertEqual(
+            [chapter.location for chapter in outline],
+            [self.chapter.location, self.future_chapter.location]
+        )
+        self.assertEqual(
+            [section.location for section in outline[0].children],
+            [self.section.location, self.hidden_section.location]
+        )
+
+    def test_outline_cached(self):
+        get_course_outline(self.course)
+
+        with self.assertNumQueries(1):
+            outline = get_course_outline(self.course)
+        self.assertEqual([chapter['url_name'] for chapter in outline], [
+            self.chapter.location.name, self.future_chapter.location.name
+        ])
+
+    def test_outline_updated_on_publish(self):
+        get_course_outline(self.course)
+
+        self.section.display_name = 'Renamed lesson'
+        self.store.update_item(self.section, self.user.id)
+        course = self.store.get_course(self.course.id, depth=2)
+
+        self.assertEqual(get_course_outline(course)[0]['sections'][0]['display_name'], 'Renamed lesson')
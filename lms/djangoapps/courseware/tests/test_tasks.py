@@ -0,0 +1,74 @@
+"""
+Tests of courseware.tasks
+"""
+from django.test.utils import override_settings
+from mock import patch
+
+from xmodule.capa_base import NUM_RANDOMIZATION_BINS
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+
+from courseware.tasks import precompute_problem_variants, variant_seeds
+from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
+
+PROBLEM_XML = """
+<problem>
+    <script type="loncapa/python">
+answer = {}
+    </script>
+    <p>$answer</p>
+</problem>
+"""
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class PrecomputeProblemVariantsTest(ModuleStoreTestCase):
+    """
+    Tests of precomputing the variants of randomized problems.
+    """
+    def setUp(self):
+        super(PrecomputeProblemVariantsTest, self).setUp()
+        self.course = CourseFactory.create()
+
+    def create_problem(self, rerandomize, answer="random.randint(1, 100)"):
+        """Returns a problem in the course."""
+        return ItemFactory.create(
+            parent=self.course, category='problem',
+            data=PROBLEM_XML.format(answer), metadata={'rerandomize': rerandomize},
+        )
+
+    def test_variant_seeds(self):
+        self.assertEqual(variant_seeds(self.create_problem('per_student')), range(NUM_RANDOMIZATION_BINS))
+        self.assertEqual(variant_seeds(self.create_problem('never')), [1])
+        self.assertEqual(variant_seeds(self.create_problem('always')), [])
+        self.assertEqual(variant_seeds(self.create_problem('per_student', answer="anonymous_student_id")), [])
+
+    def test_precompute(self):
+        problem = self.create_problem('per_student')
+        self.create_problem('always')
+
+        with patch('courseware.tasks.LoncapaProblem') as mock_problem:
+            variants = precompute_problem_variants(self.course.id.to_deprecated_string())
+
+        self.assertEqual(variants, NUM_RANDOMIZATION_BINS)
+        self.assertEqual(
+            sorted(call[1]['seed'] for call in mock_problem.call_args_list),
+            range(NUM_RANDOMIZATION_BINS)
+        )
+        self.assertEqual(mock_problem.call_args[1]['id'], problem.location.html_id())
+
+    def test_scripts_cached(self):
+        self.create_problem('never')
+
+        with patch('capa.capa_problem.safe_exec') as mock_safe_exec:
+            precompute_problem_variants(self.course.id.to_deprecated_string())
+
+        self.assertTrue(mock_safe_exec.called)
+        self.assertEqual(mock_safe_exec.call_args[1]['random_seed'], 1)
+        self.assertIsNotNone(mock_safe_exec.call_args[1]['cache'])
+
+    def test_broken_problem_skipped(self):
+        self.create_problem('never', answer="1/0")
+        self.create_problem('never')
+
+        self.assertEqual(precompute_problem_variants(self.course.id.to_deprecated_string()), 1)
@@ -34,6 +34,7 @@ from courseware.courses import get_courses, get_course, get_studio_url, get_cour
 from courseware.masquerade import setup_masquerade
 from courseware.model_data import FieldDataCache
 from .module_render import toc_for_course, get_module_for_descriptor, get_module
+from .navigation import get_student_outline
 from courseware.models import StudentModule, StudentModuleHistory
 from course_modes.models import CourseMode
 
@@ -98,7 +99,7 @@ def courses(request):
     return render_to_response("courseware/courses.html", {'courses': courses})
 
 
-def render_accordion(request, course, chapter, section, field_data_cache):
+def render_accordion(request, course, chapter, section, field_data_cache, outline=None):
     """
     Draws navigation bar. Takes current position in accordion as
     parameter.
@@ -107,12 +108,15 @@ def render_accordion(request, course, chapter, section, field_data_cache):
 
     course, chapter, and section are the url_names.
 
+    outline is the student's navigation outline of the course, if the caller
+    already has it (see toc_for_course).
+
     Returns the html string
     """
     # grab the table of contents
     user = User.objects.prefetch_related("groups").get(id=request.user.id)
     request.user = user	 # keep just one instance of User
-    toc = toc_for_course(user, request, course, chapter, section, field_data_cache)
+    toc = toc_for_course(user, request, course, chapter, section, field_data_cache, outline=outline)
 
     context = dict([
         ('toc', toc),
@@ -201,12 +205,17 @@ def redirect_to_course_position(course_module, content_depth):
     return redirect(reverse('courseware_section', kwargs=urlargs))
 
 
-def save_child_position(seq_module, child_name):
+def save_child_position(seq_module, child_name, child_names=None):
     """
     child_name: url_name of the child
+    child_names: the url_names of the display items of seq_module, if the caller
+        already has them, so that they needn't be instantiated
     """
-    for position, c in enumerate(seq_module.get_display_items(), start=1):
-        if c.location.name == child_name:
+    if child_names is None:
+        child_names = [c.location.name for c in seq_module.get_display_items()]
+
+    for position, name in enumerate(child_names, start=1):
+        if name == child_name:
             # Only save if position changed
             if position != seq_module.position:
                 seq_module.position = position
@@ -312,9 +321,13 @@ def _index_bulk_op(request, user, course_key, chapter, section, position):
 
         studio_url = get_studio_url(course, 'course')
 
+        # The chapters and sections this student can see, or None if the
+        # modules have to be instantiated to find out
+        outline = get_student_outline(user, course)
+
         context = {
             'csrf': csrf(request)['csrf_token'],
-            'accordion': render_accordion(request, course, chapter, section, field_data_cache),
+            'accordion': render_accordion(request, course, chapter, section, field_data_cache, outline=outline),
             'COURSE_TITLE': course.display_name_with_default,
             'course': course,
             'init': '',
@@ -355,12 +368,22 @@ def _index_bulk_op(request, user, course_key, chapter, section, position):
         context['show_chat'] = show_chat
 
         chapter_descriptor = course.get_child_by(lambda m: m.location.name == chapter)
-        if chapter_descriptor is not None:
-            save_child_position(course_module, chapter)
-        else:
+        if chapter_descriptor is None:
             raise Http404('No chapter descriptor found with name {}'.format(chapter))
 
-        chapter_module = course_module.get_child_by(lambda m: m.location.name == chapter)
+        if outline is not None:
+            outline_chapter = next((item for item in outline if item.url_name == chapter), None)
+            save_child_position(course_module, chapter, [item.url_name for item in outline])
+            # Only instantiate the chapter being shown
+            if outline_chapter is not None:
+                chapter_module = get_module_for_descriptor(
+                    user, request, chapter_descriptor, field_data_cache, course_key
+                )
+            else:
+                chapter_module = None
+        else:
+            save_child_position(course_module, chapter)
+            chapter_module = course_module.get_child_by(lambda m: m.location.name == chapter)
         if chapter_module is None:
             # User may be trying to access a chapter that isn't live yet
             if masq == 'student':  # if staff is masquerading as student be kinder, don't 404
@@ -420,7 +443,10 @@ def _index_bulk_op(request, user, course_key, chapter, section, position):
                 raise Http404
 
             # Save where we are in the chapter
-            save_child_position(chapter_module, section)
+            if outline is not None:
+                save_child_position(chapter_module, section, [item.url_name for item in outline_chapter.children])
+            else:
+                save_child_position(chapter_module, section)
             context['fragment'] = section_module.render(STUDENT_VIEW)
             context['section_title'] = section_descriptor.display_name_with_default
         else:
@@ -68,6 +68,12 @@ REPORTS_DATA = (
         'instructor_api_endpoint': 'get_students_features',
         'task_api_endpoint': 'instructor_task.api.submit_calculate_students_features_csv',
         'extra_instructor_api_kwargs': {'csv': '/csv'}
+    },
+    {
+        'report_type': 'answer distribution',
+        'instructor_api_endpoint': 'calculate_answer_distribution_csv',
+        'task_api_endpoint': 'instructor_task.api.submit_calculate_answer_distribution_csv',
+        'extra_instructor_api_kwargs': {}
     }
 )
 
@@ -172,6 +178,7 @@ class TestInstructorAPIDenyLevels(ModuleStoreTestCase, LoginEnrollmentTestCase):
             ('list_background_email_tasks', {}),
             ('list_report_downloads', {}),
             ('calculate_grades_csv', {}),
+            ('calculate_answer_distribution_csv', {}),
             ('get_students_features', {}),
         ]
         # Endpoints that only Instructors can access
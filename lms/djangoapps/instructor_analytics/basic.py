@@ -133,6 +133,17 @@ def enrolled_students_features(course_key, features):
         {'username': 'username3', 'first_name': 'firstname3'}
     ]
     """
+    return list(iter_enrolled_students_features(course_key, features, chunk_size=None))
+
+
+def iter_enrolled_students_features(course_key, features, chunk_size=1000):
+    """
+    Like enrolled_students_features, but yield the dictionaries one at a time.
+
+    Students are fetched `chunk_size` at a time (or all at once if
+    `chunk_size` is None), so memory use doesn't grow with the number of
+    students enrolled in the course.
+    """
     include_cohort_column = 'cohort' in features
 
     students = User.objects.filter(
@@ -143,6 +154,22 @@ def enrolled_students_features(course_key, features):
     if include_cohort_column:
         students = students.prefetch_related('course_groups')
 
+    def student_chunks():
+        """ yield the students in chunks, ordered by username """
+        if chunk_size is None:
+            yield students
+            return
+
+        last_username = None
+        while True:
+            chunk_query = students if last_username is None else students.filter(username__gt=last_username)
+            chunk = list(chunk_query[:chunk_size])
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+            last_username = chunk[-1].username
+
     def extract_student(student, features):
         """ convert student to dictionary """
         student_features = [x for x in STUDENT_FEATURES if x in features]
@@ -166,7 +193,9 @@ def enrolled_students_features(course_key, features):
             )
         return student_dict
 
-    return [extract_student(student, features) for student in students]
+    for chunk in student_chunks():
+        for student in chunk:
+            yield extract_student(student, features)
 
 
 def coupon_codes_features(features, coupons_list):
@@ -64,19 +64,23 @@ def format_dictlist(dictlist, features):
     }
     """
 
-    def dict_to_entry(dct):
-        """ Convert dictionary to a list for a csv row """
-        relevant_items = [(k, v) for (k, v) in dct.items() if k in features]
-        ordered = sorted(relevant_items, key=lambda (k, v): header.index(k))
-        vals = [v for (_, v) in ordered]
-        return vals
-
     header = features
-    datarows = map(dict_to_entry, dictlist)
+    datarows = list(iter_dictlist_rows(dictlist, features))
 
     return header, datarows
 
 
+def iter_dictlist_rows(dictlist, features):
+    """
+    Like format_dictlist, but yield the datarows one at a time.
+
+    `dictlist` can be any iterable of dictionaries, e.g. a generator, so
+    that large tables can be written out without being held in memory.
+    """
+    for dct in dictlist:
+        yield [dct[feature] for feature in features if feature in dct]
+
+
 def format_instances(instances, features):
     """
     Convert a list of instances into a header list and datarows list.
@@ -10,8 +10,8 @@ from opaque_keys.edx.locations import SlashSeparatedCourseKey
 from shoppingcart.models import CourseRegistrationCode, RegistrationCodeRedemption, Order, Invoice, Coupon
 
 from instructor_analytics.basic import (
-    sale_record_features, enrolled_students_features, course_registration_features, coupon_codes_features,
-    AVAILABLE_FEATURES, STUDENT_FEATURES, PROFILE_FEATURES
+    sale_record_features, enrolled_students_features, iter_enrolled_students_features,
+    course_registration_features, coupon_codes_features, AVAILABLE_FEATURES, STUDENT_FEATURES, PROFILE_FEATURES
 )
 from course_groups.tests.helpers import CohortFactory
 from course_groups.models import CourseUserGroup
@@ -53,6 +53,15 @@ class TestAnalyticsBasic(ModuleStoreTestCase):
             self.assertIn(userreport['email'], [user.email for user in self.users])
             self.assertIn(userreport['name'], [user.profile.name for user in self.users])
 
+    def test_iter_enrolled_students_features_chunked(self):
+        # 30 students in chunks of 7 should take 5 queries
+        with self.assertNumQueries(5):
+            userreports = list(iter_enrolled_students_features(self.course_key, ['username'], chunk_size=7))
+        self.assertEqual(
+            [userreport['username'] for userreport in userreports],
+            sorted(user.username for user in self.users)
+        )
+
     def test_enrolled_students_features_keys_cohorted(self):
         course = CourseFactory.create(course_key=self.course_key)
         course.cohort_config = {'cohorted': True, 'auto_cohort': True, 'auto_cohort_groups': ['cohort']}
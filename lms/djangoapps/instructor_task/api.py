@@ -18,7 +18,8 @@ from instructor_task.tasks import (rescore_problem,
                                    delete_problem_state,
                                    send_bulk_course_email,
                                    calculate_grades_csv,
-                                   calculate_students_features_csv)
+                                   calculate_students_features_csv,
+                                   calculate_answer_distribution_csv)
 
 from instructor_task.api_helper import (check_arguments_for_rescoring,
                                         encode_problem_and_student_input,
@@ -233,3 +234,17 @@ def submit_calculate_students_features_csv(request, course_key, features):
     task_key = ""
 
     return submit_task(request, task_type, task_class, course_key, task_input, task_key)
+
+
+def submit_calculate_answer_distribution_csv(request, course_key):
+    """
+    Submits a task to generate a CSV of the answer distribution of every problem of the course.
+
+    AlreadyRunningError is raised if the course's answer distribution is already being generated.
+    """
+    task_type = 'answer_distribution'
+    task_class = calculate_answer_distribution_csv
+    task_input = {}
+    task_key = ""
+
+    return submit_task(request, task_type, task_class, course_key, task_input, task_key)
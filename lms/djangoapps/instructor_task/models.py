@@ -12,12 +12,15 @@ file and check it in at the same time as your model changes. To do that,
 ASSUMPTIONS: modules have unique IDs, even across different module_types
 
 """
+from contextlib import contextmanager
 from cStringIO import StringIO
 from gzip import GzipFile
+from tempfile import TemporaryFile, mkstemp
 from uuid import uuid4
 import csv
 import json
 import hashlib
+import os
 import os.path
 import urllib
 
@@ -190,12 +193,40 @@ class InstructorTask(models.Model):
         return json.dumps({'message': 'Task revoked before running'})
 
 
+class ReportRowsWriter(object):
+    """
+    Writes rows of a report to an open CSV file, one at a time. Items are
+    converted to unicode and encoded as utf-8.
+    """
+    def __init__(self, output_file):
+        self.csvwriter = csv.writer(output_file)
+
+    def writerow(self, row):
+        """Write a single row."""
+        self.csvwriter.writerow([unicode(item).encode('utf-8') for item in row])
+
+    def writerows(self, rows):
+        """Write every row of the iterable `rows`."""
+        for row in rows:
+            self.writerow(row)
+
+
 class ReportStore(object):
     """
     Simple abstraction layer that can fetch and store CSV files for reports
-    download. Should probably refactor later to create a ReportFile object that
-    can simply be appended to for the sake of memory efficiency, rather than
-    passing in the whole dataset. Doing that for now just because it's simpler.
+    download.
+
+    Reports can be written a row at a time with `rows_writer`, so that the
+    whole dataset never needs to be held in memory::
+
+        with report_store.rows_writer(course_id, filename) as writer:
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow(row)
+
+    Rows are spooled to a temporary file, and the report is only stored once
+    the block exits without an exception, so incomplete reports are never
+    visible.
     """
     @classmethod
     def from_config(cls):
@@ -209,14 +240,65 @@ class ReportStore(object):
         elif storage_type.lower() == "localfs":
             return LocalFSReportStore.from_config()
 
-    def _get_utf8_encoded_rows(self, rows):
+    def store_rows(self, course_id, filename, rows):
         """
-        Given a list of `rows` containing unicode strings, return a
-        new list of rows with those strings encoded as utf-8 for CSV
-        compatibility.
+        Given a `course_id`, `filename`, and `rows` (each row is an iterable of
+        strings), store the rows as a CSV file. `rows` can be any iterable,
+        including a generator.
         """
-        for row in rows:
-            yield [unicode(item).encode('utf-8') for item in row]
+        with self.rows_writer(course_id, filename) as writer:
+            writer.writerows(rows)
+
+    def store_partial_rows(self, course_id, filename, rows):
+        """
+        Store `rows` as a partial CSV file, to be combined with others by
+        `merge_partial_rows`. Partial files are not listed by `links_for`.
+        """
+        with self.partial_rows_writer(course_id, filename) as writer:
+            writer.writerows(rows)
+
+    def merge_partial_rows(self, course_id, partial_filenames, filename):
+        """
+        Concatenate the CSV files previously stored with `store_partial_rows`
+        under `partial_filenames` into a single file named `filename`, and
+        delete the partial files. Partial files that don't exist are skipped.
+
+        The first row of each partial file is taken to be its header. The
+        first non-empty header is written once, at the top of the merged file.
+
+        Returns False, without storing anything, if none of the partial files
+        exist.
+        """
+        partial_filenames = [name for name in partial_filenames if self.partial_exists(course_id, name)]
+        if not partial_filenames:
+            return False
+
+        def merged_rows():
+            """Yield the rows of every partial file, with a single header."""
+            header_written = False
+            for partial_filename in partial_filenames:
+                rows = self.read_partial_rows(course_id, partial_filename)
+                header = next(rows, [])
+                if header and not header_written:
+                    header_written = True
+                    yield header
+                for row in rows:
+                    yield row
+
+        self.store_rows(course_id, filename, merged_rows())
+
+        for partial_filename in partial_filenames:
+            self.delete_partial(course_id, partial_filename)
+        return True
+
+    @staticmethod
+    def _get_unicode_rows(reader):
+        """
+        Given a csv `reader` over utf-8 encoded data, yield its rows as lists
+        of unicode strings.
+        """
+        for row in reader:
+            yield [item.decode('utf-8') for item in row]
 
 
 class S3ReportStore(ReportStore):
@@ -274,6 +356,21 @@ class S3ReportStore(ReportStore):
 
         return key
 
+    def partial_key_for(self, course_id, filename):
+        """Return the S3 key used to store a partial file. These are kept
+        outside of the course's directory so that `links_for` doesn't list
+        them."""
+        hashed_course_id = hashlib.sha1(course_id.to_deprecated_string())
+
+        key = Key(self.bucket)
+        key.key = "{}/partial/{}/{}".format(
+            self.root_path,
+            hashed_course_id.hexdigest(),
+            filename
+        )
+
+        return key
+
     def store(self, course_id, filename, buff):
         """
         Store the contents of `buff` in a directory determined by hashing
@@ -285,41 +382,79 @@ class S3ReportStore(ReportStore):
         transparent via the browser). Filenames should end in whatever
         suffix makes sense for the original file, so `.txt` instead of `.gz`
         """
-        key = self.key_for(course_id, filename)
+        self._store_key(self.key_for(course_id, filename), StringIO(buff.getvalue()))
 
-        data = buff.getvalue()
-        key.size = len(data)
+    def _store_key(self, key, data_file):
+        """
+        Upload the gzip-encoded contents of the file object `data_file` under
+        the S3 `key`. boto reads the file in chunks, so it is never loaded
+        into memory as a whole.
+        """
+        data_file.seek(0, os.SEEK_END)
+        size = data_file.tell()
+        key.size = size
         key.content_encoding = "gzip"
         key.content_type = "text/csv"
 
         # Just setting the content encoding and type above should work
         # according to the docs, but when experimenting, this was necessary for
         # it to actually take.
-        key.set_contents_from_string(
-            data,
+        key.set_contents_from_file(
+            data_file,
             headers={
                 "Content-Encoding": "gzip",
-                "Content-Length": len(data),
+                "Content-Length": size,
                 "Content-Type": "text/csv",
-            }
+            },
+            rewind=True
         )
 
-    def store_rows(self, course_id, filename, rows):
+    def rows_writer(self, course_id, filename):
         """
-        Given a `course_id`, `filename`, and `rows` (each row is an iterable of
-        strings), create a buffer that is a gzip'd csv file, and then `store()`
-        that buffer.
+        Return a context manager that yields a `ReportRowsWriter`, and stores
+        the rows written to it as a gzip'd csv file named `filename` when the
+        block exits.
 
         Even though we store it in gzip format, browsers will transparently
         download and decompress it. Filenames should end in `.csv`, not `.gz`.
         """
-        output_buffer = StringIO()
-        gzip_file = GzipFile(fileobj=output_buffer, mode="wb")
-        csvwriter = csv.writer(gzip_file)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
-        gzip_file.close()
+        return self._key_rows_writer(self.key_for(course_id, filename))
 
-        self.store(course_id, filename, output_buffer)
+    def partial_rows_writer(self, course_id, filename):
+        """
+        Return a context manager that yields a `ReportRowsWriter` for a
+        partial CSV file, to be combined with others by `merge_partial_rows`.
+        """
+        return self._key_rows_writer(self.partial_key_for(course_id, filename))
+
+    @contextmanager
+    def _key_rows_writer(self, key):
+        """
+        Yield a `ReportRowsWriter` that gzips rows into a temporary file, and
+        upload that file to the S3 `key` if the block exits without an exception.
+        """
+        with TemporaryFile() as temp_file:
+            gzip_file = GzipFile(fileobj=temp_file, mode="wb")
+            yield ReportRowsWriter(gzip_file)
+            gzip_file.close()
+            self._store_key(key, temp_file)
+
+    def partial_exists(self, course_id, filename):
+        """Return True if the partial file `filename` has been stored."""
+        return self.partial_key_for(course_id, filename).exists()
+
+    def read_partial_rows(self, course_id, filename):
+        """Yield the rows of the partial file `filename` as lists of unicode strings."""
+        with TemporaryFile() as temp_file:
+            self.partial_key_for(course_id, filename).get_contents_to_file(temp_file)
+            temp_file.seek(0)
+            gzip_file = GzipFile(fileobj=temp_file, mode="rb")
+            for row in self._get_unicode_rows(csv.reader(gzip_file)):
+                yield row
+
+    def delete_partial(self, course_id, filename):
+        """Delete the partial file `filename`."""
+        self.partial_key_for(course_id, filename).delete()
 
     def links_for(self, course_id):
         """
@@ -373,6 +508,14 @@ class LocalFSReportStore(ReportStore):
         """Return the full path to a given file for a given course."""
         return os.path.join(self.root_path, urllib.quote(course_id.to_deprecated_string(), safe=''), filename)
 
+    def partial_path_to(self, course_id, filename):
+        """Return the full path to a partial file for a given course. These are
+        kept outside of the course's directory so that `links_for` doesn't list
+        them."""
+        return os.path.join(
+            self.root_path, 'partial', urllib.quote(course_id.to_deprecated_string(), safe=''), filename
+        )
+
     def store(self, course_id, filename, buff):
         """
         Given the `course_id` and `filename`, store the contents of `buff` in
@@ -380,24 +523,68 @@ class LocalFSReportStore(ReportStore):
         assumed to be a StringIO objecd (or anything that can flush its contents
         to string using `.getvalue()`).
         """
-        full_path = self.path_to(course_id, filename)
+        self._store_path(self.path_to(course_id, filename), buff)
+
+    def _store_path(self, full_path, buff):
+        """
+        Write the contents of `buff` to the file at `full_path`, creating its
+        directory if needed.
+        """
         directory = os.path.dirname(full_path)
         if not os.path.exists(directory):
-            os.mkdir(directory)
+            os.makedirs(directory)
 
         with open(full_path, "wb") as f:
             f.write(buff.getvalue())
 
-    def store_rows(self, course_id, filename, rows):
+    def rows_writer(self, course_id, filename):
         """
-        Given a course_id, filename, and rows (each row is an iterable of strings),
-        write this data out.
+        Return a context manager that yields a `ReportRowsWriter`, and stores
+        the rows written to it as the file `filename` when the block exits.
         """
-        output_buffer = StringIO()
-        csvwriter = csv.writer(output_buffer)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
+        return self._path_rows_writer(self.path_to(course_id, filename))
 
-        self.store(course_id, filename, output_buffer)
+    def partial_rows_writer(self, course_id, filename):
+        """
+        Return a context manager that yields a `ReportRowsWriter` for a
+        partial CSV file, to be combined with others by `merge_partial_rows`.
+        """
+        return self._path_rows_writer(self.partial_path_to(course_id, filename))
+
+    @contextmanager
+    def _path_rows_writer(self, full_path):
+        """
+        Yield a `ReportRowsWriter` that writes rows to a temporary file, and
+        move that file to `full_path` if the block exits without an exception.
+        The temporary file is created directly under `root_path`, so it isn't
+        listed by `links_for` while it's being written.
+        """
+        directory = os.path.dirname(full_path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        handle, temp_path = mkstemp(dir=self.root_path)
+        try:
+            with os.fdopen(handle, "wb") as temp_file:
+                yield ReportRowsWriter(temp_file)
+            os.rename(temp_path, full_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def partial_exists(self, course_id, filename):
+        """Return True if the partial file `filename` has been stored."""
+        return os.path.exists(self.partial_path_to(course_id, filename))
+
+    def read_partial_rows(self, course_id, filename):
+        """Yield the rows of the partial file `filename` as lists of unicode strings."""
+        with open(self.partial_path_to(course_id, filename), "rb") as partial_file:
+            for row in self._get_unicode_rows(csv.reader(partial_file)):
+                yield row
+
+    def delete_partial(self, course_id, filename):
+        """Delete the partial file `filename`."""
+        os.remove(self.partial_path_to(course_id, filename))
 
     def links_for(self, course_id):
         """
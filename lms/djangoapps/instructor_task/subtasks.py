@@ -86,12 +86,14 @@ def _generate_items_for_subtask(
         `item_fields` : the fields that should be included in the dict that is returned.
             These are in addition to the 'pk' field.
         `total_num_items` : the result of item_queryset.count().
-        `items_per_query` : size of chunks to break the query operation into.
-        `items_per_task` : maximum size of chunks to break each query chunk into for use by a subtask.
+        `items_per_task` : maximum size of chunks to break the query into for use by a subtask.
         `course_id` : course_id of the course. Only needed for the track_memory_usage context manager.
 
     Returns:  yields a list of dicts, where each dict contains the fields in `item_fields`, plus the 'pk' field.
 
+    The items are fetched in order of 'pk', a subtask's worth at a time, each query starting
+    after the last 'pk' fetched, so that no query has to hold (or skip over) the whole result.
+
     Warning:  if the algorithm here changes, the _get_number_of_subtasks() method should similarly be changed.
     """
     num_items_queued = 0
@@ -101,14 +103,24 @@ def _generate_items_for_subtask(
 
     items_for_task = []
 
+    item_values = item_queryset.values(*all_item_fields).order_by('pk')
+
     with track_memory_usage('course_email.subtask_generation.memory', course_id):
-        for item in item_queryset.values(*all_item_fields).iterator():
-            if len(items_for_task) == items_per_task and num_subtasks < total_num_subtasks - 1:
-                yield items_for_task
-                num_items_queued += items_per_task
-                items_for_task = []
-                num_subtasks += 1
-            items_for_task.append(item)
+        last_pk = None
+        while True:
+            page = item_values if last_pk is None else item_values.filter(pk__gt=last_pk)
+            items = list(page[:items_per_task])
+            if not items:
+                break
+            last_pk = items[-1]['pk']
+
+            for item in items:
+                if len(items_for_task) == items_per_task and num_subtasks < total_num_subtasks - 1:
+                    yield items_for_task
+                    num_items_queued += items_per_task
+                    items_for_task = []
+                    num_subtasks += 1
+                items_for_task.append(item)
 
         # yield remainder items for task, if any
         if items_for_task:
@@ -453,9 +465,11 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
 
     The subtask lock acquired in the call to check_subtask_is_valid() is released here, only when
     the attempting of retries has concluded.
+
+    Returns True if this update completed the last outstanding subtask of the InstructorTask.
     """
     try:
-        _update_subtask_status(entry_id, current_task_id, new_subtask_status)
+        return _update_subtask_status(entry_id, current_task_id, new_subtask_status)
     except DatabaseError:
         # If we fail, try again recursively.
         retry_count += 1
@@ -463,7 +477,7 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
             TASK_LOG.info("Retrying to update status for subtask %s of instructor task %d with status %s:  retry %d",
                           current_task_id, entry_id, new_subtask_status, retry_count)
             dog_stats_api.increment('instructor_task.subtask.retry_after_failed_update')
-            update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count)
+            return update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count)
         else:
             TASK_LOG.info("Failed to update status after %d retries for subtask %s of instructor task %d with status %s",
                           retry_count, current_task_id, entry_id, new_subtask_status)
@@ -476,6 +490,24 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
         _release_subtask_lock(current_task_id)
 
 
+def update_subtask_progress(entry_id, current_task_id, new_subtask_status):
+    """
+    Record the intermediate progress of a subtask that is still running in the parent
+    InstructorTask object, so that the task's overall progress can be followed while
+    its subtasks work.
+
+    Unlike update_subtask_status(), the subtask lock is not released, and failing to
+    update (e.g. because other subtasks hold the lock on the InstructorTask) is only
+    logged, since a later update will record the same progress.
+    """
+    try:
+        _update_subtask_status(entry_id, current_task_id, new_subtask_status)
+    except DatabaseError:
+        TASK_LOG.info("Skipped progress update for subtask %s of instructor task %d with status %s",
+                      current_task_id, entry_id, new_subtask_status)
+        dog_stats_api.increment('instructor_task.subtask.skipped_progress_update')
+
+
 @transaction.commit_manually
 def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
     """
@@ -486,8 +518,9 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
     committed on completion, or rolled back on error.
 
     The InstructorTask's "task_output" field is updated.  This is a JSON-serialized dict.
-    Accumulates values for 'attempted', 'succeeded', 'failed', 'skipped' from `new_subtask_status`
-    into the corresponding values in the InstructorTask's task_output.  Also updates the 'duration_ms'
+    Its values for 'attempted', 'succeeded', 'failed', 'skipped' are set to the sum of the
+    corresponding values over the latest status of every subtask, so that progress reported
+    by subtasks that are still running is included.  Also updates the 'duration_ms'
     value with the current interval since the original InstructorTask started.  Note that this
     value is only approximate, since the subtask may be running on a different server than the
     original task, so is subject to clock skew.
@@ -503,6 +536,8 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
     information for each subtask.  At the moment, the value for each subtask (keyed by its task_id)
     is the value of the SubtaskStatus.to_dict(), but could be expanded in future to store information
     about failure messages, progress made, etc.
+
+    Returns True if this update completed the last outstanding subtask.
     """
     TASK_LOG.info("Preparing to update status for subtask %s for instructor task %d with status %s",
                   current_task_id, entry_id, new_subtask_status)
@@ -531,14 +566,13 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
         new_duration = int((time() - start_time) * 1000)
         task_progress['duration_ms'] = max(prev_duration, new_duration)
 
-        # Update counts only when subtask is done.
-        # In future, we can make this more responsive by updating status
-        # between retries, by comparing counts that change from previous
-        # retry.
+        # Subtask statuses are cumulative (including across retries), so
+        # the overall counts are recomputed from the latest status of every
+        # subtask.  This also includes progress reported by subtasks that
+        # are still running or being retried.
         new_state = new_subtask_status.state
-        if new_subtask_status is not None and new_state in READY_STATES:
-            for statname in ['attempted', 'succeeded', 'failed', 'skipped']:
-                task_progress[statname] += getattr(new_subtask_status, statname)
+        for statname in ['attempted', 'succeeded', 'failed', 'skipped']:
+            task_progress[statname] = sum(status[statname] for status in subtask_status_info.itervalues())
 
         # Figure out if we're actually done (i.e. this is the last task to complete).
         # This is easier if we just maintain a counter, rather than scanning the
@@ -553,6 +587,7 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
         # At present, we mark the task as having succeeded.  In future, we should see
         # if there was a catastrophic failure that occurred, and figure out how to
         # report that here.
+        completed = num_remaining <= 0 and entry.task_state != SUCCESS
         if num_remaining <= 0:
             entry.task_state = SUCCESS
         entry.subtasks = json.dumps(subtask_dict)
@@ -570,3 +605,4 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
     else:
         TASK_LOG.debug("about to commit....")
         transaction.commit()
+        return completed
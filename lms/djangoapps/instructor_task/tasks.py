@@ -31,7 +31,11 @@ from instructor_task.tasks_helper import (
     reset_attempts_module_state,
     delete_problem_module_state,
     upload_grades_csv,
-    upload_students_csv
+    perform_delegate_grades_csv_batches,
+    upload_grades_csv_chunk,
+    upload_students_csv,
+    perform_delegate_answer_distribution_batches,
+    upload_answer_distribution_chunk,
 )
 from bulk_email.tasks import perform_delegate_email_batches
 
@@ -136,13 +140,27 @@ def send_bulk_course_email(entry_id, _xmodule_instance_args):
 def calculate_grades_csv(entry_id, xmodule_instance_args):
     """
     Grade a course and push the results to an S3 bucket for download.
+
+    If settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK is set, students are graded
+    in batches by calculate_grades_csv_chunk subtasks.
     """
     # Translators: This is a past-tense verb that is inserted into task progress messages as {action}.
     action_name = ugettext_noop('graded')
-    task_fn = partial(upload_grades_csv, xmodule_instance_args)
+    if settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK:
+        task_fn = partial(perform_delegate_grades_csv_batches, calculate_grades_csv_chunk)
+    else:
+        task_fn = partial(upload_grades_csv, xmodule_instance_args)
     return run_main_task(entry_id, task_fn, action_name)
 
 
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)  # pylint: disable=E1102
+def calculate_grades_csv_chunk(entry_id, chunk_index, student_list, timestamp_str, subtask_status_dict):
+    """
+    Grade one batch of students of a grade report, as a subtask of calculate_grades_csv.
+    """
+    return upload_grades_csv_chunk(entry_id, chunk_index, student_list, timestamp_str, subtask_status_dict)
+
+
 @task(base=BaseInstructorTask, routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)  # pylint: disable=E1102
 def calculate_students_features_csv(entry_id, xmodule_instance_args):
     """
@@ -153,3 +171,29 @@ def calculate_students_features_csv(entry_id, xmodule_instance_args):
     action_name = ugettext_noop('generated')
     task_fn = partial(upload_students_csv, xmodule_instance_args)
     return run_main_task(entry_id, task_fn, action_name)
+
+
+@task(base=BaseInstructorTask, routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)  # pylint: disable=E1102
+def calculate_answer_distribution_csv(entry_id, xmodule_instance_args):  # pylint: disable=unused-argument
+    """
+    Count the answers students gave to each problem of a course, and push the
+    answer distribution to an S3 bucket for download.
+
+    The answers are counted in ranges of settings.ANSWER_DISTRIBUTION_MODULES_PER_TASK
+    StudentModules by calculate_answer_distribution_csv_chunk subtasks.
+    """
+    # Translators: This is a past-tense verb that is inserted into task progress messages as {action}.
+    action_name = ugettext_noop('counted')
+    task_fn = partial(perform_delegate_answer_distribution_batches, calculate_answer_distribution_csv_chunk)
+    return run_main_task(entry_id, task_fn, action_name)
+
+
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)  # pylint: disable=E1102
+def calculate_answer_distribution_csv_chunk(entry_id, chunk_index, first_module_id, last_module_id, num_modules,
+                                            timestamp_str, subtask_status_dict):
+    """
+    Count the answers in one range of StudentModules, as a subtask of calculate_answer_distribution_csv.
+    """
+    return upload_answer_distribution_chunk(
+        entry_id, chunk_index, first_module_id, last_module_id, num_modules, timestamp_str, subtask_status_dict
+    )
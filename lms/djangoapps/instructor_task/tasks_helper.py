@@ -3,14 +3,18 @@ This file contains tasks that are designed to perform background operations on t
 running state of a course.
 
 """
+import heapq
 import json
 import urllib
+from collections import Counter
 from datetime import datetime
+from itertools import count, groupby
 from time import time
 
 from celery import Task, current_task
 from celery.utils.log import get_task_logger
 from celery.states import SUCCESS, FAILURE
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import transaction, reset_queries
 import dogstats_wrapper as dog_stats_api
@@ -19,14 +23,22 @@ from pytz import UTC
 from xmodule.modulestore.django import modulestore
 from track.views import task_track
 
-from courseware.grades import iterate_grades_for
+from courseware.grades import iterate_grades_for, problem_url_and_display_names, student_answers
 from courseware.models import StudentModule
 from courseware.model_data import FieldDataCache
 from courseware.module_render import get_module_for_descriptor_internal
-from instructor_analytics.basic import enrolled_students_features
-from instructor_analytics.csvs import format_dictlist
+from instructor_analytics.basic import iter_enrolled_students_features
+from instructor_analytics.csvs import iter_dictlist_rows
 from instructor_task.models import ReportStore, InstructorTask, PROGRESS
+from instructor_task.subtasks import (
+    SubtaskStatus,
+    queue_subtasks_for_query,
+    check_subtask_is_valid,
+    update_subtask_status,
+    update_subtask_progress,
+)
 from student.models import CourseEnrollment
+from opaque_keys import InvalidKeyError
 
 # define different loggers for use within tasks and on client side
 TASK_LOG = get_task_logger(__name__)
@@ -39,6 +51,18 @@ UPDATE_STATUS_SUCCEEDED = 'succeeded'
 UPDATE_STATUS_FAILED = 'failed'
 UPDATE_STATUS_SKIPPED = 'skipped'
 
+# format of the timestamp included in report filenames
+REPORT_TIMESTAMP_FORMAT = "%Y-%m-%d-%H%M"
+
+# number of students to grade between task progress updates
+GRADES_CSV_STATUS_INTERVAL = 100
+
+GRADE_REPORT_HEADER = ["id", "email", "username", "grade"]
+GRADE_REPORT_ERR_HEADER = ["id", "username", "error_msg"]
+
+ANSWER_DISTRIBUTION_HEADER = ["url_name", "display name", "answer id", "answer", "count"]
+ANSWER_COUNTS_HEADER = ["module_state_key", "answer id", "answer", "count"]
+
 
 class BaseInstructorTask(Task):
     """
@@ -514,52 +538,69 @@ def upload_csv_to_report_store(rows, csv_name, course_id, timestamp):
     report_store = ReportStore.from_config()
     report_store.store_rows(
         course_id,
-        u"{course_prefix}_{csv_name}_{timestamp_str}.csv".format(
-            course_prefix=urllib.quote(unicode(course_id).replace("/", "_")),
-            csv_name=csv_name,
-            timestamp_str=timestamp.strftime("%Y-%m-%d-%H%M")
-        ),
+        _report_filename(course_id, csv_name, timestamp.strftime(REPORT_TIMESTAMP_FORMAT)),
         rows
     )
 
 
-def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name):
+def report_store_rows_writer(csv_name, course_id, timestamp):
     """
-    For a given `course_id`, generate a grades CSV file for all students that
-    are enrolled, and store using a `ReportStore`. Once created, the files can
-    be accessed by instantiating another `ReportStore` (via
-    `ReportStore.from_config()`) and calling `link_for()` on it. Writes are
-    buffered, so we'll never write part of a CSV file to S3 -- i.e. any files
-    that are visible in ReportStore will be complete ones.
+    Return a context manager that yields a writer for a CSV stored using
+    ReportStore, so that rows can be written one at a time instead of being
+    built up in memory first.
 
-    As we start to add more CSV downloads, it will probably be worthwhile to
-    make a more general CSVDoc class instead of building out the rows like we
-    do here.
+    Arguments:
+        csv_name: Name of the resulting CSV
+        course_id: ID of the course
     """
-    start_time = time()
-    start_date = datetime.now(UTC)
-    status_interval = 100
-    enrolled_students = CourseEnrollment.users_enrolled_in(course_id)
-    task_progress = TaskProgress(action_name, enrolled_students.count(), start_time)
+    report_store = ReportStore.from_config()
+    return report_store.rows_writer(
+        course_id,
+        _report_filename(course_id, csv_name, timestamp.strftime(REPORT_TIMESTAMP_FORMAT))
+    )
 
-    # Loop over all our students and build our CSV lists in memory
-    header = None
-    rows = []
-    err_rows = [["id", "username", "error_msg"]]
-    current_step = {'step': 'Calculating Grades'}
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students):
-        # Periodically update task status (this is a cache write)
-        if task_progress.attempted % status_interval == 0:
-            task_progress.update_task_state(extra_meta=current_step)
-        task_progress.attempted += 1
 
+def _report_filename(course_id, csv_name, timestamp_str):
+    """
+    Returns the name under which the `csv_name` report of `course_id` is stored.
+    """
+    return u"{course_prefix}_{csv_name}_{timestamp_str}.csv".format(
+        course_prefix=urllib.quote(unicode(course_id).replace("/", "_")),
+        csv_name=csv_name,
+        timestamp_str=timestamp_str
+    )
+
+
+def _partial_report_filename(course_id, csv_name, timestamp_str, chunk_index):
+    """
+    Returns the name under which one chunk of the `csv_name` report of
+    `course_id` is stored until the chunks are merged.
+    """
+    return u"{course_prefix}_{csv_name}_{timestamp_str}_{chunk_index:05d}.csv".format(
+        course_prefix=urllib.quote(unicode(course_id).replace("/", "_")),
+        csv_name=csv_name,
+        timestamp_str=timestamp_str,
+        chunk_index=chunk_index
+    )
+
+
+def _iterate_grade_report_rows(course_id, students):
+    """
+    Grade each of `students` in `course_id`, and yield a tuple of
+    `(header, row, err_row)` for each of them.
+
+    `header` holds the section labels of the grade report, and is None until
+    a student has been graded successfully. For a student who was graded,
+    `row` holds their grade report row and `err_row` is None; for a student
+    who couldn't be graded, `row` is None and `err_row` holds the error.
+    """
+    header = None
+    for student, gradeset, err_msg in iterate_grades_for(course_id, students):
         if gradeset:
             # We were able to successfully grade this student for this course.
-            task_progress.succeeded += 1
             if not header:
                 # Encode the header row in utf-8 encoding in case there are unicode characters
                 header = [section['label'].encode('utf-8') for section in gradeset[u'section_breakdown']]
-                rows.append(["id", "email", "username", "grade"] + header)
 
             percents = {
                 section['label']: section.get('percent', 0.0)
@@ -574,18 +615,53 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
             # possible for a student to have a 0.0 show up in their row but
             # still have 100% for the course.
             row_percents = [percents.get(label, 0.0) for label in header]
-            rows.append([student.id, student.email, student.username, gradeset['percent']] + row_percents)
+            yield header, [student.id, student.email, student.username, gradeset['percent']] + row_percents, None
         else:
             # An empty gradeset means we failed to grade a student.
-            task_progress.failed += 1
-            err_rows.append([student.id, student.username, err_msg])
+            yield header, None, [student.id, student.username, err_msg]
 
-    # By this point, we've got the rows we're going to stuff into our CSV files.
-    current_step = {'step': 'Uploading CSVs'}
-    task_progress.update_task_state(extra_meta=current_step)
 
-    # Perform the actual upload
-    upload_csv_to_report_store(rows, 'grade_report', course_id, start_date)
+def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name):
+    """
+    For a given `course_id`, generate a grades CSV file for all students that
+    are enrolled, and store using a `ReportStore`. Once created, the files can
+    be accessed by instantiating another `ReportStore` (via
+    `ReportStore.from_config()`) and calling `link_for()` on it. Writes are
+    buffered, so we'll never write part of a CSV file to S3 -- i.e. any files
+    that are visible in ReportStore will be complete ones.
+
+    Grade rows are written out as students are graded, so memory use doesn't
+    grow with the number of students. Only the error rows are kept in memory.
+    """
+    start_time = time()
+    start_date = datetime.now(UTC)
+    enrolled_students = CourseEnrollment.users_enrolled_in(course_id)
+    task_progress = TaskProgress(action_name, enrolled_students.count(), start_time)
+
+    err_rows = [GRADE_REPORT_ERR_HEADER]
+    current_step = {'step': 'Calculating Grades'}
+    with report_store_rows_writer('grade_report', course_id, start_date) as writer:
+        header_written = False
+        for header, row, err_row in _iterate_grade_report_rows(course_id, enrolled_students):
+            # Periodically update task status (this is a cache write)
+            if task_progress.attempted % GRADES_CSV_STATUS_INTERVAL == 0:
+                task_progress.update_task_state(extra_meta=current_step)
+            task_progress.attempted += 1
+
+            if row is not None:
+                task_progress.succeeded += 1
+                # The header is known once the first student has been graded
+                if not header_written:
+                    writer.writerow(GRADE_REPORT_HEADER + header)
+                    header_written = True
+                writer.writerow(row)
+            else:
+                task_progress.failed += 1
+                err_rows.append(err_row)
+
+        # By this point, all the grade rows have been written out.
+        current_step = {'step': 'Uploading CSVs'}
+        task_progress.update_task_state(extra_meta=current_step)
 
     # If there are any error rows (don't count the header), write them out as well
     if len(err_rows) > 1:
@@ -595,6 +671,140 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
     return task_progress.update_task_state(extra_meta=current_step)
 
 
+def perform_delegate_grades_csv_batches(chunk_task, entry_id, course_id, _task_input, action_name):
+    """
+    Delegates generation of a grade report by splitting the students enrolled
+    in `course_id` into batches of settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK,
+    and queueing a `chunk_task` subtask to grade each batch (see
+    `upload_grades_csv_chunk`).
+
+    Each subtask stores its part of the report as a partial file in the
+    ReportStore, and the last subtask to complete merges the parts into the
+    final report.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+
+    # As with bulk email, don't queue a second set of subtasks if this task
+    # is run again after its subtasks have been defined.
+    if len(entry.subtasks) > 0 and len(entry.task_output) > 0:
+        TASK_LOG.warning(u"Task %s has already been processed!  InstructorTask = %s", entry.task_id, entry)
+        return json.loads(entry.task_output)
+
+    timestamp_str = datetime.now(UTC).strftime(REPORT_TIMESTAMP_FORMAT)
+    chunk_indices = count()
+
+    def _create_grades_csv_subtask(student_list, initial_subtask_status):
+        """Creates a subtask to grade a given list of students."""
+        return chunk_task.subtask(
+            (
+                entry_id,
+                next(chunk_indices),
+                student_list,
+                timestamp_str,
+                initial_subtask_status.to_dict(),
+            ),
+            task_id=initial_subtask_status.task_id,
+            routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+        )
+
+    return queue_subtasks_for_query(
+        entry,
+        action_name,
+        _create_grades_csv_subtask,
+        CourseEnrollment.users_enrolled_in(course_id).order_by('id'),
+        [],
+        settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK,
+    )
+
+
+def upload_grades_csv_chunk(entry_id, chunk_index, student_list, timestamp_str, subtask_status_dict):
+    """
+    Grades one batch of the students of a grade report queued by
+    `perform_delegate_grades_csv_batches`, and stores their rows (and error
+    rows, if any) as partial files in the ReportStore.
+
+    Inputs are:
+      * `entry_id`: id of the InstructorTask object to which progress should be recorded.
+      * `chunk_index`: position of this batch in the report.
+      * `student_list`: list of dicts, each with the 'pk' of a User to grade.
+      * `timestamp_str`: timestamp to include in the report filenames.
+      * `subtask_status_dict`: dict representation of the subtask's SubtaskStatus.
+
+    Progress is recorded in the InstructorTask as students are graded. The
+    subtask that completes the report last merges all partial files into the
+    final grade report.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+
+    # Reject subtasks that have been requeued, or that belong to a requeued parent.
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    course_id = InstructorTask.objects.get(pk=entry_id).course_id
+    students = User.objects.filter(pk__in=[item['pk'] for item in student_list]).order_by('id')
+    subtask_status.increment(state=PROGRESS)
+
+    try:
+        report_store = ReportStore.from_config()
+        err_rows = []
+        with report_store.partial_rows_writer(
+            course_id, _partial_report_filename(course_id, 'grade_report', timestamp_str, chunk_index)
+        ) as writer:
+            header_written = False
+            for header, row, err_row in _iterate_grade_report_rows(course_id, students):
+                if row is not None:
+                    subtask_status.increment(succeeded=1)
+                    if not header_written:
+                        writer.writerow(GRADE_REPORT_HEADER + header)
+                        header_written = True
+                    writer.writerow(row)
+                else:
+                    subtask_status.increment(failed=1)
+                    err_rows.append(err_row)
+
+                if subtask_status.attempted % GRADES_CSV_STATUS_INTERVAL == 0:
+                    update_subtask_progress(entry_id, current_task_id, subtask_status)
+
+            # The first row of a partial file is always its header, even if empty
+            if not header_written:
+                writer.writerow([])
+
+        if err_rows:
+            err_rows.insert(0, GRADE_REPORT_ERR_HEADER)
+            report_store.store_partial_rows(
+                course_id, _partial_report_filename(course_id, 'grade_report_err', timestamp_str, chunk_index), err_rows
+            )
+    except Exception:
+        # Count the students that weren't graded as failed, and still merge the
+        # report if this was the last subtask, so the other batches aren't lost.
+        TASK_LOG.exception(u"Grade report subtask %s for instructor task %d: failed unexpectedly!", current_task_id, entry_id)
+        subtask_status.increment(failed=len(student_list) - subtask_status.attempted, state=FAILURE)
+        if update_subtask_status(entry_id, current_task_id, subtask_status):
+            _merge_grades_csv_chunks(entry_id, course_id, timestamp_str)
+        raise
+
+    subtask_status.increment(state=SUCCESS)
+    if update_subtask_status(entry_id, current_task_id, subtask_status):
+        _merge_grades_csv_chunks(entry_id, course_id, timestamp_str)
+
+    return subtask_status.to_dict()
+
+
+def _merge_grades_csv_chunks(entry_id, course_id, timestamp_str):
+    """
+    Merge the partial files stored by each subtask of a grade report into the
+    final grade report and error report.
+    """
+    num_chunks = json.loads(InstructorTask.objects.get(pk=entry_id).subtasks)['total']
+    report_store = ReportStore.from_config()
+    for csv_name in ['grade_report', 'grade_report_err']:
+        report_store.merge_partial_rows(
+            course_id,
+            [_partial_report_filename(course_id, csv_name, timestamp_str, index) for index in xrange(num_chunks)],
+            _report_filename(course_id, csv_name, timestamp_str)
+        )
+
+
 def upload_students_csv(_xmodule_instance_args, _entry_id, course_id, task_input, action_name):
     """
     For a given `course_id`, generate a CSV file containing profile
@@ -607,20 +817,182 @@ def upload_students_csv(_xmodule_instance_args, _entry_id, course_id, task_input
     current_step = {'step': 'Calculating Profile Info'}
     task_progress.update_task_state(extra_meta=current_step)
 
-    # compute the student features table and format it
+    # compute the student features table and write it out a row at a time
     query_features = task_input.get('features')
-    student_data = enrolled_students_features(course_id, query_features)
-    header, rows = format_dictlist(student_data, query_features)
+    student_data = iter_enrolled_students_features(course_id, query_features)
+    with report_store_rows_writer('student_profile_info', course_id, start_date) as writer:
+        writer.writerow(query_features)
+        for row in iter_dictlist_rows(student_data, query_features):
+            writer.writerow(row)
+            task_progress.attempted += 1
 
-    task_progress.attempted = task_progress.succeeded = len(rows)
-    task_progress.skipped = task_progress.total - task_progress.attempted
+        task_progress.succeeded = task_progress.attempted
+        task_progress.skipped = task_progress.total - task_progress.attempted
 
-    rows.insert(0, header)
+        current_step = {'step': 'Uploading CSV'}
+        task_progress.update_task_state(extra_meta=current_step)
 
-    current_step = {'step': 'Uploading CSV'}
-    task_progress.update_task_state(extra_meta=current_step)
+    return task_progress.update_task_state(extra_meta=current_step)
 
-    # Perform the upload
-    upload_csv_to_report_store(rows, 'student_profile_info', course_id, start_date)
 
-    return task_progress.update_task_state(extra_meta=current_step)
+def perform_delegate_answer_distribution_batches(chunk_task, entry_id, course_id, _task_input, action_name):
+    """
+    Delegates generation of an answer distribution report by splitting the
+    submitted problem StudentModules of `course_id` into ranges of ids of
+    settings.ANSWER_DISTRIBUTION_MODULES_PER_TASK modules, and queueing a
+    `chunk_task` subtask to count the answers in each range (see
+    `upload_answer_distribution_chunk`).
+
+    Each subtask stores its counts as a partial file in the ReportStore, and
+    the last subtask to complete sums them into the final report.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+
+    # As with bulk email, don't queue a second set of subtasks if this task
+    # is run again after its subtasks have been defined.
+    if len(entry.subtasks) > 0 and len(entry.task_output) > 0:
+        TASK_LOG.warning(u"Task %s has already been processed!  InstructorTask = %s", entry.task_id, entry)
+        return json.loads(entry.task_output)
+
+    timestamp_str = datetime.now(UTC).strftime(REPORT_TIMESTAMP_FORMAT)
+    chunk_indices = count()
+
+    def _create_answer_distribution_subtask(module_list, initial_subtask_status):
+        """Creates a subtask to count the answers in the id range of `module_list`."""
+        return chunk_task.subtask(
+            (
+                entry_id,
+                next(chunk_indices),
+                module_list[0]['pk'],
+                module_list[-1]['pk'],
+                len(module_list),
+                timestamp_str,
+                initial_subtask_status.to_dict(),
+            ),
+            task_id=initial_subtask_status.task_id,
+            routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+        )
+
+    return queue_subtasks_for_query(
+        entry,
+        action_name,
+        _create_answer_distribution_subtask,
+        StudentModule.all_submitted_problems_read_only(course_id),
+        [],
+        settings.ANSWER_DISTRIBUTION_MODULES_PER_TASK,
+    )
+
+
+def upload_answer_distribution_chunk(entry_id, chunk_index, first_module_id, last_module_id, num_modules,
+                                     timestamp_str, subtask_status_dict):
+    """
+    Counts the answers in one range of the StudentModules of an answer
+    distribution report queued by `perform_delegate_answer_distribution_batches`,
+    and stores the counts as a partial file in the ReportStore.
+
+    Inputs are:
+      * `entry_id`: id of the InstructorTask object to which progress should be recorded.
+      * `chunk_index`: position of this range in the report.
+      * `first_module_id`, `last_module_id`: the ids of the first and last StudentModules of the range.
+      * `num_modules`: the number of StudentModules that were in the range when it was queued.
+      * `timestamp_str`: timestamp to include in the report filenames.
+      * `subtask_status_dict`: dict representation of the subtask's SubtaskStatus.
+
+    The partial file holds a row of (module state key, answer id, answer, count) for
+    each answer, sorted, so that the partial files can be merged without
+    holding them in memory. The subtask that completes the report last merges
+    them into the final answer distribution report.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+
+    # Reject subtasks that have been requeued, or that belong to a requeued parent.
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    course_id = InstructorTask.objects.get(pk=entry_id).course_id
+    subtask_status.increment(state=PROGRESS)
+
+    try:
+        modules = StudentModule.all_submitted_problems_read_only(course_id).filter(
+            id__gte=first_module_id,
+            id__lte=last_module_id,
+        ).values_list('id', 'module_state_key', 'state')
+
+        answer_counts = Counter()
+        for module_id, module_state_key, state in modules.iterator():
+            try:
+                answers = student_answers(state)
+            except ValueError:
+                TASK_LOG.error(u"Answer Distribution: Could not parse module state for StudentModule id=%s", module_id)
+                subtask_status.increment(failed=1)
+                continue
+
+            for problem_part_id, answer in answers.iteritems():
+                answer_counts[(unicode(module_state_key), problem_part_id, answer)] += 1
+            subtask_status.increment(succeeded=1)
+
+        report_store = ReportStore.from_config()
+        report_store.store_partial_rows(
+            course_id,
+            _partial_report_filename(course_id, 'answer_distribution', timestamp_str, chunk_index),
+            [ANSWER_COUNTS_HEADER] + [list(key) + [answer_counts[key]] for key in sorted(answer_counts)]
+        )
+    except Exception:
+        # Count the modules that weren't counted as failed, and still merge the
+        # report if this was the last subtask, so the other ranges aren't lost.
+        TASK_LOG.exception(
+            u"Answer distribution subtask %s for instructor task %d: failed unexpectedly!", current_task_id, entry_id
+        )
+        subtask_status.increment(failed=max(num_modules - subtask_status.attempted, 0), state=FAILURE)
+        if update_subtask_status(entry_id, current_task_id, subtask_status):
+            _merge_answer_distribution_chunks(entry_id, course_id, timestamp_str)
+        raise
+
+    subtask_status.increment(state=SUCCESS)
+    if update_subtask_status(entry_id, current_task_id, subtask_status):
+        _merge_answer_distribution_chunks(entry_id, course_id, timestamp_str)
+
+    return subtask_status.to_dict()
+
+
+def _merge_answer_distribution_chunks(entry_id, course_id, timestamp_str):
+    """
+    Sum the counts in the partial files stored by each subtask of an answer
+    distribution report into the final report, reading the files side by
+    side so that no more than a row of each is held in memory.
+    """
+    num_chunks = json.loads(InstructorTask.objects.get(pk=entry_id).subtasks)['total']
+    report_store = ReportStore.from_config()
+    partial_filenames = [
+        _partial_report_filename(course_id, 'answer_distribution', timestamp_str, index) for index in xrange(num_chunks)
+    ]
+    partial_filenames = [name for name in partial_filenames if report_store.partial_exists(course_id, name)]
+    problem_info = problem_url_and_display_names(course_id)
+
+    def merged_rows():
+        """Yield the header, then a row of the summed count of each answer."""
+        yield ANSWER_DISTRIBUTION_HEADER
+
+        partial_rows = []
+        for partial_filename in partial_filenames:
+            rows = report_store.read_partial_rows(course_id, partial_filename)
+            next(rows, None)  # header
+            partial_rows.append(rows)
+
+        missing_keys = set()
+        for (module_state_key, problem_part_id, answer), rows in groupby(
+                heapq.merge(*partial_rows), key=lambda row: tuple(row[:3])
+        ):
+            try:
+                url, display_name = problem_info[course_id.make_usage_key_from_deprecated_string(module_state_key)]
+            except (KeyError, InvalidKeyError):
+                # Answered, then deleted from the course
+                if module_state_key not in missing_keys:
+                    missing_keys.add(module_state_key)
+                    TASK_LOG.warning(u"Answer Distribution: Item %s in course %s not found", module_state_key, course_id)
+                continue
+            yield [url, display_name, problem_part_id, answer, sum(int(row[3]) for row in rows)]
+
+    report_store.store_rows(course_id, _report_filename(course_id, 'answer_distribution', timestamp_str), merged_rows())
+    for partial_filename in partial_filenames:
+        report_store.delete_partial(course_id, partial_filename)
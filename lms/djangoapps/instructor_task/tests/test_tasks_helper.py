@@ -4,10 +4,12 @@ Unit tests for LMS instructor-initiated background tasks helper functions.
 Tests that CSV grade report generation works with unicode emails.
 
 """
+import json
 import os
 import shutil
 
 import ddt
+from celery.states import SUCCESS
 from mock import Mock, patch
 
 from django.conf import settings
@@ -18,8 +20,14 @@ from xmodule.modulestore.tests.factories import CourseFactory
 
 from student.tests.factories import CourseEnrollmentFactory, UserFactory
 
-from instructor_task.models import ReportStore
-from instructor_task.tasks_helper import upload_grades_csv, upload_students_csv
+from courseware.tests.factories import StudentModuleFactory
+from instructor_task.models import InstructorTask, ReportStore
+from instructor_task.subtasks import SubtaskStatus, initialize_subtask_info
+from instructor_task.tasks_helper import (
+    ANSWER_COUNTS_HEADER, upload_answer_distribution_chunk, upload_grades_csv, upload_students_csv,
+    _merge_answer_distribution_chunks, _partial_report_filename, _report_filename,
+)
+from instructor_task.tests.factories import InstructorTaskFactory
 
 
 class TestReport(ModuleStoreTestCase):
@@ -118,3 +126,174 @@ class TestStudentReport(TestReport):
         #This assertion simply confirms that the generation completed with no errors
         num_students = len(students)
         self.assertDictContainsSubset({'attempted': num_students, 'succeeded': num_students, 'failed': 0}, result)
+
+
+class TestMergePartialRows(TestReport):
+    """
+    Tests that partial report files are merged into a single report.
+    """
+    def test_merge(self):
+        report_store = ReportStore.from_config()
+        report_store.store_partial_rows(self.course.id, 'report_00000.csv', [[u'id', u'name'], [1, u'a']])
+        report_store.store_partial_rows(self.course.id, 'report_00001.csv', [[], ])
+        report_store.store_partial_rows(self.course.id, 'report_00002.csv', [[u'id', u'name'], [3, u'\xf1']])
+        self.assertEquals(report_store.links_for(self.course.id), [])
+
+        merged = report_store.merge_partial_rows(
+            self.course.id,
+            ['report_00000.csv', 'report_00001.csv', 'report_00002.csv', 'report_00003.csv'],
+            'report.csv'
+        )
+
+        self.assertTrue(merged)
+        self.assertEquals([link[0] for link in report_store.links_for(self.course.id)], ['report.csv'])
+        with open(report_store.path_to(self.course.id, 'report.csv')) as report_file:
+            self.assertEquals(report_file.read().splitlines(), ['id,name', '1,a', '3,\xc3\xb1'])
+        self.assertFalse(report_store.partial_exists(self.course.id, 'report_00000.csv'))
+
+    def test_merge_nothing(self):
+        report_store = ReportStore.from_config()
+        self.assertFalse(report_store.merge_partial_rows(self.course.id, ['report_00000.csv'], 'report.csv'))
+        self.assertEquals(report_store.links_for(self.course.id), [])
+
+
+class TestMergeAnswerDistribution(TestReport):
+    """
+    Tests that the answer counts of each subtask are summed into a single report.
+    """
+    def test_merge(self):
+        problems = [self.course.id.make_usage_key('problem', name) for name in ('p1', 'p2', 'deleted')]
+        p1_key, p2_key, deleted_key = [problem.to_deprecated_string() for problem in problems]
+        partial_filenames = [
+            _partial_report_filename(self.course.id, 'answer_distribution', 'now', index) for index in xrange(3)
+        ]
+        report_store = ReportStore.from_config()
+        report_store.store_partial_rows(self.course.id, partial_filenames[0], [
+            ANSWER_COUNTS_HEADER,
+            [deleted_key, u'deleted_2_1', u'a', 1],
+            [p1_key, u'p1_2_1', u'a', 2],
+            [p1_key, u'p1_2_1', u'\xf1', 1],
+        ])
+        report_store.store_partial_rows(self.course.id, partial_filenames[2], [
+            ANSWER_COUNTS_HEADER,
+            [p1_key, u'p1_2_1', u'a', 3],
+            [p2_key, u'p2_2_1', u'b', 1],
+        ])
+        entry = InstructorTaskFactory.create(course_id=self.course.id, subtasks=json.dumps({'total': 3}))
+
+        problem_info = {problems[0]: (u'p1', u'Problem 1'), problems[1]: (u'p2', u'Problem 2')}
+        with patch('instructor_task.tasks_helper.problem_url_and_display_names', return_value=problem_info):
+            _merge_answer_distribution_chunks(entry.id, self.course.id, 'now')
+
+        report_filename = _report_filename(self.course.id, 'answer_distribution', 'now')
+        with open(report_store.path_to(self.course.id, report_filename)) as report_file:
+            self.assertEquals(report_file.read().splitlines(), [
+                'url_name,display name,answer id,answer,count',
+                'p1,Problem 1,p1_2_1,a,5',
+                'p1,Problem 1,p1_2_1,\xc3\xb1,1',
+                'p2,Problem 2,p2_2_1,b,1',
+            ])
+        self.assertFalse(report_store.partial_exists(self.course.id, partial_filenames[0]))
+
+
+class TestAnswerDistributionChunk(TestReport):
+    """
+    Tests that a subtask counts the answers in its range of StudentModules.
+    """
+    def setUp(self):
+        super(TestAnswerDistributionChunk, self).setUp()
+        self.problem = self.course.id.make_usage_key('problem', 'p1')
+        self.modules = [
+            StudentModuleFactory.create(
+                course_id=self.course.id,
+                module_state_key=self.problem,
+                grade=1,
+                state=json.dumps({'student_answers': {'p1_2_1': answer}}),
+            )
+            for answer in (u'a', u'\xf1', u'a', 3)
+        ]
+        # Neither unsubmitted nor unparseable states are counted
+        StudentModuleFactory.create(
+            course_id=self.course.id, module_state_key=self.problem, state=json.dumps({'student_answers': {}})
+        )
+        self.modules.append(StudentModuleFactory.create(
+            course_id=self.course.id, module_state_key=self.problem, grade=0, state='{"student_answers": '
+        ))
+
+        self.entry = InstructorTaskFactory.create(course_id=self.course.id)
+        initialize_subtask_info(self.entry, 'counted', len(self.modules), ['subtask'])
+        self.problem_info = patch(
+            'instructor_task.tasks_helper.problem_url_and_display_names',
+            return_value={self.problem: (u'p1', u'Problem 1')}
+        )
+        self.problem_info.start()
+        self.addCleanup(self.problem_info.stop)
+
+    def _upload_chunk(self):
+        """Counts the answers of every module, as the only subtask of the report."""
+        return upload_answer_distribution_chunk(
+            self.entry.id, 0, self.modules[0].id, self.modules[-1].id, len(self.modules), 'now',
+            SubtaskStatus.create('subtask').to_dict(),
+        )
+
+    def _report_lines(self):
+        """Returns the lines of the merged report."""
+        report_store = ReportStore.from_config()
+        report_filename = _report_filename(self.course.id, 'answer_distribution', 'now')
+        with open(report_store.path_to(self.course.id, report_filename)) as report_file:
+            return report_file.read().splitlines()
+
+    def test_answers_counted(self):
+        result = self._upload_chunk()
+        self.assertDictContainsSubset({'attempted': 5, 'succeeded': 4, 'failed': 1, 'state': SUCCESS}, result)
+        self.assertEquals(self._report_lines(), [
+            'url_name,display name,answer id,answer,count',
+            'p1,Problem 1,p1_2_1,3,1',
+            'p1,Problem 1,p1_2_1,a,2',
+            'p1,Problem 1,p1_2_1,\xc3\xb1,1',
+        ])
+        task_output = json.loads(InstructorTask.objects.get(pk=self.entry.id).task_output)
+        self.assertDictContainsSubset({'attempted': 5, 'succeeded': 4, 'failed': 1}, task_output)
+
+    def test_failure(self):
+        with patch('instructor_task.tasks_helper.student_answers', side_effect=[{u'p1_2_1': u'a'}, Exception('boom')]):
+            with self.assertRaises(Exception):
+                self._upload_chunk()
+
+        # The modules that weren't counted are failed, and the report is still made
+        task_output = json.loads(InstructorTask.objects.get(pk=self.entry.id).task_output)
+        self.assertDictContainsSubset({'attempted': 5, 'succeeded': 1, 'failed': 4}, task_output)
+        self.assertEquals(self._report_lines(), ['url_name,display name,answer id,answer,count'])
+
+
+class TestReportStoreRowsWriter(TestReport):
+    """
+    Tests that reports can be written a row at a time.
+    """
+    def test_rows_writer(self):
+        report_store = ReportStore.from_config()
+        with report_store.rows_writer(self.course.id, 'report.csv') as writer:
+            writer.writerow([u'id', u'name'])
+            writer.writerows(([index, u'student\xec'] for index in xrange(2)))
+            # Nothing is visible until the writer is closed
+            self.assertEquals(report_store.links_for(self.course.id), [])
+
+        with open(report_store.path_to(self.course.id, 'report.csv')) as report_file:
+            self.assertEquals(
+                report_file.read().splitlines(), ['id,name', '0,student\xc3\xac', '1,student\xc3\xac']
+            )
+
+    def test_rows_writer_error(self):
+        report_store = ReportStore.from_config()
+        with self.assertRaises(ValueError):
+            with report_store.rows_writer(self.course.id, 'report.csv') as writer:
+                writer.writerow([u'id', u'name'])
+                raise ValueError()
+
+        self.assertEquals(report_store.links_for(self.course.id), [])
+        self.assertEquals(
+            [name for name in os.listdir(settings.GRADES_DOWNLOAD['ROOT_PATH']) if not os.path.isdir(
+                os.path.join(settings.GRADES_DOWNLOAD['ROOT_PATH'], name)
+            )],
+            []
+        )
@@ -9,6 +9,7 @@ from rest_framework.decorators import api_view, authentication_classes, permissi
 from rest_framework.permissions import IsAuthenticated
 
 from courseware.access import has_access
+from course_overviews.models import CourseOverview
 from student.models import CourseEnrollment, User
 
 from .serializers import CourseEnrollmentSerializer, UserSerializer
@@ -67,10 +68,19 @@ def mobile_course_enrollments(enrollments, user):
     """
     Return enrollments only if courses are mobile_available (or if the user has staff access)
     enrollments is a list of CourseEnrollments.
+
+    The courses are read from their overviews, all at once, rather than loaded
+    from the modulestore.
     """
+    enrollments = list(enrollments)
+    overviews = {
+        overview.id: overview
+        for overview in CourseOverview.get_select_courses([enr.course_id for enr in enrollments])
+    }
     for enr in enrollments:
-        course = enr.course
+        course = overviews.get(enr.course_id)
         # The course doesn't always really exist -- we can have bad data in the enrollments
         # pointing to non-existent (or removed) courses, in which case `course` is None.
         if course and (course.mobile_available or has_access(user, 'staff', course)):
+            enr.course_overview = course
             yield enr
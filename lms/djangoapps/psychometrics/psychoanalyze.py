@@ -6,6 +6,7 @@
 from __future__ import division
 
 import datetime
+import hashlib
 import logging
 import json
 import math
@@ -14,7 +15,8 @@ from opaque_keys.edx.locator import BlockUsageLocator
 from scipy.optimize import curve_fit
 
 from django.conf import settings
-from django.db.models import Sum, Max
+from django.core.cache import cache
+from django.db.models import Count, Max
 from psychometrics.models import PsychometricData
 from courseware.models import StudentModule
 from pytz import UTC
@@ -26,6 +28,9 @@ log = logging.getLogger("edx.psychometrics")
 
 db = getattr(settings, 'DATABASE_FOR_PSYCHOMETRICS', 'default')
 
+# Plots are cached by the data they were generated from, so they only expire to free up space
+PLOTS_CACHE_TIMEOUT = 60 * 60 * 24
+
 #-----------------------------------------------------------------------------
 # fit functions
 
@@ -71,6 +76,21 @@ class StatVar(object):
         self.sum2 += x ** 2
         self.cnt += 1
 
+    def add_array(self, xs):
+        """
+        Add each of the numbers in numpy array xs
+        """
+        if not len(xs):
+            return
+        xmin, xmax = xs.min(), xs.max()
+        if self.min is None or xmin < self.min:
+            self.min = xmin
+        if self.max is None or xmax > self.max:
+            self.max = xmax
+        self.sum += xs.sum()
+        self.sum2 += (xs ** 2).sum()
+        self.cnt += len(xs)
+
     def avg(self):
         if self.cnt is None:
             return 0
@@ -111,12 +131,11 @@ def make_histogram(ydata, bins=None):
         bins = range(0, 100, 10)
 
     nbins = len(bins)
-    hist = dict(zip(bins, [0] * nbins))
-    for y in ydata:
-        for b in bins[::-1]:  # in reverse order
-            if y > b:
-                hist[b] += 1
-                break
+    # index of the last bin below each y, or -1 if y is not above any
+    ybins = np.searchsorted(np.asarray(bins), np.asarray(ydata, dtype=float)) - 1
+    ybins = ybins[ybins >= 0]
+    counts = np.bincount(ybins, minlength=nbins) if len(ybins) else np.zeros(nbins, dtype=int)
+    hist = dict(zip(bins, counts.tolist()))
     # hist['bins'] = bins
     return hist
 
@@ -129,15 +148,8 @@ def problems_with_psychometric_data(course_id):
     Does this for a given course_id.
     '''
     pmdset = PsychometricData.objects.using(db).filter(studentmodule__course_id=course_id)
-    plist = [p['studentmodule__module_state_key'] for p in pmdset.values('studentmodule__module_state_key').distinct()]
-    problems = dict(
-        (
-            p,
-            pmdset.filter(
-                studentmodule__module_state_key=BlockUsageLocator.from_string(p)
-            ).count()
-        ) for p in plist
-    )
+    counts = pmdset.values('studentmodule__module_state_key').annotate(count=Count('id')).order_by()
+    problems = dict((p['studentmodule__module_state_key'], p['count']) for p in counts)
 
     return problems
 
@@ -145,11 +157,37 @@ def problems_with_psychometric_data(course_id):
 
 
 def generate_plots_for_problem(problem):
+    '''
+    Return (msg, plots) for the problem with location url problem.
 
+    Plots are cached until the psychometric data of the problem changes.
+    '''
     pmdset = PsychometricData.objects.using(db).filter(
         studentmodule__module_state_key=BlockUsageLocator.from_string(problem)
     )
-    nstudents = pmdset.count()
+    # new data adds rows, or is saved along with a check of the problem (which saves its StudentModule)
+    version = pmdset.aggregate(Count('id'), Max('id'), Max('studentmodule__modified'))
+    cache_key = u'psychometrics.plots.{}'.format(
+        hashlib.md5(repr((problem, sorted(version.items())))).hexdigest()
+    )
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    msg, plots = _generate_plots_for_problem(problem, pmdset)
+    cache.set(cache_key, (msg, plots), PLOTS_CACHE_TIMEOUT)
+    return msg, plots
+
+
+def _generate_plots_for_problem(problem, pmdset):
+    '''
+    Generate the plots of problem from the PsychometricData rows pmdset,
+    fetched in a single query into numpy arrays.
+    '''
+    rows = list(pmdset.order_by('id').values_list(
+        'studentmodule__grade', 'studentmodule__max_grade', 'attempts', 'checktimes'
+    ))
+    nstudents = len(rows)
     msg = ""
     plots = []
 
@@ -157,11 +195,14 @@ def generate_plots_for_problem(problem):
         msg += "%s nstudents=%d --> skipping, too few" % (problem, nstudents)
         return msg, plots
 
-    max_grade = pmdset[0].studentmodule.max_grade
+    grade_col, max_grade_col, attempts_col, checktimes_col = zip(*rows)
+    max_grade = max_grade_col[0]
+    # NaN where there is no grade, so that it is left out of the statistics
+    grades = np.array([np.nan if g is None else g for g in grade_col], dtype=float)
+    attempts = np.array(attempts_col, dtype=int)
 
-    agdat = pmdset.aggregate(Sum('attempts'), Max('attempts'))
-    max_attempts = agdat['attempts__max']
-    total_attempts = agdat['attempts__sum']  # not used yet
+    max_attempts = int(attempts.max())
+    total_attempts = int(attempts.sum())  # not used yet
 
     msg += "max attempts = %d" % max_attempts
 
@@ -169,10 +210,9 @@ def generate_plots_for_problem(problem):
     dataset = {'xdat': xdat}
 
     # compute grade statistics
-    grades = [pmd.studentmodule.grade for pmd in pmdset]
+    graded = grades[~np.isnan(grades)]
     gsv = StatVar()
-    for g in grades:
-        gsv += g
+    gsv.add_array(graded)
     msg += "<br><p><font color='blue'>Grade distribution: %s</font></p>" % gsv
 
     # generate grade histogram
@@ -193,7 +233,7 @@ def generate_plots_for_problem(problem):
         max_grade = gsv.max
 
     if max_grade > 1:
-        ghist = make_histogram(grades, np.linspace(0, max_grade, max_grade + 1))
+        ghist = make_histogram(graded, np.linspace(0, max_grade, max_grade + 1))
         ghist_json = json.dumps(ghist.items())
 
         plot = {'title': "Grade histogram for %s" % problem,
@@ -207,23 +247,20 @@ def generate_plots_for_problem(problem):
         msg += "<br/>Not generating histogram: max_grade=%s" % max_grade
 
     # histogram of time differences between checks
-    # Warning: this is inefficient - doesn't scale to large numbers of students
-    dtset = []  # time differences in minutes
-    dtsv = StatVar()
-    for pmd in pmdset:
+    dtsets = []  # time differences in minutes
+    for checktimes in checktimes_col:
         try:
-            checktimes = eval(pmd.checktimes)  # update log of attempt timestamps
+            checktimes = eval(checktimes)  # update log of attempt timestamps
         except:
             continue
         if len(checktimes) < 2:
             continue
-        ct0 = checktimes[0]
-        for ct in checktimes[1:]:
-            dt = (ct - ct0).total_seconds() / 60.0
-            if dt < 20:  # ignore if dt too long
-                dtset.append(dt)
-                dtsv += dt
-            ct0 = ct
+        minutes = np.array([(ct - checktimes[0]).total_seconds() / 60.0 for ct in checktimes])
+        dtsets.append(np.diff(minutes))
+    dtset = np.concatenate(dtsets) if dtsets else np.array([])
+    dtset = dtset[dtset < 20]  # ignore if dt too long
+    dtsv = StatVar()
+    dtsv.add_array(dtset)
     if dtsv.cnt > 2:
         msg += "<br/><p><font color='brown'>Time differences between checks: %s</font></p>" % dtsv
         bins = np.linspace(0, 1.5 * dtsv.sdv(), 30)
@@ -244,16 +281,12 @@ def generate_plots_for_problem(problem):
     # one IRT plot curve for each grade received (TODO: this assumes integer grades)
     for grade in range(1, int(max_grade) + 1):
         yset = {}
-        gset = pmdset.filter(studentmodule__grade=grade)
-        ngset = gset.count()
+        gattempts = attempts[grades == grade]
+        ngset = len(gattempts)
         if ngset == 0:
             continue
-        ydat = []
-        ylast = 0
-        for x in xdat:
-            y = gset.filter(attempts=x).count() / ngset
-            ydat.append(y + ylast)
-            ylast = y + ylast
+        # fraction of the students with this grade that needed at most x attempts
+        ydat = (np.cumsum(np.bincount(gattempts, minlength=max_attempts + 1)[1:]) / ngset).tolist()
         yset['ydat'] = ydat
 
         if len(ydat) > 3:  # try to fit to logistic function if enough data points
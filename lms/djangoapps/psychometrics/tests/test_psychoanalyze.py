@@ -0,0 +1,107 @@
+"""
+Tests of psychometrics.psychoanalyze
+"""
+import json
+import re
+
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase
+from mock import patch
+
+from courseware.tests.factories import StudentModuleFactory
+from opaque_keys.edx.locations import SlashSeparatedCourseKey
+from psychometrics import psychoanalyze
+from psychometrics.models import PsychometricData
+from psychometrics.psychoanalyze import generate_plots_for_problem, make_histogram
+
+
+def make_histogram_by_value(ydata, bins):
+    """The histogram of ydata, binned one value at a time."""
+    hist = dict(zip(bins, [0] * len(bins)))
+    for y in ydata:
+        for b in bins[::-1]:
+            if y > b:
+                hist[b] += 1
+                break
+    return hist
+
+
+def plot_data(plots, plot_id):
+    """Returns the data of the flot plot plot_id, which is assigned to a javascript variable."""
+    plot = [plot for plot in plots if plot['id'] == plot_id][0]
+    return json.loads(re.match(r'var \w+ = (.*);', plot['data']).group(1))
+
+
+class MakeHistogramTest(TestCase):
+    """
+    Tests of binning values into histograms.
+    """
+    def test_default_bins(self):
+        ydata = [-5, 0, 5, 10, 10.5, 20, 99, 100, 150]
+        hist = make_histogram(ydata)
+        self.assertEqual(hist, make_histogram_by_value(ydata, range(0, 100, 10)))
+        # values equal to a bin edge are counted in the bin below it
+        self.assertEqual(hist[0], 2)
+        self.assertEqual(hist[10], 2)
+
+    def test_grade_bins(self):
+        bins = np.linspace(0, 3, 4)
+        ydata = np.array([0, 1, 1, 2, 3, 3, 2.5])
+        self.assertEqual(make_histogram(ydata, bins), make_histogram_by_value(ydata, bins))
+
+    def test_no_values(self):
+        self.assertEqual(make_histogram([], [0, 1]), {0: 0, 1: 0})
+
+
+class GeneratePlotsTest(TestCase):
+    """
+    Tests of the plots of the psychometric data of a problem.
+    """
+    def setUp(self):
+        super(GeneratePlotsTest, self).setUp()
+        cache.clear()
+        course_id = SlashSeparatedCourseKey("MITx", "999", "Robot_Super_Course")
+        location = course_id.make_usage_key('problem', 'p1')
+        self.problem = location.to_deprecated_string()
+
+        self.modules = []
+        for grade, attempts in [(3, 1), (3, 1), (3, 2), (3, 4), (2, 2), (2, 3), (None, 1)]:
+            module = StudentModuleFactory.create(
+                course_id=course_id, module_state_key=location, grade=grade, max_grade=3
+            )
+            PsychometricData.objects.create(studentmodule=module, attempts=attempts)
+            self.modules.append(module)
+
+    def test_grade_histogram(self):
+        msg, plots = generate_plots_for_problem(self.problem)
+
+        # the student without a grade is left out
+        self.assertIn('cnt=6,', msg)
+        self.assertEqual(dict(plot_data(plots, 'histogram')), {0: 0, 1: 2, 2: 4, 3: 0})
+
+    def test_irt_data(self):
+        __, plots = generate_plots_for_problem(self.problem)
+
+        # the fraction of the students with each grade that needed at most 1, 2, 3 and 4 attempts
+        self.assertEqual(plot_data(plots, 'irt3'), [[1, 0.5], [2, 0.75], [3, 0.75], [4, 1.0]])
+        self.assertEqual(plot_data(plots, 'irt2'), [[1, 0.0], [2, 0.5], [3, 1.0], [4, 1.0]])
+        self.assertNotIn('irt1', [plot['id'] for plot in plots])
+
+    def test_plots_cached(self):
+        with patch(
+            'psychometrics.psychoanalyze._generate_plots_for_problem',
+            wraps=psychoanalyze._generate_plots_for_problem,
+        ) as generate:
+            plots = generate_plots_for_problem(self.problem)
+            with self.assertNumQueries(1):
+                self.assertEqual(generate_plots_for_problem(self.problem), plots)
+            self.assertEqual(generate.call_count, 1)
+
+            # a new check of the problem saves its StudentModule
+            module = self.modules[-1]
+            module.grade = 3
+            module.save()
+            msg, __ = generate_plots_for_problem(self.problem)
+            self.assertEqual(generate.call_count, 2)
+            self.assertIn('cnt=7,', msg)
@@ -287,6 +287,22 @@ FEATURES = {
 
     # Enable the new dashboard, account, and profile pages
     'ENABLE_NEW_DASHBOARD': False,
+
+    # Read and maintain per-student section scores in the database
+    # (courseware.models.StudentSectionScore) instead of recomputing every
+    # graded problem each time a grade is requested.
+    'ENABLE_PERSISTENT_SECTION_SCORES': False,
+
+    # List courses in the course catalog from their overviews
+    # (course_overviews.models.CourseOverview) instead of loading every course
+    # from the modulestore. Run generate_course_overview before enabling this.
+    'ENABLE_COURSE_OVERVIEWS': False,
+
+    # Read the grade and subsection open counts of the instructor dashboard's
+    # Metrics tab from the tables kept by courseware.dashboard_aggregates,
+    # for courses they have been computed for (run update_dashboard_aggregates
+    # periodically), instead of counting every StudentModule of the course.
+    'ENABLE_DASHBOARD_AGGREGATES': False,
 }
 
 # Ignore static asset files on import which match this pattern
@@ -331,6 +347,8 @@ NODE_PATH = ':'.join(node_paths)
 # For geolocation ip database
 GEOIP_PATH = REPO_ROOT / "common/static/data/geoip/GeoIP.dat"
 GEOIPV6_PATH = REPO_ROOT / "common/static/data/geoip/GeoIPv6.dat"
+# The number of IP address to country code lookups each process remembers
+GEOIP_COUNTRY_CACHE_SIZE = 10000
 
 # Where to look for a status message
 STATUS_MESSAGE_PATH = ENV_ROOT / "status_message.json"
@@ -557,6 +575,16 @@ XBLOCK_SELECT_FUNCTION = prefer_xmodules
 
 MODULESTORE_BRANCH = 'published-only'
 CONTENTSTORE = None
+
+# Course assets too large for memcached are copied to, and served from, a
+# size-capped directory on local disk (see contentserver.disk_cache), e.g.
+# {'DIRECTORY': '/var/tmp/edx-static-content', 'MAX_SIZE': 10 * 1024 ** 3}
+STATIC_CONTENT_DISK_CACHE = None
+
+# How many seconds browsers and CDNs may keep unlocked course assets without
+# revalidating them. Asset URLs don't change when an asset is replaced, so
+# this bounds how long the old version can be served.
+STATIC_CONTENT_MAX_AGE = 60 * 60
 DOC_STORE_CONFIG = {
     'host': 'localhost',
     'db': 'xmodule',
@@ -601,6 +629,14 @@ MODULESTORE = {
     }
 }
 
+# Total size, pickled, of the split modulestore course structures to keep decoded
+# in memory in each process (0 disables this cache). Decoded structures take a few
+# times their pickled size, so each process may use several times this much memory
+# for them; the structure of a large course is several MB pickled. Structures can
+# also be shared between processes by configuring a 'course_structure_cache' entry
+# in CACHES.
+COURSE_STRUCTURE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
 #################### Python sandbox ############################################
 
 CODE_JAIL = {
@@ -614,6 +650,15 @@ CODE_JAIL = {
         # How many CPU seconds can jailed code use?
         'CPU': 1,
     },
+
+    # A pool of sandboxed processes with capa's modules already imported
+    # (see capa.safe_exec.pool), instead of a new process for each execution.
+    'pool': {
+        # How many idle processes to keep in each LMS process? 0 disables the pool.
+        'size': 0,
+        # How many executions before a process is replaced?
+        'max_jobs': 100,
+    },
 }
 
 # Some courses are allowed to run unsafe code. This is a list of regexes, one
@@ -1300,6 +1345,30 @@ BULK_EMAIL_LOG_SENT_EMAILS = False
 # parallel, and what the SES rate is.
 BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = 0.02
 
+# Rate, in emails per second, that all bulk email tasks together send at,
+# adapted to the rate at which the email provider rejects them (see
+# bulk_email.throttling), e.g.
+# {'INITIAL_RATE': 10, 'MIN_RATE': 1, 'MAX_RATE': 14}.  None disables it.
+BULK_EMAIL_RATE_LIMIT = None
+
+######################### StudentModuleHistory pruning ########################
+
+# Which StudentModuleHistory rows the prune_student_module_history command
+# keeps, and how fast it deletes the others (see courseware.history_pruning).
+STUDENT_MODULE_HISTORY_RETENTION = {
+    # Most recent rows kept for each StudentModule
+    'KEEP_LAST': 10,
+    # Whether rows that changed the grade are kept
+    'KEEP_GRADED': True,
+    # Rows newer than this many days are kept, if it isn't None
+    'KEEP_DAYS': None,
+    # StudentModules pruned at a time, and seconds to sleep between batches
+    'BATCH_SIZE': 1000,
+    'SLEEP': 1,
+    # Seconds a task prunes before queueing a task for the rest of its range
+    'TASK_SECONDS': 300,
+}
+
 
 ############################## Video ##########################################
 
@@ -1439,6 +1508,9 @@ INSTALLED_APPS = (
     # Course action state
     'course_action_state',
 
+    # Course summaries, for course listings
+    'course_overviews',
+
     # Additional problem types
     'edx_jsme',    # Molecular Structure
 
@@ -1524,6 +1596,14 @@ GRADES_DOWNLOAD = {
     'ROOT_PATH': '/tmp/edx-s3/grades',
 }
 
+# Number of students graded by each subtask when generating a grade report.
+# If None, the whole report is generated by a single task.
+GRADES_DOWNLOAD_STUDENTS_PER_TASK = None
+
+# Number of StudentModules whose answers are counted by each subtask when
+# generating an answer distribution report.
+ANSWER_DISTRIBUTION_MODULES_PER_TASK = 10000
+
 ######################## PROGRESS SUCCESS BUTTON ##############################
 # The following fields are available in the URL: {course_id} {student_id}
 PROGRESS_SUCCESS_BUTTON_URL = 'http://<domain>/<path>/{course_id}'
@@ -155,6 +155,10 @@ DATABASES = {
 
 }
 
+# Don't cache course structures across modulestore calls, so that the number of
+# mongo queries made in tests doesn't depend on what ran before
+COURSE_STRUCTURE_CACHE_MAX_BYTES = 0
+
 CACHES = {
     # This is the cache used for most things.
     # In staging/prod envs, the sessions also live here.
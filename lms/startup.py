@@ -31,6 +31,8 @@ def run():
 
     add_mimetypes()
 
+    configure_sandbox_pool()
+
     if settings.FEATURES.get('USE_CUSTOM_THEME', False):
         enable_theme()
 
@@ -46,6 +48,16 @@ def run():
         analytics.init(settings.SEGMENT_IO_LMS_KEY, flush_at=50)
 
 
+def configure_sandbox_pool():
+    """
+    Configure the pool of sandboxed processes that capa problems' code runs in.
+    """
+    from capa.safe_exec import pool
+
+    pool_settings = settings.CODE_JAIL.get('pool', {})
+    pool.configure(pool_settings.get('size', 0), pool_settings.get('max_jobs', 100))
+
+
 def add_mimetypes():
     """
     Add extra mimetypes. Used in xblock_resource.